@@ -6,10 +6,26 @@ risk assessments for automotive projects at different levels.
 """
 
 from .agent_coordinator import AgentCoordinator, WebSearchAgent, RiskEvaluationAgent, MitigationPlanAgent
+from .llm_pool import LLMClientPool, create_llm_pool, get_llm_pool
+from .fake_llm import FakeChatModel, FakeLLMPool
+from .mitigation_retrieval import MitigationPlanIndex
+from .rate_limiter import RateLimiter, RateLimitExhausted
+from .risk_dedup import RiskDeduplicator
+from .risk_ids import RiskIdPool
 
 __all__ = [
     'AgentCoordinator',
     'WebSearchAgent',
     'RiskEvaluationAgent',
-    'MitigationPlanAgent'
+    'MitigationPlanAgent',
+    'LLMClientPool',
+    'get_llm_pool',
+    'create_llm_pool',
+    'FakeChatModel',
+    'FakeLLMPool',
+    'MitigationPlanIndex',
+    'RateLimiter',
+    'RateLimitExhausted',
+    'RiskDeduplicator',
+    'RiskIdPool'
 ] 
\ No newline at end of file
@@ -1,12 +1,27 @@
+import copy
 import os
 import json
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable
 import time
 from datetime import datetime
 import random
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 
+from .llm_pool import LLMClientPool, create_llm_pool, get_llm_pool
+from .rate_limiter import RateLimiter, RateLimitExhausted
+from .mitigation_retrieval import MitigationPlanIndex
+from .risk_dedup import ENRICHED_FIELDS, RiskDeduplicator, copy_enrichment
+from .risk_ids import RiskIdPool
+from .tracing import REPORT_DIR, RunTracer, current_tracer, trace_scope
+from .response_cache import ResponseCache
+from .catalogue_manifest import AssessmentManifest, node_key
+from .structured_output import (
+    RISK_FIELDS, EVALUATION_FIELDS, MITIGATION_FIELDS, INDEX_FIELD,
+    ParseStats, extract_items, response_format, validate_item
+)
+
 # Try to load OpenAI from langchain first, if not available, import directly
 try:
     from langchain_openai import ChatOpenAI
@@ -23,24 +38,243 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
-class WebSearchAgent:
-    """Agent responsible for web search to find common automotive risks"""
+# Agent configuration used when config/agent_config.json is missing or unreadable
+DEFAULT_CONFIG = {
+    "web_search_agent": {"enabled": True, "temperature": 0.7},
+    "risk_evaluation_agent": {"enabled": True, "temperature": 0.3},
+    "mitigation_agent": {"enabled": True, "temperature": 0.6},
+    "concurrency": {"enabled": True, "max_workers": 8},
+    "response_cache": {"enabled": True, "mode": "use", "ttl_hours": 168, "max_entries": 5000},
+    "incremental": {"manifest_path": "data/assessment_manifest.json"},
+    "batching": {"batch_size": 5},
+    "structured_output": {"enabled": True, "max_repair_attempts": 1},
+    "rate_limit": {"enabled": True, "requests_per_minute": 500, "tokens_per_minute": 30000, "max_concurrency": 8},
+    "tracing": {"enabled": True, "report_dir": "data/run_reports"},
+    "llm_backend": {"type": "openai"},
+    "risk_ids": {"enabled": True, "block_size": 20},
+    "dedup": {"enabled": True, "threshold": 0.8},
+    "mitigation_retrieval": {"enabled": True, "threshold": 0.85, "examples": 2, "example_threshold": 0.3}
+}
+
+class LLMAgent:
+    """Base class for agents that send prompts to the OpenAI chat model"""
+    
+    model_name = "gpt-4o"
     
-    def __init__(self, temperature=0.7):
+    # Completion tokens budgeted per call by the rate limiter
+    expected_output_tokens = 800
+    
+    def __init__(self, temperature: float, cache: ResponseCache = None,
+                 structured_output: bool = True, max_repair_attempts: int = 1,
+                 rate_limiter: RateLimiter = None, llm_pool: LLMClientPool = None):
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.temperature = temperature
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.llm_pool = llm_pool or get_llm_pool()
+        self.structured_output = structured_output
+        self.max_repair_attempts = max_repair_attempts
+        self.parse_stats = ParseStats()
         
-        # Initialize OpenAI client
+        # Get the OpenAI client from the shared pool (one HTTP connection pool per process)
         try:
-            self.llm = ChatOpenAI(
-                model="gpt-4o",
-                temperature=temperature,
-                api_key=self.openai_api_key
+            self.llm = self.llm_pool.get(
+                self.model_name,
+                temperature,
+                api_key=self.openai_api_key,
+                # Retries are left to the shared rate limiter when there is one
+                **({"max_retries": 0} if rate_limiter is not None else {})
             )
         except Exception as e:
-            print(f"Error initializing WebSearchAgent: {e}")
+            print(f"Error initializing {type(self).__name__}: {e}")
             self.llm = None
     
+    def _invoke(self, prompt: str, **options) -> str:
+        """Send a prompt to the LLM, serving it from the response cache when possible"""
+        if self.cache is None:
+            return self._call_llm(prompt, **options)
+        
+        key = self.cache.make_key(self.model_name, self.temperature, prompt, options)
+        cached = self.cache.get(key)
+        if cached is not None:
+            tracer = current_tracer()
+            if tracer is not None:
+                tracer.record_call(type(self).__name__, self.model_name, 0.0, cache_hit=True)
+            return cached
+        
+        content = self._call_llm(prompt, **options)
+        self.cache.put(key, content)
+        return content
+    
+    def _call_llm(self, prompt: str, **options) -> str:
+        """Call the LLM through the rate limiter, which retries throttled and failed calls"""
+        def invoke():
+            with self.llm_pool.track(self.model_name, self.temperature):
+                return self.llm.invoke(prompt, **options)
+        
+        started = time.perf_counter()
+        timing = {"queue_time": 0.0, "retries": 0}
+        # Roughly four characters per token
+        estimated_tokens = len(prompt) // 4 + self.expected_output_tokens
+        if self.rate_limiter is None:
+            message = invoke()
+        else:
+            message = self.rate_limiter.call(invoke, estimated_tokens, timing)
+        
+        usage = getattr(message, "usage_metadata", None) or {}
+        if self.rate_limiter is not None and usage.get("total_tokens"):
+            self.rate_limiter.record_usage(estimated_tokens, usage["total_tokens"])
+        
+        tracer = current_tracer()
+        if tracer is not None:
+            tracer.record_call(
+                type(self).__name__, self.model_name,
+                call_time=time.perf_counter() - started - timing["queue_time"],
+                queue_time=timing["queue_time"],
+                prompt_tokens=usage.get("input_tokens", 0),
+                completion_tokens=usage.get("output_tokens", 0),
+                cache_hit=False,
+                retries=timing["retries"]
+            )
+        return message.content
+    
+    def _record_fallback(self, reason: str):
+        """Record in the current run trace that mock or default data was returned"""
+        tracer = current_tracer()
+        if tracer is not None:
+            tracer.record_fallback(type(self).__name__, reason)
+    
+    def _request_structured(self, prompt: str, fields: Dict, list_key: str = None) -> List[Dict]:
+        """
+        Request a JSON response following a schema and validate it in a single pass
+        
+        Only the items that fail validation are sent back to the model for repair
+        (up to ``max_repair_attempts`` times). Counters are kept in ``parse_stats``.
+        
+        Args:
+            prompt: Prompt asking for the JSON response
+            fields: Field specification of each item (see structured_output)
+            list_key: Key of the item array in the response (None for a single object)
+            
+        Returns:
+            List of validated and normalized items
+            
+        Raises:
+            ValueError: If the response is not JSON at all
+        """
+        options = {"response_format": response_format(f"{type(self).__name__}_{list_key or 'item'}", fields, list_key)}
+        content = self._invoke(prompt, **options)
+        
+        try:
+            items = extract_items(content, list_key)
+        except ValueError:
+            self.parse_stats.record(failed_response=True)
+            raise
+        
+        valid, malformed = self._validate_items(items, fields)
+        self.parse_stats.record(items=len(items), valid=len(valid))
+        
+        attempts = 0
+        while malformed and attempts < self.max_repair_attempts:
+            attempts += 1
+            repair_prompt = f"""{prompt}
+        
+        Some items of your previous answer were malformed:
+        {json.dumps(malformed, ensure_ascii=False, default=str)}
+        
+        Return only the corrected versions of these items, in the same JSON format."""
+            
+            try:
+                repaired, malformed = self._validate_items(
+                    extract_items(self._invoke(repair_prompt, **options), list_key), fields
+                )
+            except RateLimitExhausted:
+                raise
+            except Exception as e:
+                print(f"Error repairing structured response for {type(self).__name__}: {e}")
+                break
+            
+            valid.extend(repaired)
+            self.parse_stats.record(repaired=len(repaired))
+        
+        return valid
+    
+    @staticmethod
+    def _validate_items(items: List, fields: Dict) -> tuple:
+        """Split response items into normalized valid items and malformed items with their errors"""
+        valid, malformed = [], []
+        for item in items:
+            normalized, errors = validate_item(item, fields)
+            if normalized is not None:
+                valid.append(normalized)
+            else:
+                malformed.append({"item": item, "errors": errors})
+        return valid, malformed
+    
+    def _invoke_batch(self, items: List, build_prompt: Callable, fields: Dict,
+                      list_key: str, single: Callable) -> List[Dict]:
+        """
+        Handle several items with one LLM call
+        
+        The prompt must ask for a JSON object whose ``list_key`` array holds one
+        object per item, carrying the 1-based ``index`` of the item it answers.
+        Items missing from the response are retried as a smaller batch (the
+        batch is halved when nothing could be parsed); a batch of one item goes
+        through ``single``.
+        
+        Args:
+            items: Items to process
+            build_prompt: Builds the prompt for a list of items
+            fields: Field specification of the response objects (without index)
+            list_key: Key of the array in the response
+            single: Processes a single item without batching
+            
+        Returns:
+            List of validated response objects in the same order as the items
+        """
+        if len(items) == 1:
+            return [single(items[0])]
+        
+        results = {}
+        indexed_fields = {**INDEX_FIELD, **fields}
+        try:
+            if self.structured_output:
+                entries = self._request_structured(build_prompt(items), indexed_fields, list_key)
+            else:
+                entries, _ = self._validate_items(
+                    extract_items(self._invoke(build_prompt(items)), list_key), indexed_fields
+                )
+            
+            for entry in entries:
+                index = entry.pop("index")
+                if 1 <= index <= len(items) and index - 1 not in results:
+                    results[index - 1] = entry
+        except RateLimitExhausted:
+            raise
+        except Exception as e:
+            print(f"Error in batch request for {type(self).__name__}: {e}")
+        
+        missing = [i for i in range(len(items)) if i not in results]
+        if missing:
+            if len(missing) == len(items):
+                half = len(items) // 2
+                groups = [missing[:half], missing[half:]]
+            else:
+                groups = [missing]
+            
+            for group in groups:
+                values = self._invoke_batch([items[i] for i in group], build_prompt, fields, list_key, single)
+                results.update(zip(group, values))
+        
+        return [results[i] for i in range(len(items))]
+
+
+class WebSearchAgent(LLMAgent):
+    """Agent responsible for web search to find common automotive risks"""
+    
+    def __init__(self, temperature=0.7, **kwargs):
+        super().__init__(temperature, **kwargs)
+    
     def search_risks(self, project_type: str, project_name: str, component_name: str = None) -> List[Dict]:
         """
         Search for common risks related to an automotive project or component
@@ -55,6 +289,7 @@ class WebSearchAgent:
         """
         if not self.llm:
             # Return some mock data if OpenAI is not available
+            self._record_fallback("model not available")
             return self._generate_mock_risks(project_type, project_name, component_name)
         
         # Prepare the prompt
@@ -73,18 +308,56 @@ class WebSearchAgent:
         Return 3-5 most critical risks in a structured format."""
         
         try:
+            if self.structured_output:
+                return self._search_risks_structured(system_prompt, project_type, project_name, component_name)
+            
             # Generate response
-            result = self.llm.invoke(system_prompt)
+            content = self._invoke(system_prompt)
             
             # Parse the response into structured risk data
-            risks = self._parse_risk_response(result.content, project_type, project_name, component_name)
+            risks = self._parse_risk_response(content, project_type, project_name, component_name)
             return risks
             
+        except RateLimitExhausted:
+            # Never replace a throttled call with made-up data
+            raise
         except Exception as e:
             print(f"Error in web search: {e}")
             # Fallback to mock data if the API call fails
+            self._record_fallback(f"error: {e}")
             return self._generate_mock_risks(project_type, project_name, component_name)
     
+    def _search_risks_structured(self, system_prompt: str, project_type: str, project_name: str, component_name: str = None) -> List[Dict]:
+        """Request the risks as schema-conforming JSON and build the risk records from it"""
+        prompt = system_prompt.replace(
+            "Return 3-5 most critical risks in a structured format.",
+            'Return the 3-5 most critical risks as a JSON object {"risks": [...]} where each risk has the keys '
+            '"Risk_Title", "Risk_Description", "Risk_Probability", "Cost_Impact" (in Euros), '
+            '"Time_Impact" (in weeks), "Detection" and "Mitigation_Plan".'
+        )
+        items = self._request_structured(prompt, RISK_FIELDS, "risks")
+        
+        if not items:
+            self._record_fallback("no valid risks in response")
+            return self._generate_mock_risks(project_type, project_name, component_name)
+        
+        risks = []
+        for i, item in enumerate(items):
+            risk = {
+                "Risk_ID": f"R{i + 1}",
+                "Level": project_type.lower(),
+                "Project": component_name or project_name,
+                "Owner": "",  # To be filled by user
+                "Risk_Description": item["Risk_Title"],
+                "Detection": 0.5,
+                **item
+            }
+            risk["RI_Cost"] = risk["Risk_Probability"] * risk["Cost_Impact"]
+            risk["RI_Time"] = risk["Risk_Probability"] * risk["Time_Impact"]
+            risks.append(risk)
+        
+        return risks
+    
     def _parse_risk_response(self, response: str, project_type: str, project_name: str, component_name: str = None) -> List[Dict]:
         """Parse the LLM response into structured risk data"""
         risks = []
@@ -175,6 +448,7 @@ class WebSearchAgent:
         
         # If we couldn't parse any risks, return mock data
         if not risks:
+            self._record_fallback("no risks parsed from response")
             risks = self._generate_mock_risks(project_type, project_name, component_name)
         
         return risks
@@ -298,23 +572,11 @@ class WebSearchAgent:
         return formatted_risks
 
 
-class RiskEvaluationAgent:
+class RiskEvaluationAgent(LLMAgent):
     """Agent responsible for evaluating risks in terms of probability, cost, and time impact"""
     
-    def __init__(self, temperature=0.3):
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.temperature = temperature
-        
-        # Initialize OpenAI client
-        try:
-            self.llm = ChatOpenAI(
-                model="gpt-4o",
-                temperature=temperature,
-                api_key=self.openai_api_key
-            )
-        except Exception as e:
-            print(f"Error initializing RiskEvaluationAgent: {e}")
-            self.llm = None
+    def __init__(self, temperature=0.3, **kwargs):
+        super().__init__(temperature, **kwargs)
     
     def evaluate_risk(self, risk_title: str, risk_description: str, project_type: str, project_name: str) -> Dict:
         """
@@ -331,6 +593,7 @@ class RiskEvaluationAgent:
         """
         if not self.llm:
             # Return some reasonable defaults if OpenAI is not available
+            self._record_fallback("model not available")
             return {
                 "Risk_Probability": round(random.uniform(0.2, 0.7), 2),
                 "Cost_Impact": random.randint(300000, 3000000),
@@ -354,16 +617,30 @@ class RiskEvaluationAgent:
         Return only the numeric values in a structured format."""
         
         try:
+            if self.structured_output:
+                prompt = system_prompt.replace(
+                    "Return only the numeric values in a structured format.",
+                    'Return only a JSON object with the numeric keys "Risk_Probability", '
+                    '"Cost_Impact", "Time_Impact" and "Detection".'
+                )
+                items = self._request_structured(prompt, EVALUATION_FIELDS)
+                if items:
+                    return items[0]
+                raise ValueError("No valid evaluation in structured response")
+            
             # Generate response
-            result = self.llm.invoke(system_prompt)
+            content = self._invoke(system_prompt)
             
             # Parse the response
-            evaluation = self._parse_evaluation_response(result.content)
+            evaluation = self._parse_evaluation_response(content)
             return evaluation
             
+        except RateLimitExhausted:
+            raise
         except Exception as e:
             print(f"Error in risk evaluation: {e}")
             # Fallback to random values if the API call fails
+            self._record_fallback(f"error: {e}")
             return {
                 "Risk_Probability": round(random.uniform(0.2, 0.7), 2),
                 "Cost_Impact": random.randint(300000, 3000000),
@@ -371,6 +648,53 @@ class RiskEvaluationAgent:
                 "Detection": round(random.uniform(0.3, 0.8), 2)
             }
     
+    def evaluate_risks(self, risks: List[Dict]) -> List[Dict]:
+        """
+        Evaluate several risks with a single LLM call
+        
+        Args:
+            risks: Risk dictionaries with Risk_Title, Risk_Description, Level and Project
+            
+        Returns:
+            List of evaluation dictionaries, in the same order as the risks
+        """
+        if not risks:
+            return []
+        
+        def single(risk):
+            return self.evaluate_risk(
+                risk_title=risk.get("Risk_Title", ""),
+                risk_description=risk.get("Risk_Description", ""),
+                project_type=risk.get("Level", ""),
+                project_name=risk.get("Project", "")
+            )
+        
+        if not self.llm:
+            return [single(risk) for risk in risks]
+        
+        return self._invoke_batch(risks, self._build_batch_prompt, EVALUATION_FIELDS, "evaluations", single)
+    
+    def _build_batch_prompt(self, risks: List[Dict]) -> str:
+        """Build the prompt evaluating a numbered list of risks"""
+        risk_lines = "\n".join(
+            f"""        {i}. [{risk.get("Level", "")} level project "{risk.get("Project", "")}"] {risk.get("Risk_Title", "")}: {risk.get("Risk_Description", "")}"""
+            for i, risk in enumerate(risks, start=1)
+        )
+        
+        return f"""You are an expert in automotive risk assessment. 
+        Evaluate each of the following risks:
+        
+{risk_lines}
+        
+        For every risk provide a precise evaluation of:
+        1. Risk Probability (0.0-1.0) - How likely is this risk to occur?
+        2. Cost Impact (in Euros €) - What would be the financial impact if this risk occurs?
+        3. Time Impact (in weeks) - How much schedule delay would this risk cause?
+        4. Detection (0.0-1.0) - How easy is it to detect this risk before it fully impacts? (0 = very hard to detect, 1 = very easy to detect)
+        
+        Return only a JSON object {{"evaluations": [...]}} with one object per risk, using
+        the keys "index", "Risk_Probability", "Cost_Impact", "Time_Impact" and "Detection"."""
+    
     def _parse_evaluation_response(self, response: str) -> Dict:
         """Parse the LLM response into structured evaluation data"""
         evaluation = {
@@ -413,28 +737,18 @@ class RiskEvaluationAgent:
         return evaluation
 
 
-class MitigationPlanAgent:
+class MitigationPlanAgent(LLMAgent):
     """Agent responsible for creating mitigation plans for identified risks"""
     
-    def __init__(self, temperature=0.6):
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.temperature = temperature
-        
-        # Initialize OpenAI client
-        try:
-            self.llm = ChatOpenAI(
-                model="gpt-4o",
-                temperature=temperature,
-                api_key=self.openai_api_key
-            )
-        except Exception as e:
-            print(f"Error initializing MitigationPlanAgent: {e}")
-            self.llm = None
+    def __init__(self, temperature=0.6, plan_index: MitigationPlanIndex = None, **kwargs):
+        super().__init__(temperature, **kwargs)
+        # Existing plans reused for similar risks instead of generating new ones
+        self.plan_index = plan_index
     
     def create_mitigation_plan(self, risk_title: str, risk_description: str, 
                               project_type: str, project_name: str, 
                               probability: float, cost_impact: float, 
-                              time_impact: float) -> str:
+                              time_impact: float, examples: List[Dict] = None) -> str:
         """
         Create a mitigation plan for an identified risk
         
@@ -446,12 +760,14 @@ class MitigationPlanAgent:
             probability: Risk probability
             cost_impact: Cost impact
             time_impact: Time impact
+            examples: Plans of similar risks to adapt (see ``MitigationPlanIndex.examples``)
             
         Returns:
             Mitigation plan as a string
         """
         if not self.llm:
             # Return some default mitigation plans if OpenAI is not available
+            self._record_fallback("model not available")
             return self._get_default_mitigation_plan(risk_title, project_type)
         
         # Prepare the prompt
@@ -465,7 +781,7 @@ class MitigationPlanAgent:
         Risk Probability: {probability}
         Cost Impact: €{cost_impact:,.2f}
         Time Impact: {time_impact} weeks
-        
+        {self._format_examples(examples, "        ")}
         Your mitigation plan should:
         1. Identify specific actions to reduce probability
         2. Identify specific actions to reduce impact
@@ -477,14 +793,111 @@ class MitigationPlanAgent:
         
         try:
             # Generate response
-            result = self.llm.invoke(system_prompt)
-            return result.content
+            return self._invoke(system_prompt)
             
+        except RateLimitExhausted:
+            raise
         except Exception as e:
             print(f"Error in mitigation planning: {e}")
             # Fallback to default mitigation plans if the API call fails
+            self._record_fallback(f"error: {e}")
             return self._get_default_mitigation_plan(risk_title, project_type)
     
+    def create_mitigation_plans(self, risks: List[Dict]) -> List[str]:
+        """
+        Create mitigation plans for several risks with a single LLM call
+        
+        Risks similar enough to one with an existing plan (see ``plan_index``)
+        reuse that plan; only the others are sent to the model, and their new
+        plans are indexed in turn.
+        
+        Args:
+            risks: Risk dictionaries with title, description, level, project and evaluation
+            
+        Returns:
+            List of mitigation plans, in the same order as the risks
+        """
+        if not risks:
+            return []
+        
+        if self.plan_index is not None:
+            plans = [self.plan_index.find(risk) for risk in risks]
+            missing = [i for i, plan in enumerate(plans) if plan is None]
+            if missing:
+                generated = self._generate_mitigation_plans([risks[i] for i in missing])
+                for i, plan in zip(missing, generated):
+                    plans[i] = plan
+                    # Generic default plans (model unavailable or failing) are not worth reusing
+                    default = self._get_default_mitigation_plan(risks[i].get("Risk_Title", ""), risks[i].get("Level", ""))
+                    if plan != default:
+                        self.plan_index.add({**risks[i], "Mitigation_Plan": plan})
+            return plans
+        
+        return self._generate_mitigation_plans(risks)
+    
+    def _generate_mitigation_plans(self, risks: List[Dict]) -> List[str]:
+        """Create new mitigation plans for several risks with a single LLM call"""
+        
+        def single(risk):
+            return self.create_mitigation_plan(
+                risk_title=risk.get("Risk_Title", ""),
+                risk_description=risk.get("Risk_Description", ""),
+                project_type=risk.get("Level", ""),
+                project_name=risk.get("Project", ""),
+                probability=risk.get("Risk_Probability", 0.5),
+                cost_impact=risk.get("Cost_Impact", 1000000),
+                time_impact=risk.get("Time_Impact", 4),
+                examples=self._plan_examples(risk)
+            )
+        
+        if not self.llm:
+            return [single(risk) for risk in risks]
+        
+        results = self._invoke_batch(
+            risks, self._build_batch_prompt, MITIGATION_FIELDS, "plans",
+            lambda risk: {"Mitigation_Plan": single(risk)}
+        )
+        return [result["Mitigation_Plan"] for result in results]
+    
+    def _build_batch_prompt(self, risks: List[Dict]) -> str:
+        """Build the prompt creating mitigation plans for a numbered list of risks"""
+        risk_lines = "\n".join(
+            f"""        {i}. {risk.get("Risk_Title", "")} ({risk.get("Level", "")} level, project "{risk.get("Project", "")}")
+           Description: {risk.get("Risk_Description", "")}
+           Probability: {risk.get("Risk_Probability", 0.5)}, Cost Impact: €{risk.get("Cost_Impact", 1000000):,.2f}, Time Impact: {risk.get("Time_Impact", 4)} weeks"""
+            + self._format_examples(self._plan_examples(risk), "           ").rstrip("\n")
+            for i, risk in enumerate(risks, start=1)
+        )
+        
+        return f"""You are an expert in automotive risk mitigation. 
+        Create a detailed mitigation plan for each of the following risks:
+        
+{risk_lines}
+        
+        Each mitigation plan should:
+        1. Identify specific actions to reduce probability
+        2. Identify specific actions to reduce impact
+        3. Define clear responsibilities
+        4. Include contingency planning
+        5. Be realistic and implementable in the automotive industry
+        
+        Keep each plan concise but comprehensive. Return only a JSON object {{"plans": [...]}}
+        with one object per risk, using the keys "index" and "Mitigation_Plan"."""
+    
+    def _plan_examples(self, risk: Dict) -> List[Dict]:
+        """Existing plans of the risks most similar to a risk, if retrieval is enabled"""
+        return self.plan_index.examples(risk) if self.plan_index is not None else []
+    
+    @staticmethod
+    def _format_examples(examples: List[Dict], indent: str) -> str:
+        """Prompt lines showing the plans of similar risks, one per line (empty without examples)"""
+        if not examples:
+            return ""
+        # Plans are kept on one line each so they do not break the numbered list of risks
+        lines = [f'Plan used for the similar risk "{example["Risk_Title"]}" ({example["Project"]}): '
+                 f'{" ".join(example["Mitigation_Plan"].split())}' for example in examples]
+        return "\n" + "".join(f"{indent}{line}\n" for line in lines) + f"{indent}Adapt these plans where they fit.\n"
+    
     def _get_default_mitigation_plan(self, risk_title: str, project_type: str) -> str:
         """Get a default mitigation plan based on risk title and project type"""
         
@@ -523,115 +936,164 @@ class MitigationPlanAgent:
 class AgentCoordinator:
     """Coordinates multiple agents for the risk assessment process"""
     
-    def __init__(self):
+    def __init__(self, config_path: str = "config/agent_config.json", rate_limiter: RateLimiter = None):
         # Load configuration if available
-        self.config = self._load_config()
+        self.config = self._load_config(config_path)
+        
+        # Shared on-disk cache of LLM responses (None when disabled or bypassed)
+        self.response_cache = ResponseCache.from_config(self.config.get("response_cache", {}))
+        
+        # Rate limiter shared by all agents, so their calls draw on the same API quota
+        # (and by other coordinators when one is passed in)
+        self.rate_limiter = rate_limiter or RateLimiter.from_config(self.config.get("rate_limit", {}))
+        
+        # Unique Risk_IDs for the generated risks, reserved in blocks from the backend
+        self.risk_id_pool = RiskIdPool.from_config(self.config.get("risk_ids", {}))
+        
+        # Report of the last assessment run (see agents/tracing.py) and of its deduplication
+        self.last_run_report = None
+        self.last_dedup_report = None
+        
+        # Chat model clients of all agents share the process-wide HTTP connection pool
+        # (or come from the offline stand-in model with the "fake" backend)
+        self.llm_pool = create_llm_pool(self.config.get("llm_backend", {}))
+        
+        # Options shared by all agents
+        structured = self.config.get("structured_output", {})
+        agent_options = {
+            "cache": self.response_cache,
+            "rate_limiter": self.rate_limiter,
+            "llm_pool": self.llm_pool,
+            "structured_output": structured.get("enabled", True),
+            "max_repair_attempts": structured.get("max_repair_attempts", 1)
+        }
         
         # Initialize agents with temperature from config
         self.web_search_agent = WebSearchAgent(
-            temperature=self.config.get("web_search_agent", {}).get("temperature", 0.7)
+            temperature=self.config.get("web_search_agent", {}).get("temperature", 0.7),
+            **agent_options
         )
         
         self.risk_evaluation_agent = RiskEvaluationAgent(
-            temperature=self.config.get("risk_evaluation_agent", {}).get("temperature", 0.3)
+            temperature=self.config.get("risk_evaluation_agent", {}).get("temperature", 0.3),
+            **agent_options
         )
         
         self.mitigation_agent = MitigationPlanAgent(
-            temperature=self.config.get("mitigation_agent", {}).get("temperature", 0.6)
+            temperature=self.config.get("mitigation_agent", {}).get("temperature", 0.6),
+            plan_index=MitigationPlanIndex.from_config(self.config.get("mitigation_retrieval", {})),
+            **agent_options
         )
     
-    def _load_config(self) -> Dict:
+    def _load_config(self, config_path: str = "config/agent_config.json") -> Dict:
         """Load agent configuration from file"""
         try:
-            config_path = Path("config/agent_config.json")
+            config_path = Path(config_path)
             if config_path.exists():
                 with open(config_path, 'r') as f:
                     return json.load(f)
             
             # Default configuration if file doesn't exist
-            return {
-                "web_search_agent": {"enabled": True, "temperature": 0.7},
-                "risk_evaluation_agent": {"enabled": True, "temperature": 0.3},
-                "mitigation_agent": {"enabled": True, "temperature": 0.6}
-            }
+            return copy.deepcopy(DEFAULT_CONFIG)
         except Exception as e:
             print(f"Error loading configuration: {e}")
             # Return default configuration on error
-            return {
-                "web_search_agent": {"enabled": True, "temperature": 0.7},
-                "risk_evaluation_agent": {"enabled": True, "temperature": 0.3},
-                "mitigation_agent": {"enabled": True, "temperature": 0.6}
-            }
+            return copy.deepcopy(DEFAULT_CONFIG)
+    
+    def _get_max_workers(self) -> int:
+        """Get the concurrency limit for agent calls (1 means sequential)"""
+        concurrency = self.config.get("concurrency", {})
+        if not concurrency.get("enabled", True):
+            return 1
+        try:
+            return max(1, int(concurrency.get("max_workers", 8)))
+        except (TypeError, ValueError):
+            return 1
     
-    def generate_risk_assessment(self, initial_data: Dict) -> List[Dict]:
+    def _collect_nodes(self, initial_data: Dict) -> List[Dict]:
         """
-        Generate a risk assessment using the agent team
+        Flatten the catalogue hierarchy into the ordered list of nodes to assess
         
-        Args:
-            initial_data: Initial data with product range, projects, and components
-            
-        Returns:
-            List of dictionaries containing risk information
+        The order matches the sequential walk: each product range, then each of
+        its projects followed by the project's components.
         """
-        all_risks = []
-        
-        # Process each level of the hierarchy
+        nodes = []
         
-        # 1. Strategic level - Process each product range
         for product_range in initial_data.get("product_range", []):
             range_name = product_range.get("name", "Unknown Range")
             
-            # Get risks for the product range (strategic level)
-            if self.config.get("web_search_agent", {}).get("enabled", True):
-                strategic_risks = self.web_search_agent.search_risks(
-                    project_type="strategic",
-                    project_name=range_name
-                )
-                
-                all_risks.extend(strategic_risks)
+            # 1. Strategic level - the product range itself
+            nodes.append({
+                "key": node_key("strategic", range_name),
+                "project_type": "strategic",
+                "project_name": range_name,
+                "component_name": None
+            })
             
-            # 2. Project level - Process each project in the range
+            # 2. Project level - each project in the range
             for project in product_range.get("projects", []):
                 project_name = project.get("name", "Unknown Project")
+                nodes.append({
+                    "key": node_key("project", range_name, project_name),
+                    "project_type": "project",
+                    "project_name": project_name,
+                    "component_name": None
+                })
                 
-                # Get risks for the project (project level)
-                if self.config.get("web_search_agent", {}).get("enabled", True):
-                    project_risks = self.web_search_agent.search_risks(
-                        project_type="project",
-                        project_name=project_name
-                    )
-                    
-                    all_risks.extend(project_risks)
-                
-                # 3. Operational level - Process each component in the project
+                # 3. Operational level - each component in the project
                 for component in project.get("components", []):
                     component_name = component.get("name", "Unknown Component")
-                    
-                    # Get risks for the component (operational level)
-                    if self.config.get("web_search_agent", {}).get("enabled", True):
-                        component_risks = self.web_search_agent.search_risks(
-                            project_type="operational",
-                            project_name=project_name,
-                            component_name=component_name
-                        )
-                        
-                        all_risks.extend(component_risks)
+                    nodes.append({
+                        "key": node_key("operational", range_name, project_name, component_name),
+                        "project_type": "operational",
+                        "project_name": project_name,
+                        "component_name": component_name
+                    })
+        
+        return nodes
+    
+    def _search_node(self, node: Dict, tracer: RunTracer = None, queued_at: float = None) -> List[Dict]:
+        """Get the risks for a single catalogue node with the web search agent"""
+        if not self.config.get("web_search_agent", {}).get("enabled", True):
+            return []
         
-        # For each risk, enhance it with the risk evaluation agent if enabled
+        with trace_scope(tracer, node["key"], "search", queued_at):
+            risks = self.web_search_agent.search_risks(
+                project_type=node["project_type"],
+                project_name=node["project_name"],
+                component_name=node["component_name"]
+            )
+        
+        # Generated risks carry the full path of their node, which tells them
+        # apart from risks entered by hand and from namesake components
+        for risk in risks:
+            risk["Node"] = node["key"]
+        
+        # Replace the provisional IDs (R1, R2, ...) with globally unique ones here,
+        # in the worker, so the consumer of the assessment never waits on the allocator
+        if self.risk_id_pool is not None:
+            self.risk_id_pool.assign(risks)
+        return risks
+    
+    def _get_batch_size(self) -> int:
+        """Get the number of risks evaluated or mitigated per LLM call"""
+        try:
+            return max(1, int(self.config.get("batching", {}).get("batch_size", 5)))
+        except (TypeError, ValueError):
+            return 1
+    
+    def _enrich_batch(self, risks: List[Dict], node: str = None, tracer: RunTracer = None,
+                      queued_at: float = None) -> List[Dict]:
+        """Run the evaluation and mitigation stages for a batch of risks of a node"""
+        # Enhance the risks with the risk evaluation agent if enabled,
+        # skipping those that already have a complete evaluation
         if self.config.get("risk_evaluation_agent", {}).get("enabled", True):
-            for risk in all_risks:
-                # Skip if already has complete evaluation
-                if all(key in risk for key in ["Risk_Probability", "Cost_Impact", "Time_Impact", "Detection"]):
-                    continue
-                
-                # Get evaluation
-                evaluation = self.risk_evaluation_agent.evaluate_risk(
-                    risk_title=risk.get("Risk_Title", ""),
-                    risk_description=risk.get("Risk_Description", ""),
-                    project_type=risk.get("Level", ""),
-                    project_name=risk.get("Project", "")
-                )
-                
+            to_evaluate = [risk for risk in risks
+                           if not all(key in risk for key in ["Risk_Probability", "Cost_Impact", "Time_Impact", "Detection"])]
+            with trace_scope(tracer, node, "evaluation", queued_at):
+                evaluations = self.risk_evaluation_agent.evaluate_risks(to_evaluate)
+            
+            for risk, evaluation in zip(to_evaluate, evaluations):
                 # Update risk with evaluation
                 risk.update(evaluation)
                 
@@ -639,29 +1101,284 @@ class AgentCoordinator:
                 risk["RI_Cost"] = risk["Risk_Probability"] * risk["Cost_Impact"]
                 risk["RI_Time"] = risk["Risk_Probability"] * risk["Time_Impact"]
         
-        # For each risk, enhance it with mitigation plan if enabled
+        # Enhance the risks with a mitigation plan if enabled,
+        # skipping those that already have one
         if self.config.get("mitigation_agent", {}).get("enabled", True):
-            for risk in all_risks:
-                # Skip if already has mitigation plan
-                if "Mitigation_Plan" in risk and risk["Mitigation_Plan"]:
-                    continue
+            to_mitigate = [risk for risk in risks if not risk.get("Mitigation_Plan")]
+            with trace_scope(tracer, node, "mitigation"):
+                plans = self.mitigation_agent.create_mitigation_plans(to_mitigate)
+            
+            for risk, mitigation_plan in zip(to_mitigate, plans):
+                risk["Mitigation_Plan"] = mitigation_plan
+        
+        return risks
+    
+    def _split_batches(self, risks: List[Dict]) -> List[List[Dict]]:
+        """Split the risks of a node into batches of the configured size"""
+        batch_size = self._get_batch_size()
+        return [risks[i:i + batch_size] for i in range(0, len(risks), batch_size)]
+    
+    def generate_risk_assessment(self, initial_data: Dict, incremental: bool = False,
+                                 on_progress: Callable[[Dict], None] = None) -> List[Dict]:
+        """
+        Generate a risk assessment using the agent team
+        
+        Nodes are searched and their risks enriched concurrently on a bounded
+        thread pool (``concurrency.max_workers`` in the agent configuration).
+        Evaluation and mitigation handle ``batching.batch_size`` risks per LLM
+        call. Results are returned in the same order as a sequential run.
+        
+        Args:
+            initial_data: Initial data with product range, projects, and components
+            incremental: Only assess the nodes that are new or changed since the
+                last assessment (see ``merge_risk_assessment``)
+            on_progress: Called with every event of ``iter_risk_assessment``
+            
+        Returns:
+            List of dictionaries containing risk information
+        """
+        node_risks = {}
+        for event in self.iter_risk_assessment(initial_data, incremental=incremental):
+            if event["stage"] == "assessed":
+                node_risks[event["index"]] = event["risks"]
+            if on_progress is not None:
+                on_progress(event)
+        
+        return [risk for index in sorted(node_risks) for risk in node_risks[index]]
+    
+    def iter_risk_assessment(self, initial_data: Dict, incremental: bool = False):
+        """
+        Generate a risk assessment, yielding progress as each node finishes
+        
+        Two events are yielded per catalogue node, in completion order:
+        ``"searched"`` when its risks have been identified and ``"assessed"``
+        once they are evaluated and have a mitigation plan. Each event is a
+        dictionary with ``stage``, ``node`` (the node key), ``index`` (the
+        node's position in the catalogue), ``found`` (risks identified),
+        ``risks`` (the finished risks, empty for "searched"), ``completed``
+        (nodes assessed so far) and ``total``.
+        
+        Assessed nodes are recorded in the incremental manifest as they
+        finish, so an interrupted run resumes with the remaining nodes when
+        restarted with ``incremental=True``.
+        
+        Args:
+            initial_data: Initial data with product range, projects, and components
+            incremental: Only assess the nodes that are new or changed since the
+                last assessment
+        """
+        manifest = AssessmentManifest(
+            self.config.get("incremental", {}).get("manifest_path", "data/assessment_manifest.json")
+        )
+        fingerprints = manifest.fingerprint_catalogue(initial_data)
+        
+        nodes = self._collect_nodes(initial_data)
+        if incremental:
+            changed = manifest.changed_nodes(fingerprints)
+            nodes = [node for node in nodes if node["key"] in changed]
+        
+        tracing = self.config.get("tracing", {})
+        tracer = RunTracer() if tracing.get("enabled", True) else None
+        
+        # Near-duplicate risks across the hierarchy are enriched once per cluster
+        dedup = RiskDeduplicator.from_config(self.config.get("dedup", {}))
+        
+        completed = 0
+        try:
+            for stage, index, risks in self._iter_pipeline(nodes, tracer, dedup):
+                key = nodes[index]["key"]
+                if stage == "assessed":
+                    completed += 1
+                    manifest.mark_assessed(key, fingerprints[key])
+                    manifest.save()
                 
-                # Get mitigation plan
-                mitigation_plan = self.mitigation_agent.create_mitigation_plan(
-                    risk_title=risk.get("Risk_Title", ""),
-                    risk_description=risk.get("Risk_Description", ""),
-                    project_type=risk.get("Level", ""),
-                    project_name=risk.get("Project", ""),
-                    probability=risk.get("Risk_Probability", 0.5),
-                    cost_impact=risk.get("Cost_Impact", 1000000),
-                    time_impact=risk.get("Time_Impact", 4)
-                )
+                yield {
+                    "stage": stage,
+                    "node": key,
+                    "index": index,
+                    "found": len(risks),
+                    "risks": risks if stage == "assessed" else [],
+                    "completed": completed,
+                    "total": len(nodes)
+                }
+            
+            # Remember what has been assessed for the next incremental run
+            manifest.update(fingerprints)
+            manifest.save()
+        finally:
+            # The report also covers interrupted runs
+            self.last_dedup_report = dedup.stats() if dedup is not None else None
+            if tracer is not None:
+                tracer.finish()
+                self.last_run_report = tracer.report()
+                tracer.save(tracing.get("report_dir", REPORT_DIR))
+    
+    def _iter_pipeline(self, nodes: List[Dict], tracer: RunTracer = None, dedup: RiskDeduplicator = None):
+        """
+        Search and enrich the risks of the given nodes
+        
+        Yields ``("searched", index, risks)`` when the search of a node
+        finishes and ``("assessed", index, risks)`` once all of its risks are
+        enriched, in completion order.
+        
+        With a deduplicator, only the first risk of each cluster of
+        near-duplicates (its leader) is evaluated and mitigated; the other
+        members copy what they are missing from the leader once it is done.
+        """
+        max_workers = self._get_max_workers()
+        leaders = {}
+        
+        if max_workers == 1 or len(nodes) <= 1:
+            for index, node in enumerate(nodes):
+                risks = self._search_node(node, tracer)
+                yield "searched", index, risks
+                to_enrich, members = self._cluster_risks(risks, dedup, leaders)
+                for batch in self._split_batches(to_enrich):
+                    self._enrich_batch([risk for risk, _ in batch], node["key"], tracer)
+                for risk, cluster in members:
+                    copy_enrichment(leaders[cluster], risk)
+                yield "assessed", index, risks
+            return
+        
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="risk-agent")
+        try:
+            pending = {
+                executor.submit(self._search_node, node, tracer, time.perf_counter()): ("search", index, ())
+                for index, node in enumerate(nodes)
+            }
+            node_risks = {}
+            node_members = {}
+            remaining_batches = {}
+            # Clusters whose leader is not enriched yet, and the clusters each node waits for
+            unfinished_clusters = set()
+            waiting = {}
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                finished = []
+                for future in done:
+                    task, index, clusters = pending.pop(future)
+                    if task == "search":
+                        # Start enriching the risks of a node as soon as its search finishes
+                        risks = future.result()
+                        node_risks[index] = risks
+                        to_enrich, members = self._cluster_risks(risks, dedup, leaders)
+                        node_members[index] = members
+                        waiting[index] = {cluster for _, cluster in members if cluster in unfinished_clusters}
+                        
+                        batches = self._split_batches(to_enrich)
+                        remaining_batches[index] = len(batches)
+                        for batch in batches:
+                            batch_clusters = tuple(cluster for _, cluster in batch if cluster is not None)
+                            unfinished_clusters.update(batch_clusters)
+                            future = executor.submit(self._enrich_batch, [risk for risk, _ in batch],
+                                                     nodes[index]["key"], tracer, time.perf_counter())
+                            pending[future] = ("enrich", index, batch_clusters)
+                        yield "searched", index, risks
+                    else:
+                        future.result()
+                        remaining_batches[index] -= 1
+                        unfinished_clusters.difference_update(clusters)
+                        for other in waiting:
+                            waiting[other].difference_update(clusters)
+                    
+                    finished.extend(i for i in list(remaining_batches)
+                                    if remaining_batches[i] == 0 and not waiting[i] and i not in finished)
                 
-                # Update risk with mitigation plan
-                risk["Mitigation_Plan"] = mitigation_plan
+                for index in finished:
+                    del remaining_batches[index], waiting[index]
+                    for risk, cluster in node_members.pop(index):
+                        copy_enrichment(leaders[cluster], risk)
+                    yield "assessed", index, node_risks.pop(index)
+        finally:
+            # Stop scheduling work if the consumer stops early
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    @staticmethod
+    def _cluster_risks(risks: List[Dict], dedup: RiskDeduplicator, leaders: Dict) -> tuple:
+        """
+        Split the risks of a node into those to enrich and the near-duplicates of earlier risks
+        
+        Returns:
+            ``(risk, cluster)`` pairs of the risks to enrich (the new cluster
+            leaders; the cluster is None without deduplication) and of the
+            members that still miss an evaluation or mitigation plan
+        """
+        if dedup is None or not risks:
+            return [(risk, None) for risk in risks], []
+        
+        to_enrich, members = [], []
+        for risk, (cluster, is_leader) in zip(risks, dedup.assign(risks)):
+            if is_leader:
+                leaders[cluster] = risk
+                to_enrich.append((risk, cluster))
+            elif any(risk.get(key) in (None, "") for key in ENRICHED_FIELDS):
+                members.append((risk, cluster))
+        return to_enrich, members
+        
+    @staticmethod
+    def merge_risk_assessment(existing_risks: List[Dict], new_risks: List[Dict], nodes: List[str] = None) -> List[Dict]:
+        """
+        Merge the result of an incremental assessment into an existing risk set
         
-        return all_risks
+        The risks generated earlier for the reassessed nodes (same ``Node``
+        key) are replaced by the new ones; every other existing risk, including
+        all risks entered by hand, is kept as is.
         
+        Args:
+            existing_risks: The current risk set
+            new_risks: Risks of the reassessed nodes
+            nodes: Keys of the reassessed nodes (by default those of the new
+                risks; pass them for nodes that no longer have any risk)
+        """
+        reassessed = set(nodes) if nodes is not None else {risk.get("Node") for risk in new_risks}
+        reassessed.discard(None)
+        merged = [risk for risk in existing_risks if risk.get("Node") not in reassessed]
+        merged.extend(new_risks)
+        return merged
+    
+    def index_mitigation_plans(self, risks: List[Dict]) -> int:
+        """
+        Make the mitigation plans of existing risks (e.g. the register) available for reuse
+        
+        Returns:
+            Number of plans indexed (0 when retrieval is disabled)
+        """
+        if self.mitigation_agent.plan_index is None:
+            return 0
+        return self.mitigation_agent.plan_index.add_many(risks)
+    
+    def get_mitigation_retrieval_report(self) -> Dict:
+        """Indexed mitigation plans and how many were reused or generated"""
+        if self.mitigation_agent.plan_index is None:
+            return {"plans": 0, "hits": 0, "misses": 0}
+        return self.mitigation_agent.plan_index.stats()
+    
+    def get_dedup_report(self) -> Dict:
+        """Risks, clusters and merged near-duplicates of the last assessment run"""
+        return self.last_dedup_report or {"risks": 0, "clusters": 0, "merged": 0}
+    
+    def get_parse_report(self) -> Dict:
+        """Structured output parse counters and success rates of each agent"""
+        return {
+            "web_search_agent": self.web_search_agent.parse_stats.report(),
+            "risk_evaluation_agent": self.risk_evaluation_agent.parse_stats.report(),
+            "mitigation_agent": self.mitigation_agent.parse_stats.report()
+        }
+    
+    def get_client_pool_report(self) -> Dict:
+        """Client views and in-flight requests of the shared LLM client pool"""
+        return self.llm_pool.stats()
+    
+    def get_rate_limit_report(self) -> Dict:
+        """Adaptive concurrency level and throttling counters of the shared rate limiter"""
+        return self.rate_limiter.stats() if self.rate_limiter is not None else {}
+    
+    def set_cache_mode(self, mode: str):
+        """Switch the response cache between "use", "refresh" and "bypass" modes"""
+        if self.response_cache is not None:
+            self.response_cache.mode = mode
+    
     def update_risk_evaluation(self, risk: Dict) -> Dict:
         """Update the evaluation of a single risk"""
         if not self.config.get("risk_evaluation_agent", {}).get("enabled", True):
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+# Child collection of each level of the catalogue hierarchy
+CHILD_KEYS = {
+    "strategic": "projects",
+    "project": "components",
+    "operational": None
+}
+
+
+# Serializes the checkpoints of assessments running in the same process
+_save_lock = threading.Lock()
+
+
+def fingerprint(data: Any) -> str:
+    """Stable content hash of a JSON-serializable value"""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def node_key(project_type: str, *path: str) -> str:
+    """Key identifying a catalogue node, e.g. ``project::Range/Project``"""
+    return f"{project_type}::{'/'.join(path)}"
+
+
+class AssessmentManifest:
+    """
+    Record of the catalogue nodes covered by the last risk assessment
+
+    Every range/project/component is stored with two fingerprints: ``node``
+    covers the node's own attributes and decides whether it has to be assessed
+    again, ``subtree`` also covers its descendants so unchanged branches of
+    the catalogue are skipped without being compared node by node.
+    """
+
+    def __init__(self, path: str = "data/assessment_manifest.json"):
+        self.path = Path(path)
+        self.entries = {}
+        self.assessed_at = None
+
+        try:
+            if self.path.exists():
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                self.entries = data.get("nodes", {})
+                self.assessed_at = data.get("assessed_at")
+        except Exception as e:
+            print(f"Error loading assessment manifest: {e}")
+            self.entries = {}
+
+    def fingerprint_catalogue(self, initial_data: Dict) -> Dict[str, Dict]:
+        """Compute the node and subtree fingerprints of every node in the catalogue"""
+        fingerprints = {}
+
+        for product_range in initial_data.get("product_range", []):
+            range_name = product_range.get("name", "Unknown Range")
+            self._fingerprint_node(product_range, "strategic", (range_name,), fingerprints)
+
+        return fingerprints
+
+    def _fingerprint_node(self, node: Dict, project_type: str, path: tuple, fingerprints: Dict) -> str:
+        """Fingerprint a node and its descendants, returning the subtree fingerprint"""
+        child_key = CHILD_KEYS[project_type]
+        local = {k: v for k, v in node.items() if k != child_key}
+        node_fingerprint = fingerprint(local)
+
+        child_fingerprints = []
+        child_keys = []
+        if child_key:
+            child_type = "project" if project_type == "strategic" else "operational"
+            default_name = "Unknown Project" if child_type == "project" else "Unknown Component"
+            for child in node.get(child_key, []):
+                child_path = path + (child.get("name", default_name),)
+                child_fingerprints.append(
+                    self._fingerprint_node(child, child_type, child_path, fingerprints)
+                )
+                child_keys.append(node_key(child_type, *child_path))
+
+        subtree_fingerprint = fingerprint([node_fingerprint, child_fingerprints])
+        fingerprints[node_key(project_type, *path)] = {
+            "node": node_fingerprint,
+            "subtree": subtree_fingerprint,
+            "children": child_keys
+        }
+        return subtree_fingerprint
+
+    def changed_nodes(self, fingerprints: Dict[str, Dict]) -> Set[str]:
+        """Return the keys of the nodes that are new or modified since the last assessment"""
+        changed = set()
+        roots = [key for key in fingerprints if key.startswith("strategic::")]
+        self._collect_changed(roots, fingerprints, changed)
+        return changed
+
+    def _collect_changed(self, keys: List[str], fingerprints: Dict[str, Dict], changed: Set[str]):
+        for key in keys:
+            current = fingerprints[key]
+            previous = self.entries.get(key)
+
+            # Nothing in this branch changed since the last assessment
+            if previous is not None and previous.get("subtree") == current["subtree"]:
+                continue
+
+            if previous is None or previous.get("node") != current["node"]:
+                changed.add(key)
+
+            self._collect_changed(current["children"], fingerprints, changed)
+
+    def mark_assessed(self, key: str, entry: Dict):
+        """
+        Record a single node as assessed while an assessment is still running
+
+        Only the node itself is covered: the subtree fingerprint of a node
+        with children is cleared so its descendants are still compared on
+        the next run.
+        """
+        self.entries[key] = dict(entry, subtree=None if entry["children"] else entry["subtree"])
+
+    def update(self, fingerprints: Dict[str, Dict]):
+        """Replace the manifest with the fingerprints of the catalogue just assessed"""
+        self.entries = dict(fingerprints)
+        self.assessed_at = datetime.now().isoformat()
+
+    def save(self):
+        """Write the manifest to disk, replacing the file atomically"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f"{self.path.name}.{threading.get_ident()}.tmp")
+            with _save_lock:
+                with open(temp_path, 'w') as f:
+                    json.dump({"assessed_at": self.assessed_at, "nodes": self.entries}, f, indent=2)
+                os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Error saving assessment manifest: {e}")
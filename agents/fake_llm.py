@@ -0,0 +1,314 @@
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .llm_pool import LLMClientPool
+from .structured_output import EVALUATION_FIELDS, MITIGATION_FIELDS, RISK_FIELDS
+
+# Risk themes per catalogue level, as (title, description) templates
+RISK_THEMES = {
+    "strategic": [
+        ("Market Demand Shift", "Changing customer preferences reduce demand for {target}"),
+        ("Regulatory Change", "New emission and safety regulations require a redesign of {target}"),
+        ("Competitor Technology Leap", "Competitors launch more advanced alternatives to {target}"),
+        ("Raw Material Price Volatility", "Rising prices of steel, aluminium and battery materials erode the margin of {target}"),
+        ("Electrification Transition", "The shift to electric powertrains makes the current plans for {target} obsolete"),
+        ("Currency Exposure", "Exchange rate swings change the landed cost of {target} in export markets")
+    ],
+    "project": [
+        ("Supply Chain Disruption", "Shortages of critical parts delay the production ramp-up of {target}"),
+        ("Integration Delays", "Interfaces between subsystems of {target} need more iterations than planned"),
+        ("Budget Overrun", "Engineering changes push the development cost of {target} over budget"),
+        ("Resource Constraints", "Key engineers are shared with other programs, slowing down {target}"),
+        ("Homologation Issues", "Type approval tests of {target} reveal non-conformities late in the program"),
+        ("Software Maturity", "Vehicle software for {target} is not mature at the start of validation")
+    ],
+    "operational": [
+        ("Quality Defects", "Manufacturing variation causes defects in {target} found at end of line"),
+        ("Supplier Capacity", "The supplier of {target} cannot deliver the required volumes"),
+        ("Test Equipment Failure", "Breakdowns of test benches delay the validation of {target}"),
+        ("Tooling Wear", "Tooling for {target} wears faster than expected and needs early replacement"),
+        ("Warranty Claims", "Field failures of {target} increase warranty costs"),
+        ("Process Capability", "The production process of {target} does not reach the required capability")
+    ]
+}
+
+MITIGATION_ACTIONS = [
+    "Qualify a second source for the critical parts",
+    "Hold weekly risk reviews with the cross-functional team",
+    "Add design reviews with the suppliers before tooling release",
+    "Build a schedule buffer into the validation plan",
+    "Increase safety stock for long lead-time parts",
+    "Run an FMEA workshop and track the resulting actions",
+    "Set up early warning indicators in the program dashboard",
+    "Assign a dedicated risk owner with escalation rights",
+    "Prepare a contingency budget approved by the steering committee",
+    "Pilot the change on a limited series before full rollout"
+]
+
+_ISSUE_PATTERN = re.compile(r"level issue: (.*?) in automotive industry")
+_LEVEL_PATTERN = re.compile(r"risks for (\w+) level issue")
+_NUMBERED_LINE = re.compile(r"^\s*\d+\. ", re.MULTILINE)
+_MALFORMED_PATTERN = re.compile(r"were malformed:\s*\n\s*(\[.*\])\s*\n", re.DOTALL)
+
+
+class FakeAPIError(Exception):
+    """Simulated API failure, carrying the HTTP status code like the OpenAI errors"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakeMessage:
+    """Chat model response with the ``content`` and ``usage_metadata`` of a langchain message"""
+
+    def __init__(self, content: str, input_tokens: int, output_tokens: int):
+        self.content = content
+        self.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }
+
+
+def _count_tokens(text: str) -> int:
+    # Roughly four characters per token, like the rate limiter estimate
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel:
+    """
+    Offline stand-in for the chat model, for benchmarks and tests without API access
+
+    Answers are generated from the prompt and, for structured output, from
+    the JSON schema of its ``response_format``: the risks, evaluations and
+    mitigation plans look like model answers and validate against the agents'
+    field specifications. The same prompt always gets the same answer for a
+    given seed (the n-th repetition of a prompt is seeded separately, so a
+    retried call can succeed after a simulated failure).
+
+    Latency follows a ``constant``, ``uniform`` or ``lognormal`` distribution,
+    plus an optional time per completion token, and can be scaled down with
+    ``time_scale``. Failures are raised with the rates given in ``errors``:
+    ``rate_limit`` (HTTP 429), ``server_error`` (HTTP 500) and ``malformed``
+    (an item missing a required field, which exercises the repair path).
+    """
+
+    def __init__(self, model: str = "gpt-4o", temperature: float = 0.0, seed: int = 0,
+                 latency: Dict = None, errors: Dict = None, time_scale: float = 1.0):
+        self.model_name = model
+        self.temperature = temperature
+        self.seed = seed
+        self.latency = latency or {"distribution": "constant", "seconds": 0.0}
+        self.errors = errors or {}
+        self.time_scale = time_scale
+
+        self._lock = threading.Lock()
+        self._repetitions = {}
+        self.calls = 0
+
+    def _rng(self, prompt: str, options: Dict) -> random.Random:
+        """Random generator seeded by the prompt and how often it has been sent before"""
+        signature = json.dumps([self.seed, self.model_name, self.temperature, prompt, options],
+                               sort_keys=True, default=str)
+        digest = hashlib.sha256(signature.encode("utf-8")).hexdigest()
+        with self._lock:
+            repetition = self._repetitions.get(digest, 0)
+            self._repetitions[digest] = repetition + 1
+            self.calls += 1
+        return random.Random(f"{digest}:{repetition}")
+
+    def _sample_latency(self, rng: random.Random, output_tokens: int) -> float:
+        spec = self.latency
+        distribution = spec.get("distribution", "constant")
+        if distribution == "uniform":
+            seconds = rng.uniform(spec.get("low", 0.0), spec.get("high", 1.0))
+        elif distribution == "lognormal":
+            seconds = rng.lognormvariate(math.log(spec.get("median", 1.0)), spec.get("sigma", 0.5))
+        else:
+            seconds = spec.get("seconds", 0.0)
+        seconds += output_tokens * spec.get("per_output_token", 0.0)
+        return seconds * self.time_scale
+
+    def invoke(self, prompt: str, **options) -> FakeMessage:
+        """
+        Answer a prompt like ``ChatOpenAI.invoke``
+
+        Raises:
+            FakeAPIError: With the configured rate-limit and server error rates
+        """
+        rng = self._rng(prompt, options)
+
+        failure = rng.random()
+        rate_limit = self.errors.get("rate_limit", 0.0)
+        if failure < rate_limit:
+            time.sleep(self._sample_latency(rng, 0) * 0.1)
+            raise FakeAPIError("Rate limit reached (simulated)", 429)
+        if failure < rate_limit + self.errors.get("server_error", 0.0):
+            time.sleep(self._sample_latency(rng, 0))
+            raise FakeAPIError("Internal server error (simulated)", 500)
+
+        content = self._answer(prompt, options.get("response_format"), rng)
+        input_tokens, output_tokens = _count_tokens(prompt), _count_tokens(content)
+        time.sleep(self._sample_latency(rng, output_tokens))
+        return FakeMessage(content, input_tokens, output_tokens)
+
+    # Answers
+
+    def _answer(self, prompt: str, response_format: Optional[Dict], rng: random.Random) -> str:
+        if response_format is not None:
+            schema = response_format.get("json_schema", {}).get("schema", {})
+            list_key, properties = self._schema_fields(schema)
+        else:
+            list_key, properties = self._prompt_fields(prompt)
+
+        if properties is None:
+            # Free-text answers for the prompts without a JSON format
+            if "Evaluate the following risk" in prompt:
+                return self._evaluation_text(rng)
+            if "Identify the most common risks" in prompt:
+                return self._risks_text(prompt, rng)
+            return self._mitigation_plan(rng)
+
+        if list_key is None:
+            count = 1
+        elif list_key == "risks":
+            count = rng.randint(3, 5)
+        else:
+            count = self._count_items(prompt)
+        malformed = self._count_malformed(prompt)
+        if malformed:
+            count = malformed if list_key is not None else 1
+
+        target, level = self._target(prompt)
+        items = []
+        for index in range(1, count + 1):
+            item = {name: self._field_value(name, index, target, level, rng) for name in properties}
+            if not malformed and rng.random() < self.errors.get("malformed", 0.0):
+                item.pop(next(iter(item)))
+            items.append(item)
+
+        return json.dumps({list_key: items} if list_key is not None else items[0], ensure_ascii=False)
+
+    @staticmethod
+    def _schema_fields(schema: Dict) -> Tuple[Optional[str], List[str]]:
+        """The list key (None for a single object) and item fields of a response schema"""
+        properties = schema.get("properties", {})
+        if len(properties) == 1:
+            list_key, spec = next(iter(properties.items()))
+            if spec.get("type") == "array":
+                return list_key, list(spec.get("items", {}).get("properties", {}))
+        return None, list(properties)
+
+    @staticmethod
+    def _prompt_fields(prompt: str) -> Tuple[Optional[str], Optional[List[str]]]:
+        """The JSON format a prompt asks for without a schema, (None, None) for free text"""
+        if '{"evaluations"' in prompt:
+            return "evaluations", ["index", *EVALUATION_FIELDS]
+        if '{"plans"' in prompt:
+            return "plans", ["index", *MITIGATION_FIELDS]
+        if '{"risks"' in prompt:
+            return "risks", list(RISK_FIELDS)
+        return None, None
+
+    @staticmethod
+    def _count_items(prompt: str) -> int:
+        """Number of risks in the numbered list of a batch prompt"""
+        _, _, rest = prompt.partition("following risks:")
+        blocks = [block for block in re.split(r"\n[ \t]*\n", rest) if block.strip()]
+        return max(1, len(_NUMBERED_LINE.findall(blocks[0]))) if blocks else 1
+
+    @staticmethod
+    def _count_malformed(prompt: str) -> int:
+        """Number of items a repair prompt asks for again (0 for other prompts)"""
+        match = _MALFORMED_PATTERN.search(prompt)
+        if not match:
+            return 0
+        try:
+            return len(json.loads(match.group(1)))
+        except json.JSONDecodeError:
+            return 1
+
+    @staticmethod
+    def _target(prompt: str) -> Tuple[str, str]:
+        issue = _ISSUE_PATTERN.search(prompt)
+        level = _LEVEL_PATTERN.search(prompt)
+        return (" ".join(issue.group(1).split()) if issue else "the vehicle program",
+                level.group(1) if level and level.group(1) in RISK_THEMES else "project")
+
+    def _field_value(self, name: str, index: int, target: str, level: str, rng: random.Random):
+        if name == "index":
+            return index
+        if name in ("Risk_Title", "Risk_Description"):
+            title, description = rng.choice(RISK_THEMES[level])
+            return title if name == "Risk_Title" else description.format(target=target)
+        if name == "Risk_Probability":
+            return round(rng.uniform(0.1, 0.8), 2)
+        if name == "Cost_Impact":
+            return int(round(rng.lognormvariate(math.log(1_000_000), 1.0), -3))
+        if name == "Time_Impact":
+            return rng.randint(1, 26)
+        if name == "Detection":
+            return round(rng.uniform(0.2, 0.9), 2)
+        if name == "Mitigation_Plan":
+            return self._mitigation_plan(rng)
+        return ""
+
+    @staticmethod
+    def _mitigation_plan(rng: random.Random) -> str:
+        actions = rng.sample(MITIGATION_ACTIONS, rng.randint(3, 5))
+        return " ".join(f"{i}. {action}." for i, action in enumerate(actions, start=1))
+
+    def _evaluation_text(self, rng: random.Random) -> str:
+        return (f"Risk Probability: {self._field_value('Risk_Probability', 1, '', 'project', rng)}\n"
+                f"Cost Impact: {self._field_value('Cost_Impact', 1, '', 'project', rng)}\n"
+                f"Time Impact: {self._field_value('Time_Impact', 1, '', 'project', rng)} weeks\n"
+                f"Detection: {self._field_value('Detection', 1, '', 'project', rng)}")
+
+    def _risks_text(self, prompt: str, rng: random.Random) -> str:
+        target, level = self._target(prompt)
+        sections = []
+        for i, (title, description) in enumerate(rng.sample(RISK_THEMES[level], rng.randint(3, 5)), start=1):
+            sections.extend([
+                f"Risk {i}: {title}",
+                f"Description: {description.format(target=target)}",
+                f"Cost Impact: {self._field_value('Cost_Impact', i, target, level, rng)}",
+                f"Time Impact: {self._field_value('Time_Impact', i, target, level, rng)} weeks",
+                f"Detection: {self._field_value('Detection', i, target, level, rng)}",
+                f"Mitigation: {self._mitigation_plan(rng)}",
+                f"Probability: {self._field_value('Risk_Probability', i, target, level, rng)}"
+            ])
+        return "\n\n".join(sections)
+
+
+class FakeLLMPool(LLMClientPool):
+    """Client pool handing out ``FakeChatModel`` clients instead of OpenAI ones"""
+
+    uses_http = False
+
+    def __init__(self, seed: int = 0, latency: Dict = None, errors: Dict = None, time_scale: float = 1.0):
+        super().__init__()
+        self.seed = seed
+        self.latency = latency
+        self.errors = errors
+        self.time_scale = time_scale
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "FakeLLMPool":
+        """Build the pool from the ``llm_backend.fake`` section of the agent configuration"""
+        return cls(
+            seed=config.get("seed", 0),
+            latency=config.get("latency"),
+            errors=config.get("errors"),
+            time_scale=config.get("time_scale", 1.0)
+        )
+
+    def _create_client(self, model: str, temperature: float, api_key: str = None, **options) -> FakeChatModel:
+        return FakeChatModel(model, temperature, seed=self.seed, latency=self.latency,
+                             errors=self.errors, time_scale=self.time_scale)
@@ -0,0 +1,144 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    from langchain_openai import ChatOpenAI
+except ImportError:
+    ChatOpenAI = None
+
+try:
+    import h2  # noqa: F401 - HTTP/2 support for httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class LLMClientPool:
+    """
+    Process-wide pool of chat model clients sharing one HTTP connection pool
+
+    Every client handed out by ``get`` is a lightweight view bound to a model,
+    temperature and API key; all of them send their requests through the same
+    keep-alive ``httpx.Client`` (HTTP/2 when the ``h2`` package is installed),
+    so connections are opened once per process rather than once per agent.
+    Calls wrapped in ``track`` are counted to report in-flight requests.
+    """
+
+    # Whether the clients of the pool talk to the API over HTTP
+    uses_http = True
+
+    def __init__(self, max_connections: int = 32, max_keepalive_connections: int = 16,
+                 keepalive_expiry: float = 60.0, timeout: float = 120.0):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._in_flight = {}
+        self._requests = {}
+
+        self.http2 = HTTP2_AVAILABLE
+        self.http_client = None
+        if httpx is not None and self.uses_http:
+            self.http_client = httpx.Client(
+                http2=self.http2,
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry
+                )
+            )
+
+    def get(self, model: str, temperature: float, api_key: str = None, **options):
+        """
+        Return the chat model client for a model and temperature, creating it on first use
+
+        Raises:
+            RuntimeError: If langchain-openai is not installed
+        """
+        key = (model, temperature, api_key, tuple(sorted(options.items())))
+        with self._lock:
+            view = self._views.get(key)
+            if view is None:
+                view = self._create_client(model, temperature, api_key, **options)
+                self._views[key] = view
+                # Views with other options share the name; keep the requests already counted
+                self._in_flight.setdefault(self._view_name(model, temperature), 0)
+            return view
+
+    def _create_client(self, model: str, temperature: float, api_key: str = None, **options):
+        if ChatOpenAI is None:
+            raise RuntimeError("langchain-openai is not installed")
+        if self.http_client is not None:
+            options["http_client"] = self.http_client
+        return ChatOpenAI(model=model, temperature=temperature, api_key=api_key, **options)
+
+    @staticmethod
+    def _view_name(model: str, temperature: float) -> str:
+        return f"{model}@{temperature}"
+
+    @contextmanager
+    def track(self, model: str, temperature: float):
+        """Count a request to a model/temperature view while it is in flight"""
+        name = self._view_name(model, temperature)
+        with self._lock:
+            self._in_flight[name] = self._in_flight.get(name, 0) + 1
+            self._requests[name] = self._requests.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight[name] -= 1
+
+    def stats(self) -> Dict:
+        """Number of client views and in-flight/total requests per view"""
+        with self._lock:
+            return {
+                "views": len(self._views),
+                "http2": self.http2,
+                "in_flight": sum(self._in_flight.values()),
+                "in_flight_by_view": dict(self._in_flight),
+                "requests_by_view": dict(self._requests)
+            }
+
+    def close(self):
+        """Close the shared HTTP connections"""
+        if self.http_client is not None:
+            self.http_client.close()
+
+
+_shared_pool: Optional[LLMClientPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_llm_pool() -> LLMClientPool:
+    """Return the process-wide client pool, creating it on first use"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = LLMClientPool()
+        return _shared_pool
+
+
+def create_llm_pool(config: Dict = None) -> LLMClientPool:
+    """
+    Return the client pool for the ``llm_backend`` section of the agent configuration
+
+    The ``openai`` backend (the default) uses the process-wide pool. The
+    ``fake`` backend answers every prompt offline with a deterministic stand-in
+    model (see agents/fake_llm.py), configured by the ``fake`` subsection. The
+    ``RISK_LLM_BACKEND`` environment variable overrides the configured type.
+    """
+    config = config or {}
+    backend = os.getenv("RISK_LLM_BACKEND") or config.get("type", "openai")
+    if backend == "fake":
+        from .fake_llm import FakeLLMPool
+        return FakeLLMPool.from_config(config.get("fake", {}))
+    if backend != "openai":
+        print(f"Unknown LLM backend '{backend}', using OpenAI")
+    return get_llm_pool()
@@ -0,0 +1,114 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from .text_similarity import SimilarityIndex, risk_terms
+
+# Italian level names of the catalogue and the form, mapped to the generated ones
+LEVEL_ALIASES = {"strategico": "strategic", "progetto": "project", "operativo": "operational"}
+
+
+def _level(risk: Dict) -> str:
+    level = str(risk.get("Level", "")).strip().lower()
+    return LEVEL_ALIASES.get(level, level)
+
+
+class MitigationPlanIndex:
+    """
+    Retrieval index of existing mitigation plans
+
+    Plans of the risk register (and those generated during the run) are
+    indexed by the hashed TF-IDF vector of their risk. A new risk whose
+    nearest indexed risk of the same level reaches ``threshold`` cosine
+    similarity reuses that risk's plan, with the project or component name
+    replaced by its own, instead of a model call. The other risks are sent
+    to the model with the plans of up to ``examples`` indexed risks reaching
+    ``example_threshold`` as examples to adapt (see ``examples``).
+    """
+
+    def __init__(self, threshold: float = 0.85, min_length: int = 40, examples: int = 2,
+                 example_threshold: float = 0.3):
+        self.threshold = threshold
+        self.example_count = examples
+        self.example_threshold = example_threshold
+        # Shorter plans are placeholders such as "To be determined"
+        self.min_length = min_length
+        self._lock = threading.Lock()
+        self._index = SimilarityIndex()
+        self._sources: List[Dict] = []
+        # Risks already indexed, so the register can be indexed again before every run
+        self._indexed = set()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional["MitigationPlanIndex"]:
+        """Build an index from the ``mitigation_retrieval`` section of the agent configuration"""
+        if not config.get("enabled", True):
+            return None
+        return cls(
+            threshold=config.get("threshold", 0.85),
+            min_length=config.get("min_length", 40),
+            examples=config.get("examples", 2),
+            example_threshold=config.get("example_threshold", 0.3)
+        )
+
+    def add(self, risk: Dict) -> bool:
+        """Index the plan of a risk, returning False if it has no reusable plan or is already indexed"""
+        plan = risk.get("Mitigation_Plan")
+        if not isinstance(plan, str) or len(plan.strip()) < self.min_length:
+            return False
+
+        key = (risk.get("Risk_ID"), risk.get("Project"), risk.get("Risk_Title"), plan)
+        counts = risk_terms(risk)
+        with self._lock:
+            if key in self._indexed:
+                return False
+            self._indexed.add(key)
+            self._index.observe(counts)
+            self._index.add(counts, _level(risk))
+            self._sources.append({
+                "Risk_Title": risk.get("Risk_Title", ""),
+                "Project": risk.get("Project", ""),
+                "Mitigation_Plan": plan
+            })
+        return True
+
+    def add_many(self, risks: Iterable[Dict]) -> int:
+        """Index the plans of several risks, returning how many were indexed"""
+        return sum(self.add(risk) for risk in risks)
+
+    def find(self, risk: Dict) -> Optional[str]:
+        """The plan of the most similar indexed risk, adapted to this risk's project, or None"""
+        counts = risk_terms(risk)
+        match = self._index.nearest(counts, _level(risk), self.threshold)
+        with self._lock:
+            if match is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            source = self._sources[match[0]]
+
+        plan, source_project, project = source["Mitigation_Plan"], source["Project"], risk.get("Project")
+        if source_project and project and source_project != project:
+            plan = plan.replace(source_project, project)
+        return plan
+
+    def examples(self, risk: Dict) -> List[Dict]:
+        """
+        Plans of the indexed risks most similar to a risk, to guide a new plan
+
+        Returns:
+            Up to ``examples`` dictionaries with the ``Risk_Title``, ``Project``,
+            ``Mitigation_Plan`` and ``similarity`` of an indexed risk, most
+            similar first
+        """
+        if self.example_count <= 0:
+            return []
+        matches = self._index.most_similar(risk_terms(risk), _level(risk), self.example_count, self.example_threshold)
+        with self._lock:
+            return [{**self._sources[entry], "similarity": similarity} for entry, similarity in matches]
+
+    def stats(self) -> Dict:
+        """Indexed plans and the plans served from or missed by the index"""
+        with self._lock:
+            return {"plans": len(self._sources), "hits": self.hits, "misses": self.misses}
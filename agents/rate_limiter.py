@@ -0,0 +1,213 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Exception class names of the OpenAI client for failures worth retrying
+RETRYABLE_ERRORS = ("RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError")
+
+
+class RateLimitExhausted(Exception):
+    """Raised when a call is still throttled or failing after every retry"""
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error is throttling (429), a server error (5xx) or a connection failure"""
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Delay requested by the server in a Retry-After header, if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate_per_minute``, holding at most one minute of budget"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if they are now)"""
+        self._refill(now)
+        # A request larger than the bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    Client-side rate limiter shared by every agent calling the OpenAI API
+
+    Each call waits for budget in a requests-per-minute and a
+    tokens-per-minute bucket and for a free concurrency slot. The number of
+    slots adapts AIMD-style: it grows by about one for every window of
+    successful calls and is halved when the API throttles or fails (at most
+    once per ``base_delay``, as concurrent calls usually fail together).
+    Throttled, 5xx and connection failures are retried with jittered exponential
+    backoff (honouring Retry-After); once the retries are exhausted
+    ``RateLimitExhausted`` is raised instead of returning made-up data.
+    """
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 30000,
+                 max_concurrency: int = 8, min_concurrency: int = 1, max_retries: int = 6,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        # Start from the top and let throttling find the sustainable level
+        self.concurrency = float(self.max_concurrency)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self.throttled = 0
+        self.retries = 0
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional["RateLimiter"]:
+        """Build a limiter from the ``rate_limit`` section of the agent configuration"""
+        if not config.get("enabled", True):
+            return None
+
+        return cls(
+            requests_per_minute=config.get("requests_per_minute", 500),
+            tokens_per_minute=config.get("tokens_per_minute", 30000),
+            max_concurrency=config.get("max_concurrency", 8),
+            min_concurrency=config.get("min_concurrency", 1),
+            max_retries=config.get("max_retries", 6),
+            base_delay=config.get("base_delay", 1.0),
+            max_delay=config.get("max_delay", 60.0)
+        )
+
+    def _acquire(self, tokens: int) -> float:
+        """Wait for a slot and budget, returning the seconds spent waiting"""
+        started = time.monotonic()
+        with self._changed:
+            while True:
+                now = time.monotonic()
+                if self.in_flight < int(self.concurrency):
+                    wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                    if wait == 0:
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        self.in_flight += 1
+                        return now - started
+                    self._changed.wait(wait)
+                else:
+                    self._changed.wait()
+
+    def _release(self, throttled: bool):
+        with self._changed:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.base_delay:
+                    self._last_decrease = now
+                    self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+            else:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._changed.notify_all()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the real usage of a call is known"""
+        with self._changed:
+            if actual_tokens > estimated_tokens:
+                self.tokens.take(actual_tokens - estimated_tokens)
+            else:
+                self.tokens.give_back(estimated_tokens - actual_tokens)
+                self._changed.notify_all()
+
+    def call(self, fn: Callable[[], T], estimated_tokens: int = 1000, timing: Dict = None) -> T:
+        """
+        Run an API call within the limits, retrying throttled and failed calls
+
+        Args:
+            fn: The call to make
+            estimated_tokens: Expected prompt + completion tokens of the call
+            timing: Filled with the ``queue_time`` spent waiting for the limits
+                and backoff, and the number of ``retries``
+
+        Raises:
+            RateLimitExhausted: If the call still fails after ``max_retries`` retries
+        """
+        attempt = 0
+        if timing is None:
+            timing = {}
+        timing.update(queue_time=0.0, retries=0)
+        while True:
+            timing["queue_time"] += self._acquire(estimated_tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    self._release(throttled=False)
+                    raise
+                # Throttling and server errors both mean the API is overloaded
+                self._release(throttled=True)
+
+                if attempt >= self.max_retries:
+                    raise RateLimitExhausted(f"API call failed after {attempt + 1} attempts: {e}") from e
+
+                # Full jitter keeps the retries of concurrent calls apart
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, min(retry_after, self.max_delay))
+
+                attempt += 1
+                timing["retries"] = attempt
+                timing["queue_time"] += delay
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+                continue
+
+            self._release(throttled=False)
+            return result
+
+    def stats(self) -> Dict:
+        """Current concurrency limit and throttling counters"""
+        with self._lock:
+            return {
+                "concurrency": round(self.concurrency, 2),
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+                "retries": self.retries
+            }
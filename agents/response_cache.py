@@ -0,0 +1,138 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Cache modes:
+#   "use"     - read from and write to the cache (default)
+#   "refresh" - ignore cached entries but store the fresh responses
+#   "bypass"  - do not touch the cache at all
+CACHE_MODES = ("use", "refresh", "bypass")
+
+
+class ResponseCache:
+    """Persistent, content-addressed cache for LLM responses backed by SQLite"""
+
+    def __init__(self, path: str = "data/llm_cache.sqlite", ttl_hours: float = 168,
+                 max_entries: int = 5000, mode: str = "use"):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_hours * 3600 if ttl_hours else None
+        self.max_entries = max_entries
+        self.mode = mode if mode in CACHE_MODES else "use"
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)"
+        )
+        self._connection.commit()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional["ResponseCache"]:
+        """Build a cache from the ``response_cache`` section of the agent configuration"""
+        if not config.get("enabled", True) or config.get("mode", "use") == "bypass":
+            return None
+
+        try:
+            return cls(
+                path=config.get("path", "data/llm_cache.sqlite"),
+                ttl_hours=config.get("ttl_hours", 168),
+                max_entries=config.get("max_entries", 5000),
+                mode=config.get("mode", "use")
+            )
+        except Exception as e:
+            print(f"Error initializing response cache: {e}")
+            return None
+
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str, options: Dict = None) -> str:
+        """Hash the model, temperature, rendered prompt and request options into a cache key"""
+        key_data = {"model": model, "temperature": temperature, "prompt": prompt}
+        if options:
+            key_data["options"] = options
+        payload = json.dumps(key_data, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None if missing or expired"""
+        if self.mode != "use":
+            self.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._connection.commit()
+                self.misses += 1
+                return None
+
+            self._connection.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+            self.hits += 1
+            return response
+
+    def put(self, key: str, response: str):
+        """Store a response and evict the least recently used entries if over size"""
+        if self.mode == "bypass":
+            return
+
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+
+            if self.max_entries:
+                self._connection.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+
+            self._connection.commit()
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current number of entries"""
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "mode": self.mode
+        }
@@ -0,0 +1,78 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .text_similarity import SimilarityIndex, risk_terms
+
+# Fields filled by the evaluation and mitigation stages, copied from a cluster's leader
+ENRICHED_FIELDS = ("Risk_Probability", "Cost_Impact", "Time_Impact", "Detection", "Mitigation_Plan")
+
+
+class RiskDeduplicator:
+    """
+    Online clustering of near-duplicate risks with hashed TF-IDF embeddings
+
+    Each risk is embedded with ``risk_terms`` (hashed word unigrams and
+    bigrams of its title and description, without the words of its node's
+    name). A risk joins the cluster whose leader is the most similar one of
+    the same level, if the cosine similarity reaches ``threshold``; otherwise
+    it leads a new cluster. Candidate leaders come from an inverted index of
+    the hashed features, so a risk is only compared with the leaders it
+    shares words with.
+    """
+
+    def __init__(self, threshold: float = 0.8):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._index = SimilarityIndex()
+        self.risks = 0
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional["RiskDeduplicator"]:
+        """Build a deduplicator from the ``dedup`` section of the agent configuration"""
+        if not config.get("enabled", True):
+            return None
+        return cls(threshold=config.get("threshold", 0.8))
+
+    def assign(self, risks: List[Dict]) -> List[Tuple[int, bool]]:
+        """
+        Cluster risks
+
+        Returns:
+            For every risk, its cluster id and whether it leads the cluster
+        """
+        assignments = []
+        with self._lock:
+            counts = [risk_terms(risk) for risk in risks]
+            for risk_counts in counts:
+                self._index.observe(risk_counts)
+
+            for risk, risk_counts in zip(risks, counts):
+                self.risks += 1
+                level = str(risk.get("Level", "")).lower()
+                match = self._index.nearest(risk_counts, level, self.threshold)
+                if match is not None:
+                    assignments.append((match[0], False))
+                else:
+                    assignments.append((self._index.add(risk_counts, level), True))
+        return assignments
+
+    def stats(self) -> Dict:
+        """Number of risks clustered, clusters and risks merged into an existing cluster"""
+        with self._lock:
+            return {
+                "risks": self.risks,
+                "clusters": len(self._index),
+                "merged": self.risks - len(self._index)
+            }
+
+
+def copy_enrichment(leader: Dict, member: Dict):
+    """Fill the evaluation and mitigation plan a member of a cluster is missing from its leader"""
+    for key in ENRICHED_FIELDS:
+        if member.get(key) in (None, "") and leader.get(key) not in (None, ""):
+            member[key] = leader[key]
+
+    if "Risk_Probability" in member and "Cost_Impact" in member:
+        member["RI_Cost"] = member["Risk_Probability"] * member["Cost_Impact"]
+    if "Risk_Probability" in member and "Time_Impact" in member:
+        member["RI_Time"] = member["Risk_Probability"] * member["Time_Impact"]
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Backend API used when neither the configuration nor BACKEND_URL names one (as in app.py)
+DEFAULT_BACKEND_URL = 'https://risk-assessment-backend.onrender.com/api'
+
+# Reserves ``count`` IDs for a level and project and returns them
+ReserveIds = Callable[[str, str, int], List[str]]
+
+
+def backend_reserve(backend_url: str, timeout: float = 5.0) -> ReserveIds:
+    """Reserve IDs from the ``/ids`` endpoint of the backend"""
+    import requests
+
+    def reserve(level: str, project: str, count: int) -> List[str]:
+        response = requests.post(
+            f"{backend_url}/ids",
+            json={"level": level, "project": project, "count": count},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()["ids"]
+
+    return reserve
+
+
+def local_reserve(level: str, project: str, count: int) -> List[str]:
+    """Random IDs (``L`` followed by hex digits), which cannot clash with the allocated ones"""
+    return [f"L{uuid.uuid4().hex[:12].upper()}" for _ in range(count)]
+
+
+class RiskIdPool:
+    """
+    Hands out unique Risk_IDs to the generated risks
+
+    IDs are reserved from the central allocator of the backend per level and
+    project: ``next_id`` takes them from blocks of ``block_size`` IDs, while
+    ``assign`` reserves exactly the IDs missing for a group of risks in one
+    call. If the allocator cannot be reached, random IDs (see
+    ``local_reserve``) are used instead, and the allocator is not asked again
+    for ``retry_after`` seconds.
+    """
+
+    def __init__(self, reserve: ReserveIds, block_size: int = 20, retry_after: float = 60.0):
+        self.reserve = reserve
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self._blocks: Dict[tuple, deque] = {}
+        self._block_locks: Dict[tuple, threading.Lock] = {}
+        self.retry_after = retry_after
+        self._unavailable_until = 0.0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional["RiskIdPool"]:
+        """
+        Build a pool from the ``risk_ids`` section of the agent configuration
+
+        IDs are reserved from the ``backend_url`` of the section, or else from
+        the same backend as the Streamlit app (``BACKEND_URL`` or its
+        default), so generated risks and risks entered in the form share one
+        sequence.
+        """
+        if not config.get("enabled", True):
+            return None
+
+        backend_url = config.get("backend_url") or os.getenv("BACKEND_URL", DEFAULT_BACKEND_URL)
+        return cls(backend_reserve(backend_url), block_size=config.get("block_size", 20),
+                   retry_after=config.get("retry_after", 60.0))
+
+    def _refill(self, level: str, project: str, count: int) -> List[str]:
+        with self._lock:
+            available = time.monotonic() >= self._unavailable_until
+        if available:
+            try:
+                return list(self.reserve(level, project, count))
+            except Exception as e:
+                print(f"Warning: cannot reserve risk IDs from the backend ({e}), "
+                      f"using local IDs for {self.retry_after:.0f}s")
+                with self._lock:
+                    self._unavailable_until = time.monotonic() + self.retry_after
+
+        with self._lock:
+            self.fallbacks += 1
+        return local_reserve(level, project, count)
+
+    def _block(self, key: tuple) -> tuple:
+        with self._lock:
+            block_lock = self._block_locks.setdefault(key, threading.Lock())
+            block = self._blocks.setdefault(key, deque())
+        return block, block_lock
+
+    def next_id(self, level: str, project: str) -> str:
+        """Next unused ID for a risk of a level and project"""
+        block, block_lock = self._block((level, project))
+        # Only workers waiting for the same block wait for its reservation
+        with block_lock:
+            if not block:
+                block.extend(self._refill(level, project, self.block_size))
+            return block.popleft()
+
+    def assign(self, risks: List[Dict]) -> List[Dict]:
+        """
+        Replace the provisional Risk_IDs of newly generated risks
+
+        The IDs of each level and project are reserved with a single call,
+        for exactly the risks the current block cannot cover, so no IDs are
+        left unused.
+        """
+        groups: Dict[tuple, List[Dict]] = {}
+        for risk in risks:
+            groups.setdefault((risk.get("Level", ""), risk.get("Project", "")), []).append(risk)
+
+        for (level, project), group in groups.items():
+            block, block_lock = self._block((level, project))
+            with block_lock:
+                if len(block) < len(group):
+                    block.extend(self._refill(level, project, len(group) - len(block)))
+                for risk in group:
+                    risk["Risk_ID"] = block.popleft()
+        return risks
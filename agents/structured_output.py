@@ -0,0 +1,179 @@
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Field specifications of the structured agent responses.
+# "range" values are clamped, probabilities given as percentages are rescaled.
+RISK_FIELDS = {
+    "Risk_Title": {"type": "string", "required": True},
+    "Risk_Description": {"type": "string", "required": False},
+    "Risk_Probability": {"type": "number", "required": True, "range": (0.0, 1.0), "percent": True},
+    "Cost_Impact": {"type": "integer", "required": True, "range": (0, None)},
+    "Time_Impact": {"type": "integer", "required": True, "range": (0, None)},
+    "Detection": {"type": "number", "required": False, "range": (0.0, 1.0), "percent": True},
+    "Mitigation_Plan": {"type": "string", "required": False}
+}
+
+EVALUATION_FIELDS = {
+    "Risk_Probability": RISK_FIELDS["Risk_Probability"],
+    "Cost_Impact": RISK_FIELDS["Cost_Impact"],
+    "Time_Impact": RISK_FIELDS["Time_Impact"],
+    "Detection": dict(RISK_FIELDS["Detection"], required=True)
+}
+
+MITIGATION_FIELDS = {
+    "Mitigation_Plan": {"type": "string", "required": True}
+}
+
+_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+# 1-based position of the item answered by each entry of a batch response
+INDEX_FIELD = {"index": {"type": "integer", "required": True}}
+
+
+def response_format(name: str, fields: Dict[str, Dict], list_key: str = None) -> Dict:
+    """
+    Build an OpenAI ``response_format`` with the JSON schema of a response
+
+    Args:
+        name: Name of the schema
+        fields: Field specification (e.g. RISK_FIELDS)
+        list_key: Wrap the items in an array under this key
+    """
+    properties = {key: {"type": spec["type"]} for key, spec in fields.items()}
+
+    schema = {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+    if list_key:
+        schema = {
+            "type": "object",
+            "properties": {list_key: {"type": "array", "items": schema}},
+            "required": [list_key],
+            "additionalProperties": False
+        }
+
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": schema, "strict": True}
+    }
+
+
+def extract_json(response: str) -> Any:
+    """Parse the JSON payload of an LLM response, tolerating code fences and surrounding text"""
+    fenced = _FENCE_PATTERN.search(response)
+    text = fenced.group(1) if fenced else response
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    # Fall back to the outermost object or array in the text
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON payload in response")
+    start = min(starts)
+    end = text.rfind("}" if text[start] == "{" else "]")
+    return json.loads(text[start:end + 1])
+
+
+def extract_items(response: str, list_key: str = None) -> List[Any]:
+    """Return the items of a response: a bare array, ``{list_key: [...]}`` or a single object"""
+    data = extract_json(response)
+    if isinstance(data, dict):
+        data = data[list_key] if list_key and list_key in data else [data]
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a list of {list_key or 'items'}")
+    return data
+
+
+def _coerce_number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise ValueError("boolean is not a number")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _NUMBER_PATTERN.search(value.replace(",", "").replace("_", ""))
+        if match:
+            return float(match.group())
+    raise ValueError(f"not a number: {value!r}")
+
+
+def validate_item(item: Any, fields: Dict[str, Dict]) -> Tuple[Optional[Dict], List[str]]:
+    """
+    Validate and normalize one response item against a field specification
+
+    Returns:
+        The normalized item (None if invalid) and the list of validation errors
+    """
+    if not isinstance(item, dict):
+        return None, ["item is not an object"]
+
+    result, errors = {}, []
+    for key, spec in fields.items():
+        value = item.get(key)
+        if value is None or value == "":
+            if spec.get("required"):
+                errors.append(f"missing {key}")
+            continue
+
+        if spec["type"] == "string":
+            if not isinstance(value, str):
+                errors.append(f"{key} is not a string")
+                continue
+            result[key] = value.strip()
+            continue
+
+        try:
+            number = _coerce_number(value)
+        except ValueError as e:
+            errors.append(f"{key}: {e}")
+            continue
+
+        low, high = spec.get("range", (None, None))
+        if spec.get("percent") and high == 1.0 and 1.0 < number <= 100.0:
+            number /= 100.0
+        if low is not None:
+            number = max(number, low)
+        if high is not None:
+            number = min(number, high)
+        result[key] = int(round(number)) if spec["type"] == "integer" else number
+
+    return (result if not errors else None), errors
+
+
+class ParseStats:
+    """Thread-safe counters of structured response items parsed, repaired and rejected"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.items = 0
+        self.valid = 0
+        self.repaired = 0
+        self.failed_responses = 0
+
+    def record(self, items: int = 0, valid: int = 0, repaired: int = 0, failed_response: bool = False):
+        with self._lock:
+            self.items += items
+            self.valid += valid
+            self.repaired += repaired
+            self.failed_responses += int(failed_response)
+
+    def report(self) -> Dict:
+        """Counters plus the share of items that were usable on the first pass and after repair"""
+        with self._lock:
+            return {
+                "items": self.items,
+                "valid": self.valid,
+                "repaired": self.repaired,
+                "failed_responses": self.failed_responses,
+                "first_pass_rate": round(self.valid / self.items, 3) if self.items else None,
+                "success_rate": round((self.valid + self.repaired) / self.items, 3) if self.items else None
+            }
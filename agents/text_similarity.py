@@ -0,0 +1,148 @@
+import heapq
+import math
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+# Words carrying no meaning for risk similarity
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that the their this to
+with will within due may can could risk risks issue issues potential level project
+""".split())
+
+DIMENSIONS = 2 ** 18
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text: str, ignore: frozenset = frozenset()) -> List[str]:
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(str(text or "").lower()):
+        # Crude plural folding: "delays" and "delay" are the same word
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        if token not in STOPWORDS and token not in ignore:
+            tokens.append(token)
+    return tokens
+
+
+def risk_terms(risk: Dict, dimensions: int = DIMENSIONS) -> Dict[int, int]:
+    """
+    Hashed term counts of a risk
+
+    The features are the word unigrams and bigrams of the title (counted
+    twice) and description. The words of the risk's own project or
+    component name are left out, so "Supplier delays for Model A" and
+    "Supplier delays for Model B" look alike.
+    """
+    ignore = frozenset(_tokens(risk.get("Project", "")))
+    counts: Dict[int, int] = {}
+    for text, weight in ((risk.get("Risk_Title", ""), 2), (risk.get("Risk_Description", ""), 1)):
+        words = _tokens(text, ignore)
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            key = zlib.crc32(feature.encode("utf-8")) % dimensions
+            counts[key] = counts.get(key, 0) + weight
+    return counts
+
+
+class SimilarityIndex:
+    """
+    Inverted index of hashed term vectors, searched by TF-IDF cosine similarity
+
+    Entries are grouped by a partition (the risk level), and a query is only
+    compared with the entries of its partition that share a feature with it,
+    taken from the rarest shared features first and at most
+    ``max_candidates`` of them. Term weights use the document frequencies of
+    every vector passed to ``observe``, so they improve as more risks are
+    seen. The weights and norm of an entry are computed when it is added and
+    refreshed once the number of observed documents has grown by
+    ``refresh_growth`` since, so a query never reweighs the whole partition.
+    """
+
+    def __init__(self, max_candidates: int = 200, refresh_growth: float = 0.25):
+        self.max_candidates = max_candidates
+        self.refresh_growth = refresh_growth
+        self._lock = threading.Lock()
+        self._document_frequency: Dict[int, int] = {}
+        self._documents = 0
+        self._entries: List[Dict[int, int]] = []
+        # Weights and norm of each entry, with the document count they were computed at
+        self._weighted: List[Tuple[Dict[int, float], float, int]] = []
+        self._postings: Dict[str, Dict[int, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def observe(self, counts: Dict[int, int]):
+        """Count a vector in the document frequencies"""
+        with self._lock:
+            self._documents += 1
+            for key in counts:
+                self._document_frequency[key] = self._document_frequency.get(key, 0) + 1
+
+    def add(self, counts: Dict[int, int], partition: str = "") -> int:
+        """Index a vector, returning its entry id"""
+        with self._lock:
+            entry = len(self._entries)
+            self._entries.append(counts)
+            self._weighted.append((*self._weights(counts), self._documents))
+            postings = self._postings.setdefault(partition, {})
+            for key in counts:
+                postings.setdefault(key, []).append(entry)
+            return entry
+
+    def _weights(self, counts: Dict[int, int]) -> Tuple[Dict[int, float], float]:
+        """TF-IDF weights of term counts and their norm"""
+        weights = {
+            key: (1 + math.log(count)) * math.log((1 + self._documents) / (1 + self._document_frequency.get(key, 0)) + 1)
+            for key, count in counts.items()
+        }
+        return weights, math.sqrt(sum(w * w for w in weights.values())) or 1.0
+
+    def _entry_weights(self, entry: int) -> Tuple[Dict[int, float], float]:
+        """Cached weights and norm of an entry, refreshed if the document frequencies moved on"""
+        weights, norm, documents = self._weighted[entry]
+        if self._documents > documents * (1 + self.refresh_growth):
+            weights, norm = self._weights(self._entries[entry])
+            self._weighted[entry] = (weights, norm, self._documents)
+        return weights, norm
+
+    def _candidates(self, counts: Dict[int, int], postings: Dict[int, List[int]]) -> set:
+        """Entries sharing a feature with a vector, from its rarest features first"""
+        candidates = set()
+        lists = sorted((postings[key] for key in counts if key in postings), key=len)
+        for entries in lists:
+            if len(candidates) >= self.max_candidates:
+                break
+            candidates.update(entries[:self.max_candidates - len(candidates)])
+        return candidates
+
+    def most_similar(self, counts: Dict[int, int], partition: str = "", k: int = 1,
+                     threshold: float = 0.0) -> List[Tuple[int, float]]:
+        """
+        The entries of a partition most similar to a vector
+
+        Returns:
+            Up to ``k`` ``(entry, similarity)`` pairs reaching ``threshold``,
+            most similar first (the earliest entry first on ties)
+        """
+        with self._lock:
+            candidates = self._candidates(counts, self._postings.get(partition, {}))
+            if not candidates:
+                return []
+
+            weights, norm = self._weights(counts)
+            scored = []
+            for entry in candidates:
+                entry_weights, entry_norm = self._entry_weights(entry)
+                dot = sum(weight * entry_weights.get(key, 0.0) for key, weight in weights.items())
+                similarity = dot / (norm * entry_norm)
+                if similarity >= threshold:
+                    scored.append((entry, similarity))
+            return heapq.nsmallest(k, scored, key=lambda pair: (-pair[1], pair[0]))
+
+    def nearest(self, counts: Dict[int, int], partition: str = "", threshold: float = 0.0) -> Optional[Tuple[int, float]]:
+        """The most similar entry of a partition and its similarity, if it reaches ``threshold``"""
+        matches = self.most_similar(counts, partition, 1, threshold)
+        return matches[0] if matches else None
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# USD per million prompt / completion tokens, used for the cost estimate
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60)
+}
+
+REPORT_DIR = "data/run_reports"
+
+_scope = threading.local()
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a call, 0 for models without a known price"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def _empty_totals() -> Dict:
+    return {
+        "calls": 0,
+        "wall_time": 0.0,
+        "queue_time": 0.0,
+        "call_time": 0.0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cost": 0.0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "retries": 0,
+        "fallbacks": 0
+    }
+
+
+class RunTracer:
+    """
+    Collects timings, token usage and fallbacks of one risk assessment run
+
+    LLM calls and fallbacks are attributed to the catalogue node and pipeline
+    stage of the enclosing ``trace_scope`` of the current thread. Stage
+    scopes also record their own wall time and, for work submitted to a
+    thread pool, the time spent waiting in the queue.
+    """
+
+    def __init__(self, run_id: str = None):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.started_at = datetime.now().isoformat()
+        self.finished_at = None
+        self._start = time.perf_counter()
+        self._wall_time = None
+        self._lock = threading.Lock()
+        self.calls: List[Dict] = []
+        self.stages: List[Dict] = []
+        self.fallbacks: List[Dict] = []
+
+    def record_call(self, agent: str, model: str, call_time: float, queue_time: float = 0.0,
+                    prompt_tokens: int = 0, completion_tokens: int = 0, cache_hit: bool = False,
+                    retries: int = 0):
+        """Record one LLM call (or a response served from the cache)"""
+        node, stage = current_scope()[1:]
+        with self._lock:
+            self.calls.append({
+                "agent": agent,
+                "model": model,
+                "node": node,
+                "stage": stage,
+                "call_time": call_time,
+                "queue_time": queue_time,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost": 0.0 if cache_hit else estimate_cost(model, prompt_tokens, completion_tokens),
+                "cache_hit": cache_hit,
+                "retries": retries
+            })
+
+    def record_fallback(self, agent: str, reason: str):
+        """Record that an agent returned mock or default data instead of a model answer"""
+        node, stage = current_scope()[1:]
+        with self._lock:
+            self.fallbacks.append({"agent": agent, "node": node, "stage": stage, "reason": reason})
+
+    def record_stage(self, node: Optional[str], stage: str, wall_time: float, queue_time: float = 0.0):
+        with self._lock:
+            self.stages.append({"node": node, "stage": stage, "wall_time": wall_time, "queue_time": queue_time})
+
+    def finish(self):
+        self.finished_at = datetime.now().isoformat()
+        self._wall_time = time.perf_counter() - self._start
+
+    def report(self) -> Dict:
+        """Aggregate the run per stage, per node and per agent"""
+        with self._lock:
+            calls, stages, fallbacks = list(self.calls), list(self.stages), list(self.fallbacks)
+
+        totals = _empty_totals()
+        groups = {"by_stage": {}, "by_node": {}, "by_agent": {}}
+
+        def add(target: Dict, values: Dict):
+            for key, value in values.items():
+                target[key] += value
+
+        for call in calls:
+            values = {
+                "calls": 1,
+                "call_time": call["call_time"],
+                "queue_time": call["queue_time"],
+                "prompt_tokens": call["prompt_tokens"],
+                "completion_tokens": call["completion_tokens"],
+                "cost": call["cost"],
+                "cache_hits": int(call["cache_hit"]),
+                "cache_misses": int(not call["cache_hit"]),
+                "retries": call["retries"]
+            }
+            add(totals, values)
+            for group, key in (("by_stage", call["stage"]), ("by_node", call["node"]), ("by_agent", call["agent"])):
+                add(groups[group].setdefault(str(key), _empty_totals()), values)
+
+        # Stage wall time includes parsing and waiting for the rate limiter
+        for stage in stages:
+            values = {"wall_time": stage["wall_time"]}
+            add(groups["by_stage"].setdefault(stage["stage"], _empty_totals()), values)
+            add(groups["by_node"].setdefault(str(stage["node"]), _empty_totals()), values)
+            # Time spent waiting for a worker thread, on top of the rate limiter waits
+            if stage["queue_time"]:
+                groups["by_stage"][stage["stage"]]["queue_time"] += stage["queue_time"]
+                groups["by_node"][str(stage["node"])]["queue_time"] += stage["queue_time"]
+
+        for fallback in fallbacks:
+            totals["fallbacks"] += 1
+            for group, key in (("by_stage", fallback["stage"]), ("by_node", fallback["node"]), ("by_agent", fallback["agent"])):
+                groups[group].setdefault(str(key), _empty_totals())["fallbacks"] += 1
+
+        wall_time = self._wall_time if self._wall_time is not None else time.perf_counter() - self._start
+        totals["wall_time"] = wall_time
+        bottleneck = max(groups["by_stage"].items(), key=lambda item: item[1]["wall_time"], default=(None, None))[0]
+
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "totals": totals,
+            "bottleneck_stage": bottleneck,
+            **groups,
+            "fallbacks": fallbacks
+        }
+
+    def save(self, directory: str = REPORT_DIR) -> Optional[Path]:
+        """Write the run report as JSON, returning its path"""
+        try:
+            path = Path(directory) / f"run_{self.run_id}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(self.report(), f, indent=2)
+            return path
+        except Exception as e:
+            print(f"Error saving run report: {e}")
+            return None
+
+
+@contextmanager
+def trace_scope(tracer: Optional[RunTracer], node: str = None, stage: str = None, queued_at: float = None):
+    """
+    Attribute the LLM calls of the current thread to a node and stage
+
+    When ``queued_at`` (a ``time.perf_counter()`` value) is given, the time
+    since then is recorded as the time the work waited for a worker.
+    """
+    previous = current_scope()
+    started = time.perf_counter()
+    _scope.value = (tracer, node, stage)
+    try:
+        yield tracer
+    finally:
+        _scope.value = previous
+        if tracer is not None and stage is not None:
+            tracer.record_stage(node, stage, time.perf_counter() - started,
+                                started - queued_at if queued_at is not None else 0.0)
+
+
+def current_scope() -> tuple:
+    """The (tracer, node, stage) of the current thread, all None outside a run"""
+    return getattr(_scope, "value", (None, None, None))
+
+
+def current_tracer() -> Optional[RunTracer]:
+    return current_scope()[0]
+
+
+def list_run_reports(directory: str = REPORT_DIR) -> List[Path]:
+    """Saved run reports, most recent first"""
+    path = Path(directory)
+    if not path.exists():
+        return []
+    return sorted(path.glob("run_*.json"), reverse=True)
@@ -1,17 +1,27 @@
 import streamlit as st
+import hashlib
 import json
 import pandas as pd
 import plotly.express as px
 from pathlib import Path
 import os
 import requests
-import numpy as np
+import uuid
 
 # Import custom modules
 from agents.agent_coordinator import AgentCoordinator
+from agents.rate_limiter import RateLimitExhausted
+from agents.risk_ids import DEFAULT_BACKEND_URL, RiskIdPool, backend_reserve
+from agents.tracing import list_run_reports
+from catalogue import CatalogueIndex, load_catalogue
+from simulation import simulate_portfolio
+from visualization.dashboard import (
+    level_distribution_chart, loss_distribution_chart, risk_dataframe, rollup_nodes, rollup_treemap, top_risks_chart
+)
+from visualization.risk_matrix import MAX_POINTS as MATRIX_MAX_POINTS, build_risk_matrix, dense_cells, filter_cell
 
 # Backend API URL
-BACKEND_URL = os.getenv('BACKEND_URL', 'https://risk-assessment-backend.onrender.com/api')
+BACKEND_URL = os.getenv('BACKEND_URL', DEFAULT_BACKEND_URL)
 
 # Set page configuration
 st.set_page_config(
@@ -130,75 +140,166 @@ st.markdown("""
 if 'risk_data' not in st.session_state:
     st.session_state.risk_data = []
     
+# Bumped on every change of risk_data, so derived data is rebuilt only when needed
+if 'risk_data_version' not in st.session_state:
+    st.session_state.risk_data_version = 0
+    
+# Local copy of the backend register (storage key -> risk) and its revision
+if 'risk_store' not in st.session_state:
+    st.session_state.risk_store = {}
+    
+if 'risk_revision' not in st.session_state:
+    st.session_state.risk_revision = None
+    
+# Pages of the risk register already downloaded, with their ETag
+if 'risk_pages' not in st.session_state:
+    st.session_state.risk_pages = {}
+    
+# Identifies this session's jobs, so the backend can share its workers fairly
+if 'user_id' not in st.session_state:
+    st.session_state.user_id = uuid.uuid4().hex
+    
+# Id of the risk assessment running on the backend, if any
+if 'assessment_job' not in st.session_state:
+    st.session_state.assessment_job = None
+    
 if 'current_view' not in st.session_state:
     st.session_state.current_view = "dashboard"
     
 if 'selected_level' not in st.session_state:
     st.session_state.selected_level = "Tutti i Livelli"
 
-# Function to load initial data
+# Function to load the product catalogue. The file is parsed and indexed
+# only when it changes, so reruns reuse the same index.
 def load_initial_data():
     try:
-        with open('data/initial_data.json', 'r') as f:
-            data = json.load(f)
-            # Extract all risks into a flat list
-            all_risks = []
-            for range_item in data["product_range"]:
-                # Add strategic risks
-                if "rischi_strategici" in range_item:
-                    all_risks.extend(range_item["rischi_strategici"])
-                
-                # Add project risks
-                for project in range_item.get("projects", []):
-                    if "rischi_progetto" in project:
-                        all_risks.extend(project["rischi_progetto"])
-                    
-                    # Add operational risks
-                    for component in project.get("components", []):
-                        if "rischi_operativi" in component:
-                            all_risks.extend(component["rischi_operativi"])
-            
-            # Set the risk data in session state
-            st.session_state.risk_data = all_risks
-            return data
+        catalogue = load_catalogue('data/initial_data.json')
+        
+        # Seed the risk data only when the backend register is empty
+        if not st.session_state.risk_data:
+            st.session_state.risk_data = list(catalogue.risks)
+            touch_risk_data()
+        return catalogue
     except FileNotFoundError:
         st.error("File dati iniziali non trovato")
-        return {"product_range": []}
+        return CatalogueIndex({"product_range": []})
     except Exception as e:
         st.error(f"Errore nel caricamento dei dati iniziali: {str(e)}")
-        return {"product_range": []}
+        return CatalogueIndex({"product_range": []})
 
-# Function to load risk data from backend
+# Function to sync the local copy of the risk data with the backend.
+# Only the changes since the last known revision are downloaded.
 def load_risk_data():
+    params = {}
+    if st.session_state.risk_revision is not None:
+        params["since"] = st.session_state.risk_revision
+    
     try:
-        response = requests.get(f"{BACKEND_URL}/risks")
+        response = requests.get(f"{BACKEND_URL}/risks/changes", params=params)
         if response.status_code == 200:
-            data = response.json()
-            # Ensure data is a list of dictionaries
-            if isinstance(data, list):
-                st.session_state.risk_data = data
-            else:
+            payload = response.json()
+            if not isinstance(payload, dict) or not isinstance(payload.get("changes"), list):
                 st.error("Formato dati non valido dal backend")
-                st.session_state.risk_data = []
+                return
+            
+            store = st.session_state.risk_store
+            if payload.get("reset"):
+                store.clear()
+            for change in payload["changes"]:
+                if change.get("op") == "delete":
+                    store.pop(change.get("key"), None)
+                else:
+                    store[change.get("key")] = change.get("risk")
+            
+            # Rebuild the risk list only when something changed
+            if payload.get("reset") or payload["changes"]:
+                st.session_state.risk_data = list(store.values())
+                touch_risk_data()
+            st.session_state.risk_revision = payload.get("revision")
         else:
             st.error("Impossibile caricare i dati dal backend")
-            st.session_state.risk_data = []
     except requests.exceptions.ConnectionError:
+        # Keep working on the local copy until the backend is reachable again
         st.error("Impossibile connettersi al backend. Assicurati che il server Flask sia in esecuzione.")
-        st.session_state.risk_data = []
     except Exception as e:
         st.error(f"Errore nel caricamento dei dati: {str(e)}")
-        st.session_state.risk_data = []
 
-# Function to save risk data to backend
-def save_risk_data():
+# Function to load one filtered, sorted page of risks from the backend
+def fetch_risk_page(level=None, sort=None, offset=0, limit=50):
+    params = {"offset": offset, "limit": limit}
+    if level:
+        params["level"] = level
+    if sort:
+        params["sort"] = sort
+    
+    # Revalidate a page already downloaded instead of fetching it again
+    page_key = json.dumps(params, sort_keys=True)
+    cached = st.session_state.risk_pages.get(page_key)
+    headers = {"If-None-Match": cached["etag"]} if cached else {}
+    
     try:
-        # Ensure risk_data is a list of dictionaries
-        if not isinstance(st.session_state.risk_data, list):
-            st.error("Formato dati non valido per il salvataggio")
-            return
-            
-        response = requests.post(f"{BACKEND_URL}/risks", json=st.session_state.risk_data)
+        response = requests.get(f"{BACKEND_URL}/risks", params=params, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached["risks"], cached["total"]
+        if response.status_code == 200 and isinstance(response.json(), list):
+            total = int(response.headers.get("X-Total-Count", len(response.json())))
+            if response.headers.get("ETag"):
+                if len(st.session_state.risk_pages) >= 50:
+                    st.session_state.risk_pages.pop(next(iter(st.session_state.risk_pages)))
+                st.session_state.risk_pages[page_key] = {
+                    "etag": response.headers["ETag"], "risks": response.json(), "total": total
+                }
+            return response.json(), total
+    except requests.exceptions.RequestException:
+        pass
+    return None
+
+# Function to fetch the aggregates of the register by range, project and component,
+# precomputed by the backend
+def fetch_rollup(path=(), depth=-1):
+    try:
+        response = requests.get(f"{BACKEND_URL}/rollup", params={"path": list(path), "depth": depth})
+        if response.status_code == 200:
+            return response.json()
+    except requests.exceptions.RequestException:
+        pass
+    return None
+
+# Function to save the risks of an assessed catalogue node in the backend with a single request.
+# With replace, the risks generated for the node by earlier assessments are deleted first.
+def save_node_risks(node, risks, replace):
+    response = requests.post(f"{BACKEND_URL}/risks/node",
+                             json={"node": node, "risks": risks, "replace": replace})
+    return response.status_code == 200
+
+# Function to queue a risk assessment on the backend; returns the job or None
+def submit_assessment_job(initial_data, incremental):
+    response = requests.post(f"{BACKEND_URL}/jobs",
+                             json={"initial_data": initial_data, "incremental": incremental},
+                             headers={"X-User": st.session_state.user_id})
+    return response.json().get("job") if response.status_code == 202 else None
+
+# Function to get the status and progress of a backend job
+def fetch_job(job_id):
+    try:
+        response = requests.get(f"{BACKEND_URL}/jobs/{job_id}")
+        if response.status_code == 200:
+            return response.json()
+    except requests.exceptions.RequestException:
+        pass
+    return None
+
+# Function to save a risk created or edited in the form to the backend.
+# Only that risk is sent, so the other records of the register are never overwritten.
+def save_risk(risk, update):
+    try:
+        response = None
+        if update:
+            response = requests.put(f"{BACKEND_URL}/risks/{risk['Risk_ID']}", json=risk)
+        # A risk seeded from the catalogue may not be stored on the backend yet
+        if response is None or response.status_code == 404:
+            response = requests.post(f"{BACKEND_URL}/risks", json=risk)
+        
         if response.status_code != 200:
             st.error("Impossibile salvare i dati nel backend")
     except requests.exceptions.ConnectionError:
@@ -206,39 +307,76 @@ def save_risk_data():
     except Exception as e:
         st.error(f"Errore nel salvataggio dei dati: {str(e)}")
 
+# Function to mark the risk data as changed after it is replaced or edited
+def touch_risk_data():
+    st.session_state.risk_data_version += 1
+
+# Function to get a content hash of the risk data, recomputed only after a change
+def risk_data_key():
+    if st.session_state.get('risk_data_key_version') != st.session_state.risk_data_version:
+        payload = json.dumps(st.session_state.risk_data, sort_keys=True, default=str)
+        st.session_state.risk_data_key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        st.session_state.risk_data_key_version = st.session_state.risk_data_version
+    return st.session_state.risk_data_key
+
+# Function to build the typed risk dataframe. Cached on the content hash of the
+# risk data (the risks themselves are not hashed), so reruns reuse it.
+@st.cache_data(max_entries=8, show_spinner=False)
+def build_risk_dataframe(data_key, _risks):
+    return risk_dataframe(_risks)
+
 # Function to create dataframe from risk data
 def create_risk_dataframe():
     if not st.session_state.risk_data:
         return pd.DataFrame()
     
     try:
-        # Convert to DataFrame
-        df = pd.DataFrame(st.session_state.risk_data)
-        
-        # Calculate risk indices if not already present
-        if 'RI_Cost' not in df.columns and 'Risk_Probability' in df.columns and 'Cost_Impact' in df.columns:
-            df['RI_Cost'] = df['Risk_Probability'] * df['Cost_Impact']
-        
-        if 'RI_Time' not in df.columns and 'Risk_Probability' in df.columns and 'Time_Impact' in df.columns:
-            df['RI_Time'] = df['Risk_Probability'] * df['Time_Impact']
-        
-        return df
+        return build_risk_dataframe(risk_data_key(), st.session_state.risk_data)
     except Exception as e:
         st.error(f"Errore nella creazione del dataframe: {str(e)}")
         return pd.DataFrame()
 
+# Function to run the Monte Carlo simulation of the (filtered) register. Cached on the
+# content hash of the risk data, the level filter and the simulation settings
+@st.cache_data(max_entries=8, show_spinner=False)
+def run_portfolio_simulation(data_key, level, trials, distribution, correlation_key, _df, _catalogue):
+    correlation = json.loads(correlation_key) if correlation_key else None
+    return simulate_portfolio(_df, trials=trials, impact={"distribution": distribution},
+                              correlation=correlation, catalogue=_catalogue)
+
+# Function to load the correlations between risks sharing a supplier or a cause
+# (optional file with {"risk_groups": [{"risks": [Risk_ID, ...], "correlation": rho}, ...]})
+def load_risk_correlations():
+    try:
+        with open('data/risk_correlations.json', 'r') as f:
+            return json.load(f).get('risk_groups', [])
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        st.warning(f"Errore nel caricamento delle correlazioni tra rischi: {str(e)}")
+        return []
+
 # Initialize Agent Coordinator
 @st.cache_resource
 def get_agent_coordinator():
     return AgentCoordinator()
 
+# IDs for risks added from the form, reserved from the backend allocator
+@st.cache_resource
+def get_risk_id_pool():
+    return RiskIdPool(backend_reserve(BACKEND_URL), block_size=5)
+
 # Main application layout
 def main():
     # Load data
     load_risk_data()
-    initial_data = load_initial_data()
+    catalogue = load_initial_data()
+    initial_data = catalogue.data
     agent_coordinator = get_agent_coordinator()
     
+    # Main area slot for the risks of a generation in progress
+    generation_results = st.empty()
+    
     # Sidebar
     with st.sidebar:
         st.title("🚗 Valutazione Rischi Automotive")
@@ -271,34 +409,135 @@ def main():
         
         # Quick actions
         st.subheader("Azioni Rapide")
+        cache_options = {
+            "Usa cache": "use",
+            "Rigenera e aggiorna cache": "refresh",
+            "Ignora cache": "bypass"
+        }
+        cache_choice = st.selectbox("Cache Risposte AI", list(cache_options.keys()),
+                                    help="Riutilizza le risposte già ottenute per gli stessi prompt")
+        incremental = st.checkbox("Solo elementi nuovi o modificati",
+                                  help="Valuta solo gamme, progetti e componenti cambiati dall'ultima valutazione")
         if st.button("Genera Valutazione Rischi", use_container_width=True):
-            with st.spinner("Gli agenti AI stanno generando la valutazione dei rischi..."):
-                # Call the agent coordinator to generate risks
-                new_risks = agent_coordinator.generate_risk_assessment(initial_data)
+            agent_coordinator.set_cache_mode(cache_options[cache_choice])
+            # Plans already in the register are reused for similar new risks
+            agent_coordinator.index_mitigation_plans(st.session_state.risk_data)
+            progress_bar = st.progress(0.0, text="Gli agenti AI stanno generando la valutazione dei rischi...")
+            status = st.empty()
+            new_risks = []
+            
+            # Each catalogue node is added to the risk data and saved as soon as it is assessed,
+            # so the work already done survives an interrupted run
+            try:
+                for event in agent_coordinator.iter_risk_assessment(initial_data, incremental=incremental):
+                    if event["stage"] == "searched":
+                        status.caption(f"{event['node'].split('::', 1)[1]}: {event['found']} rischi identificati, valutazione in corso")
+                        continue
+                
+                    chunk = event["risks"]
+                    new_risks.extend(chunk)
+                    if incremental:
+                        # The new risks of a reassessed node supersede those generated for it before
+                        st.session_state.risk_data = agent_coordinator.merge_risk_assessment(
+                            st.session_state.risk_data, chunk, nodes=[event["node"]]
+                        )
+                    else:
+                        st.session_state.risk_data.extend(chunk)
+                    touch_risk_data()
                 
-                # Add new risks to existing risk data
-                st.session_state.risk_data.extend(new_risks)
-                try:
-                    # Save each new risk to the backend
-                    for risk in new_risks:
-                        response = requests.post(f"{BACKEND_URL}/risks", json=risk)
-                        if response.status_code != 200:
-                            st.error(f"Impossibile salvare il rischio {risk.get('Risk_ID')} nel backend")
-                except requests.exceptions.ConnectionError:
-                    st.error("Impossibile connettersi al backend. Assicurati che il server Flask sia in esecuzione.")
+                    try:
+                        if (chunk or incremental) and not save_node_risks(event["node"], chunk, replace=incremental):
+                            st.error("Impossibile salvare i nuovi rischi nel backend")
+                    except requests.exceptions.ConnectionError:
+                        st.error("Impossibile connettersi al backend. Assicurati che il server Flask sia in esecuzione.")
                 
+                    progress_bar.progress(event["completed"] / event["total"],
+                                          text=f"Elementi valutati: {event['completed']}/{event['total']}")
+                    # The new risks are shown in the main area as each node finishes
+                    generation_results.dataframe(pd.DataFrame(new_risks), use_container_width=True)
                 st.sidebar.success("Valutazione dei rischi generata con successo!")
+            except RateLimitExhausted as e:
+                # The nodes assessed so far are already saved; nothing is filled in with made-up data
+                st.sidebar.error(f"Valutazione interrotta: limiti dell'API OpenAI superati ({e})")
+            
+            progress_bar.empty()
+            status.empty()
+            generation_results.empty()
+            
+            # Share of structured AI responses that could be used
+            parse_report = agent_coordinator.get_parse_report()
+            items = sum(report["items"] for report in parse_report.values())
+            if items:
+                usable = sum(report["valid"] + report["repaired"] for report in parse_report.values())
+                st.sidebar.caption(f"Risposte AI strutturate valide: {usable / items:.0%} ({usable}/{items} elementi)")
+        
+        # The same assessment as a backend job, which keeps running without this session
+        if st.button("Genera in Background", use_container_width=True,
+                     disabled=st.session_state.assessment_job is not None):
+            try:
+                job = submit_assessment_job(initial_data, incremental)
+                if job is None:
+                    st.error("Impossibile avviare la valutazione nel backend")
+                else:
+                    st.session_state.assessment_job = job["id"]
+            except requests.exceptions.ConnectionError:
+                st.error("Impossibile connettersi al backend. Assicurati che il server Flask sia in esecuzione.")
+        
+        if st.session_state.assessment_job is not None:
+            job = fetch_job(st.session_state.assessment_job)
+            if job is None:
+                st.warning("Stato della valutazione in background non disponibile")
+            elif job["status"] in ("queued", "running"):
+                progress = job.get("progress") or {}
+                completed, total = progress.get("completed", 0), progress.get("total") or 1
+                label = "In coda" if job["status"] == "queued" else f"Elementi valutati: {completed}/{total}"
+                st.progress(completed / total, text=f"Valutazione in background - {label}")
+                # Each rerun syncs the risks the job has already saved
+                st.button("Aggiorna Stato", use_container_width=True)
+            else:
+                if job["status"] == "succeeded":
+                    st.success("Valutazione in background completata!")
+                else:
+                    st.error(f"Valutazione in background non completata ({job['status']}): {job.get('error') or ''}")
+                st.session_state.assessment_job = None
     
     # Main content based on selected view
     if st.session_state.current_view == "dashboard":
-        display_dashboard()
+        display_dashboard(catalogue)
     elif st.session_state.current_view == "gestione rischi":
-        display_risk_management(initial_data)
+        display_risk_management(catalogue)
     elif st.session_state.current_view == "configurazione agenti":
         display_agent_configuration()
 
+# Risk matrix with density aggregation and drill-down for large registers
+def display_risk_matrix(df, impact_column, title, impact_title):
+    with st.container():
+        st.subheader(title)
+        st.markdown('<div class="risk-matrix">', unsafe_allow_html=True)
+        if 'Risk_Probability' in df.columns and impact_column in df.columns:
+            fig = build_risk_matrix(df, impact_column, impact_title)
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Aggregated matrix: let the user open one of the densest cells
+            if len(df) > MATRIX_MAX_POINTS:
+                cells = dense_cells(df, impact_column)
+                cell_labels = ["Nessuna"] + [
+                    f"Probabilità {c['probability'][0]:.0f}-{c['probability'][1]:.0f}%, "
+                    f"impatto {c['impact'][0]:,.0f}-{c['impact'][1]:,.0f} ({c['count']} rischi)"
+                    for c in cells
+                ]
+                choice = st.selectbox("Approfondisci cella", range(len(cell_labels)),
+                                      format_func=lambda i: cell_labels[i],
+                                      key=f"drill_down_{impact_column}")
+                if choice:
+                    cell_df = filter_cell(df, impact_column, cells[choice - 1])
+                    st.plotly_chart(build_risk_matrix(cell_df, impact_column, impact_title),
+                                    use_container_width=True)
+                    st.dataframe(cell_df, use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
 # Dashboard view
-def display_dashboard():
+def display_dashboard(catalogue):
     st.markdown('''<div class="team-header">F-RISK TEAM: DEMO PIATTAFORMA GESTIONE DEI RISCHI</div>''', unsafe_allow_html=True)
     st.header("Dashboard Rischi")
     
@@ -325,167 +564,169 @@ def display_dashboard():
             st.metric("Indice T x I", f"{df['RI_Time'].mean()/10:.2f}")
     
     st.header("Matrici di Rischio")
-    # Cost Impact vs Probability Matrix
-    with st.container():
-        st.subheader("Matrice Rischio: Impatto Costi vs Probabilità")
-        st.markdown('<div class="risk-matrix">', unsafe_allow_html=True)
-        if 'Risk_Probability' in df.columns and 'Cost_Impact' in df.columns:
-            # Create heatmap background (X: 0-100, Y: min-max)
-            x = np.linspace(0, 100, 100)
-            y = np.linspace(df['Cost_Impact'].min(), df['Cost_Impact'].max(), 100)
-            xx, yy = np.meshgrid(x, y)
-            zz = xx * (yy / (df['Cost_Impact'].max() if df['Cost_Impact'].max() > 0 else 1))
-            # Normalize zz for color mapping (equidistributed)
-            zz_norm = (zz - zz.min()) / (zz.max() - zz.min() + 1e-9)
-            import plotly.graph_objects as go
-            fig = go.Figure()
-            fig.add_trace(go.Heatmap(
-                x=x, y=y, z=zz_norm,
-                colorscale=[
-                    [0.0, '#00ff00'],
-                    [0.25, '#ffff00'],
-                    [0.6, '#ffff00'],
-                    [1.0, '#ff0000']
-                ],
-                showscale=False,
-                opacity=0.5,
-                hoverinfo='skip',
-                zmin=0, zmax=1
-            ))
-            # Overlay risk points (use Risk_Probability as is)
-            fig.add_trace(go.Scatter(
-                x=df['Risk_Probability'],
-                y=df['Cost_Impact'],
-                mode='markers+text',
-                marker=dict(size=14, color='black', line=dict(width=2, color='white')),
-                text=df['Risk_Title'],
-                textposition='top center',
-                hovertemplate='<b>%{text}</b><br>Probabilità: %{x}%<br>Impatto Costi: %{y}<extra></extra>'
-            ))
-            fig.update_layout(
-                xaxis=dict(
-                    title='Probabilità di accadimento (%)',
-                    tickvals=[0, 20, 40, 60, 80, 100],
-                    ticktext=['0', '20', '40', '60', '80', '100'],
-                    range=[0, 100],
-                    gridcolor='#404040',
-                    zerolinecolor='#404040',
-                    color='white',
-                ),
-                yaxis=dict(
-                    title='Impatto sui costi',
-                    gridcolor='#404040',
-                    zerolinecolor='#404040',
-                    color='white',
-                ),
-                plot_bgcolor='#2d2d2d',
-                paper_bgcolor='#2d2d2d',
-                font=dict(color="white", size=12),
-                margin=dict(l=40, r=20, t=20, b=40)
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    # Time Impact vs Probability Matrix
-    with st.container():
-        st.subheader("Matrice Rischio: Impatto Tempi vs Probabilità")
-        st.markdown('<div class="risk-matrix">', unsafe_allow_html=True)
-        if 'Risk_Probability' in df.columns and 'Time_Impact' in df.columns:
-            x = np.linspace(0, 100, 100)
-            y = np.linspace(df['Time_Impact'].min(), df['Time_Impact'].max(), 100)
-            xx, yy = np.meshgrid(x, y)
-            zz = xx * (yy / (df['Time_Impact'].max() if df['Time_Impact'].max() > 0 else 1))
-            zz_norm = (zz - zz.min()) / (zz.max() - zz.min() + 1e-9)
-            import plotly.graph_objects as go
-            fig = go.Figure()
-            fig.add_trace(go.Heatmap(
-                x=x, y=y, z=zz_norm,
-                colorscale=[
-                    [0.0, '#00ff00'],
-                    [0.25, '#ffff00'],
-                    [0.6, '#ffff00'],
-                    [1.0, '#ff0000']
-                ],
-                showscale=False,
-                opacity=0.5,
-                hoverinfo='skip',
-                zmin=0, zmax=1
-            ))
-            fig.add_trace(go.Scatter(
-                x=df['Risk_Probability'],
-                y=df['Time_Impact'],
-                mode='markers+text',
-                marker=dict(size=14, color='black', line=dict(width=2, color='white')),
-                text=df['Risk_Title'],
-                textposition='top center',
-                hovertemplate='<b>%{text}</b><br>Probabilità: %{x}%<br>Impatto Tempi: %{y}<extra></extra>'
-            ))
-            fig.update_layout(
-                xaxis=dict(
-                    title='Probabilità di accadimento (%)',
-                    tickvals=[0, 20, 40, 60, 80, 100],
-                    ticktext=['0', '20', '40', '60', '80', '100'],
-                    range=[0, 100],
-                    gridcolor='#404040',
-                    zerolinecolor='#404040',
-                    color='white',
-                ),
-                yaxis=dict(
-                    title='Impatto sui tempi',
-                    gridcolor='#404040',
-                    zerolinecolor='#404040',
-                    color='white',
-                ),
-                plot_bgcolor='#2d2d2d',
-                paper_bgcolor='#2d2d2d',
-                font=dict(color="white", size=12),
-                margin=dict(l=40, r=20, t=20, b=40)
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+    display_risk_matrix(df, 'Cost_Impact', "Matrice Rischio: Impatto Costi vs Probabilità", 'Impatto sui costi')
+    display_risk_matrix(df, 'Time_Impact', "Matrice Rischio: Impatto Tempi vs Probabilità", 'Impatto sui tempi')
     # Risk distribution by level
     st.header("Distribuzione Rischi per Livello")
-    if 'Level' in df.columns:
-        level_counts = df['Level'].value_counts().reset_index()
-        level_counts.columns = ['Livello', 'Conteggio']
-        fig = px.pie(level_counts, values='Conteggio', names='Livello', 
-                    title='',
-                    color_discrete_sequence=px.colors.qualitative.Safe)
+    fig = level_distribution_chart(df)
+    if fig is not None:
         st.plotly_chart(fig, use_container_width=True)
     # Top risks by cost impact
     st.header("Top Rischi per Impatto Costo")
-    if 'RI_Cost' in df.columns and 'Risk_Title' in df.columns:
-        top_cost_risks = df.sort_values('RI_Cost', ascending=False).head(5)
-        fig = px.bar(top_cost_risks, x='Risk_Title', y='RI_Cost', 
-                    title='',
-                    color='RI_Cost',
-                    color_continuous_scale=px.colors.sequential.Reds)
+    fig = top_risks_chart(df, 'RI_Cost', px.colors.sequential.Reds)
+    if fig is not None:
         st.plotly_chart(fig, use_container_width=True)
     # Top risks by time impact
     st.header("Top Rischi per Impatto Tempo")
-    if 'RI_Time' in df.columns and 'Risk_Title' in df.columns:
-        top_time_risks = df.sort_values('RI_Time', ascending=False).head(5)
-        fig = px.bar(top_time_risks, x='Risk_Title', y='RI_Time', 
-                    title='',
-                    color='RI_Time',
-                    color_continuous_scale=px.colors.sequential.Blues)
+    fig = top_risks_chart(df, 'RI_Time', px.colors.sequential.Blues)
+    if fig is not None:
         st.plotly_chart(fig, use_container_width=True)
+    # Range -> project -> component drill-down from the roll-up of the backend
+    st.header("Vista Gerarchica")
+    rollup = fetch_rollup()
+    if rollup is None:
+        st.info("Vista gerarchica non disponibile: backend non raggiungibile.")
+    elif rollup['count']:
+        indices = {
+            "Indice Costo": ('RI_Cost', px.colors.sequential.Reds),
+            "Indice Tempo": ('RI_Time', px.colors.sequential.Blues)
+        }
+        index_choice = st.radio("Dimensione dei riquadri", list(indices.keys()), horizontal=True)
+        field, color_scale = indices[index_choice]
+        st.caption("Tutti i livelli. Clicca su una gamma o un progetto per esplorarlo.")
+        st.plotly_chart(rollup_treemap(rollup, field, color_scale), use_container_width=True)
+        
+        nodes = rollup_nodes(rollup)
+        selected = st.selectbox("Dettaglio", range(len(nodes)),
+                                format_func=lambda i: " › ".join(nodes[i]['path']) or "Intero registro")
+        node = nodes[selected]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Rischi", node['count'])
+        with col2:
+            st.metric(f"Somma {field}", f"{node[field]['sum']:,.2f}")
+        with col3:
+            st.metric(f"Massimo {field}", f"{node[field]['max'] or 0:,.2f}")
+        st.dataframe(pd.DataFrame(node[field]['top'], columns=['Risk_ID', 'Risk_Title', 'value']),
+                     use_container_width=True)
+    
+    # Monte Carlo simulation of the total losses of the register
+    st.header("Simulazione Monte Carlo")
+    distributions = {
+        "Triangolare (50%-150% della stima)": "triangular",
+        "Lognormale (mediana alla stima)": "lognormal",
+        "Fissa (stima)": "fixed"
+    }
+    col1, col2 = st.columns(2)
+    with col1:
+        trials = st.selectbox("Numero di simulazioni", [1000, 10000, 100000], index=1)
+    with col2:
+        distribution = st.selectbox("Distribuzione dell'impatto", list(distributions.keys()))
+    correlated = st.checkbox("Rischi correlati", value=True,
+                             help="I rischi della stessa gamma e dello stesso progetto tendono a verificarsi insieme")
+    correlation_key = None
+    if correlated:
+        col1, col2 = st.columns(2)
+        with col1:
+            range_correlation = st.slider("Correlazione nella gamma", 0.0, 0.5, 0.2, 0.05)
+        with col2:
+            project_correlation = st.slider("Correlazione nel progetto", 0.0, 0.5, 0.2, 0.05)
+        correlation_key = json.dumps({
+            "range": range_correlation,
+            "project": project_correlation,
+            "risk_groups": load_risk_correlations()
+        }, sort_keys=True)
+    
+    with st.spinner("Simulazione in corso..."):
+        try:
+            independent = run_portfolio_simulation(risk_data_key(), st.session_state.selected_level, trials,
+                                                   distributions[distribution], None, df, catalogue)
+            simulation = independent if not correlated else run_portfolio_simulation(
+                risk_data_key(), st.session_state.selected_level, trials,
+                distributions[distribution], correlation_key, df, catalogue
+            )
+        except ValueError as e:
+            st.error(f"Simulazione non valida: {str(e)}")
+            return
+    
+    col1, col2, col3 = st.columns(3)
+    for column, percentile in zip((col1, col2, col3), (50, 80, 95)):
+        with column:
+            st.metric(f"Contingenza costi P{percentile}", f"€{simulation['cost']['percentiles'][percentile]:,.0f}")
+            st.metric(f"Ritardo P{percentile} (settimane)", f"{simulation['time']['percentiles'][percentile]:.1f}")
+    st.caption(f"{simulation['trials']:,} simulazioni di {simulation['risks']:,} rischi in {simulation['seconds']:.2f}s. "
+               f"Perdita attesa: €{simulation['cost']['mean']:,.0f} e {simulation['time']['mean']:.1f} settimane.")
+    
+    if correlated:
+        # Tail metrics against independent risks, which understate the contingency
+        st.subheader("Metriche di Coda")
+        col1, col2, col3, col4 = st.columns(4)
+        tail_metrics = (
+            (col1, "Costi P95", 'cost', lambda summary: summary['percentiles'][95], "€{:,.0f}"),
+            (col2, "Perdita media oltre P95", 'cost', lambda summary: summary['expected_shortfall'], "€{:,.0f}"),
+            (col3, "Ritardo P95", 'time', lambda summary: summary['percentiles'][95], "{:.1f} sett."),
+            (col4, "Ritardo medio oltre P95", 'time', lambda summary: summary['expected_shortfall'], "{:.1f} sett.")
+        )
+        for column, label, kind, metric, value_format in tail_metrics:
+            with column:
+                value, baseline = metric(simulation[kind]), metric(independent[kind])
+                change = (value / baseline - 1) * 100 if baseline else 0.0
+                st.metric(label, value_format.format(value), delta=f"{change:+.1f}% vs indipendenti",
+                          delta_color="inverse")
+    
+    tab1, tab2 = st.tabs(["Distribuzione Costi", "Distribuzione Tempi"])
+    with tab1:
+        st.plotly_chart(loss_distribution_chart(simulation['cost'], 'Perdita totale (€)', '#d62728'),
+                        use_container_width=True)
+    with tab2:
+        st.plotly_chart(loss_distribution_chart(simulation['time'], 'Ritardo totale (settimane)', '#1f77b4'),
+                        use_container_width=True)
+    
+    st.subheader("Perdite per Livello e Progetto")
+    tab1, tab2 = st.tabs(["Per Livello", "Per Progetto"])
+    with tab1:
+        st.dataframe(simulation['by_level'], use_container_width=True)
+    with tab2:
+        st.dataframe(simulation['by_project'], use_container_width=True)
 
 # Risk Management view
-def display_risk_management(initial_data):
+def display_risk_management(catalogue):
     st.header("Gestione Rischi")
     
     tab1, tab2 = st.tabs(["Tabella Rischi", "Aggiungi/Modifica Rischio"])
     
     with tab1:
-        df = create_risk_dataframe()
+        sort_options = {
+            "Ordine di inserimento": None,
+            "Indice Costo (decrescente)": "-RI_Cost",
+            "Indice Tempo (decrescente)": "-RI_Time",
+            "ID Rischio": "Risk_ID"
+        }
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            sort_choice = st.selectbox("Ordina per", list(sort_options.keys()))
+        with col2:
+            page_size = st.selectbox("Righe per pagina", [25, 50, 100, 250], index=1)
+        with col3:
+            page = st.number_input("Pagina", min_value=1, value=1, step=1)
+        
+        # Filtering, sorting and paging happen in the backend; only the page is transferred
+        level = None if st.session_state.selected_level == "Tutti i Livelli" else st.session_state.selected_level.lower()
+        page_result = fetch_risk_page(level, sort_options[sort_choice], (page - 1) * page_size, page_size)
+        
+        if page_result is not None:
+            page_risks, total = page_result
+            df = pd.DataFrame(page_risks)
+            st.caption(f"{total} rischi trovati - pagina {page} di {max(1, -(-total // page_size))}")
+        else:
+            # Backend not reachable: filter the local copy
+            df = create_risk_dataframe()
+            if not df.empty and level is not None:
+                df = df[df['Level'] == level]
         
         if df.empty:
             st.info("Nessun dato disponibile. Genera una valutazione dei rischi o aggiungi rischi manualmente.")
         else:
-            # Filter by level if needed
-            if st.session_state.selected_level != "Tutti i Livelli":
-                df = df[df['Level'] == st.session_state.selected_level.lower()]
-            
             # Display the risk table
             st.dataframe(df, use_container_width=True)
             
@@ -506,20 +747,12 @@ def display_risk_management(initial_data):
             col1, col2 = st.columns(2)
             
             with col1:
-                risk_id = st.text_input("ID Rischio", value=f"R{len(st.session_state.risk_data) + 1}")
+                risk_id = st.text_input("ID Rischio", value="",
+                                        help="Lascia vuoto per assegnare un nuovo ID univoco; inserisci un ID esistente per modificarlo")
                 level = st.selectbox("Livello", ["strategico", "progetto", "operativo"])
                 
-                # Dynamically generate project options based on level
-                project_options = []
-                if level == "strategico":
-                    project_options = [range_item["name"] for range_item in initial_data["product_range"]]
-                elif level == "progetto":
-                    project_options = [project["name"] for range_item in initial_data["product_range"] 
-                                     for project in range_item["projects"]]
-                elif level == "operativo":
-                    project_options = [component["name"] for range_item in initial_data["product_range"] 
-                                     for project in range_item["projects"]
-                                     for component in project["components"]]
+                # Project options of the selected level, precomputed by the catalogue index
+                project_options = list(catalogue.names(level))
                 
                 project = st.selectbox("Progetto/Componente", project_options if project_options else ["Non Disponibile"])
                 owner = st.text_input("Proprietario")
@@ -556,6 +789,9 @@ def display_risk_management(initial_data):
             submitted = st.form_submit_button("Salva Rischio")
             
             if submitted:
+                if not risk_id.strip():
+                    risk_id = get_risk_id_pool().next_id(level, project)
+                
                 # Create risk item
                 risk_item = {
                     "Risk_ID": risk_id,
@@ -583,8 +819,9 @@ def display_risk_management(initial_data):
                 else:
                     st.session_state.risk_data.append(risk_item)
                     st.success(f"Rischio {risk_id} aggiunto con successo!")
+                touch_risk_data()
                 
-                save_risk_data()
+                save_risk(risk_item, update=existing_index is not None)
 
 # AI Agent Configuration view
 def display_agent_configuration():
@@ -616,13 +853,36 @@ def display_agent_configuration():
     enable_mitigation = st.toggle("Abilita Agente Pianificazione Mitigazione", value=True)
     mitigation_temperature = st.slider("Creatività per Piani di Mitigazione (Temperatura)", 0.0, 1.0, 0.6, 0.1)
     
+    st.subheader("Esecuzione Parallela")
+    st.write("Gli agenti elaborano in parallelo gamme, progetti, componenti e i singoli rischi.")
+    enable_concurrency = st.toggle("Abilita Esecuzione Parallela", value=True)
+    max_workers = st.slider("Chiamate AI Simultanee (Massimo)", 1, 32, 8, 1,
+                           help="Numero massimo di richieste contemporanee agli agenti AI")
+    
+    st.subheader("Limiti API OpenAI")
+    st.write("Le chiamate di tutti gli agenti condividono questi limiti; in caso di errori 429/5xx vengono ritentate e la concorrenza si riduce automaticamente.")
+    col1, col2 = st.columns(2)
+    with col1:
+        requests_per_minute = st.number_input("Richieste al Minuto", min_value=1, value=500, step=50)
+    with col2:
+        tokens_per_minute = st.number_input("Token al Minuto", min_value=1000, value=30000, step=1000)
+    
     st.subheader("Configurazione Avanzata")
     api_key = st.text_input("Chiave API OpenAI (opzionale, usa il file .env se non fornita)", 
                            type="password", help="La tua chiave API OpenAI per gli agenti")
     
     if st.button("Salva Configurazione"):
-        # Save the configuration
-        config = {
+        # Save the configuration, keeping any settings not shown in this view
+        config_path = Path('config/agent_config.json')
+        config = {}
+        if config_path.exists():
+            try:
+                with open(config_path, 'r') as f:
+                    config = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                config = {}
+        
+        config.update({
             "web_search_agent": {
                 "enabled": enable_web_search,
                 "temperature": web_search_temperature
@@ -635,14 +895,69 @@ def display_agent_configuration():
                 "enabled": enable_mitigation,
                 "temperature": mitigation_temperature
             },
+            "concurrency": {
+                "enabled": enable_concurrency,
+                "max_workers": max_workers
+            },
+            "rate_limit": {
+                **config.get("rate_limit", {}),
+                "requests_per_minute": requests_per_minute,
+                "tokens_per_minute": tokens_per_minute,
+                "max_concurrency": max_workers
+            },
             "api_key": api_key if api_key else None
-        }
+        })
         
         Path("config").mkdir(exist_ok=True)
-        with open('config/agent_config.json', 'w') as f:
+        with open(config_path, 'w') as f:
             json.dump(config, f, indent=2)
         
         st.success("Configurazione agenti salvata con successo!")
+    
+    display_run_reports()
+
+# Timing, token and cost report of the saved assessment runs
+def display_run_reports():
+    st.subheader("Report Esecuzioni")
+    reports = list_run_reports()
+    if not reports:
+        st.write("Nessuna esecuzione registrata. Genera una valutazione dei rischi per creare un report.")
+        return
+    
+    selected = st.selectbox("Esecuzione", reports, format_func=lambda path: path.stem.replace("run_", ""))
+    try:
+        with open(selected, 'r') as f:
+            report = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        st.error(f"Errore nel caricamento del report: {str(e)}")
+        return
+    
+    totals = report["totals"]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Durata", f"{totals['wall_time']:.1f} s")
+    col2.metric("Chiamate AI", totals["calls"], help=f"{totals['cache_hits']} dalla cache")
+    col3.metric("Token", f"{totals['prompt_tokens'] + totals['completion_tokens']:,}")
+    col4.metric("Costo Stimato", f"${totals['cost']:.2f}")
+    
+    if report.get("bottleneck_stage"):
+        st.caption(f"Fase più lenta: {report['bottleneck_stage']}")
+    if totals["fallbacks"]:
+        st.warning(f"{totals['fallbacks']} risposte sostituite da dati predefiniti")
+    
+    columns = ["calls", "wall_time", "queue_time", "call_time", "prompt_tokens",
+               "completion_tokens", "cost", "cache_hits", "cache_misses", "retries", "fallbacks"]
+    st.write("Per fase")
+    st.dataframe(pd.DataFrame.from_dict(report["by_stage"], orient="index")[columns], use_container_width=True)
+    st.write("Per elemento del catalogo")
+    st.dataframe(pd.DataFrame.from_dict(report["by_node"], orient="index")[columns]
+                 .sort_values("wall_time", ascending=False), use_container_width=True)
+    
+    st.download_button(
+        label="Scarica Report JSON",
+        data=json.dumps(report, indent=2).encode('utf-8'),
+        file_name=selected.name,
+        mime='application/json',
+    )
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
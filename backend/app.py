@@ -1,66 +1,345 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import json
-from pathlib import Path
+
+from id_allocator import IdAllocator
+from jobs import JobManager
+from rollup import RollupTree
+from storage import RiskQuery, WalRiskStorage, create_storage
+
+# The agents package lives in the project root, next to the backend directory
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+CATALOGUE_FILE = os.getenv('RISK_CATALOGUE_FILE', os.path.join(ROOT_DIR, 'data', 'initial_data.json'))
 
 app = Flask(__name__)
 CORS(app)
 
-# Load risk data
-def load_risk_data():
-    try:
-        with open('data/risk_assessment_data.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+# Risk register storage (in-memory index + write-ahead log by default)
+storage = create_storage()
+
+# Central Risk_ID allocator, moved past the IDs already in the register
+id_allocator = IdAllocator()
+id_allocator.observe(risk.get('Risk_ID') for risk in storage.all())
+
+# Catalogue the roll-up tree places the risks by
+_rollup_catalogue = None
+_rollup_lock = threading.Lock()
+
+def get_rollup() -> RollupTree:
+    """
+    Roll-up of the register by range, project and component
+    
+    The WAL storage keeps the tree up to date on every write, and it is only
+    rebuilt when the catalogue file changes. With the JSON storage the tree
+    is built from the whole register on each call.
+    """
+    global _rollup_catalogue
+    from catalogue import load_catalogue
+    
+    with _rollup_lock:
+        try:
+            catalogue = load_catalogue(CATALOGUE_FILE)
+        except (OSError, ValueError) as e:
+            print(f"Error loading the catalogue for the roll-up: {e}")
+            catalogue = _rollup_catalogue
+        
+        if isinstance(storage, WalRiskStorage) and storage.rollup is not None and catalogue is _rollup_catalogue:
+            return storage.rollup
+        
+        tree = RollupTree.from_catalogue(catalogue) if catalogue is not None else RollupTree()
+        if not isinstance(storage, WalRiskStorage):
+            for entry in storage.snapshot():
+                tree.add(entry['key'], entry['risk'])
+            return tree
+        
+        storage.attach_rollup(tree)
+        _rollup_catalogue = catalogue
+        return tree
+
+# Built at startup, so every write updates it from then on
+get_rollup()
+
+# Rate limiter shared by the coordinators of all jobs, so they draw on the same API quota
+_rate_limiter = None
+_coordinator_lock = threading.Lock()
 
-# Save risk data
-def save_risk_data(data):
-    Path("data").mkdir(exist_ok=True)
-    with open('data/risk_assessment_data.json', 'w') as f:
-        json.dump(data, f, indent=2)
+def create_coordinator():
+    """
+    Build the agent coordinator of one assessment job
+    
+    Every job gets its own coordinator, so concurrent jobs do not share
+    their run reports or mitigation plan index; they share the rate limiter.
+    """
+    global _rate_limiter
+    from agents import AgentCoordinator
+    from agents.risk_ids import RiskIdPool
+    with _coordinator_lock:
+        coordinator = AgentCoordinator(os.path.join(ROOT_DIR, 'config', 'agent_config.json'),
+                                       rate_limiter=_rate_limiter)
+        _rate_limiter = coordinator.rate_limiter
+    
+    # Jobs reserve their IDs directly, without going through the HTTP endpoint
+    if coordinator.risk_id_pool is not None:
+        coordinator.risk_id_pool = RiskIdPool(
+            lambda level, project, count: id_allocator.allocate(level, project, count)['ids'],
+            block_size=coordinator.risk_id_pool.block_size
+        )
+    return coordinator
+
+def run_assessment(params, report_progress):
+    """
+    Run a risk assessment job
+    
+    The risks of each catalogue node are saved to the register as soon as the
+    node is assessed, so an interrupted job keeps the work already done.
+    """
+    initial_data = params.get('initial_data')
+    if initial_data is None:
+        with open(CATALOGUE_FILE, 'r') as f:
+            initial_data = json.load(f)
+    
+    incremental = params.get('incremental', False)
+    node_risks = {}
+    coordinator = create_coordinator()
+    # Plans already in the register are reused for similar new risks
+    coordinator.index_mitigation_plans(storage.all())
+    for event in coordinator.iter_risk_assessment(initial_data, incremental=incremental):
+        if event['stage'] == 'assessed':
+            node_risks[event['index']] = event['risks']
+            if incremental:
+                # The risks generated for the node by earlier assessments are superseded
+                storage.replace_node(event['node'], event['risks'])
+            elif event['risks']:
+                storage.add_many(event['risks'])
+        report_progress({key: event[key] for key in ('stage', 'node', 'found', 'completed', 'total')})
+    
+    return [risk for index in sorted(node_risks) for risk in node_risks[index]]
+
+# Background assessment jobs, scheduled round-robin across users
+jobs = JobManager(run_assessment, workers=int(os.getenv('RISK_JOB_WORKERS', '2')))
+
+def parse_risk_query(args) -> RiskQuery:
+    """Build a RiskQuery from the query string (raises ValueError on bad numbers)"""
+    def number(name, cast=float):
+        value = args.get(name)
+        return cast(value) if value not in (None, '') else None
+    
+    # The cursor is the opaque offset of the next page returned in X-Next-Cursor
+    offset = number('cursor', int)
+    if offset is None:
+        offset = number('offset', int) or 0
+    
+    return RiskQuery(
+        level=args.get('level') or None,
+        project=args.get('project') or None,
+        owner=args.get('owner') or None,
+        min_ri_cost=number('min_ri_cost'),
+        min_ri_time=number('min_ri_time'),
+        sort=args.get('sort') or None,
+        offset=offset,
+        limit=number('limit', int)
+    )
 
 @app.route('/api/risks', methods=['GET'])
 def get_risks():
-    risks = load_risk_data()
-    return jsonify(risks)
+    try:
+        query = parse_risk_query(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid numeric query parameter"}), 400
+    
+    # The ETag covers the register revision and the query, so a client
+    # repeating a request on an unchanged register gets 304 Not Modified
+    revision = storage.revision
+    etag = f"{revision}-{hashlib.sha1(request.query_string).hexdigest()[:12]}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['X-Risk-Revision'] = str(revision)
+        return response
+    
+    risks, total = storage.query(query)
+    response = jsonify(risks)
+    response.set_etag(etag)
+    response.headers['X-Risk-Revision'] = str(revision)
+    
+    # Pagination metadata travels in headers so the body stays a plain list
+    response.headers['X-Total-Count'] = str(total)
+    next_offset = query.offset + len(risks)
+    if query.limit is not None and next_offset < total:
+        response.headers['X-Next-Cursor'] = str(next_offset)
+    return response
 
 @app.route('/api/risks', methods=['POST'])
 def add_risk():
-    risks = load_risk_data()
     new_risk = request.json
-    risks.append(new_risk)
-    save_risk_data(risks)
+    id_allocator.assign([new_risk])
+    storage.add(new_risk)
     return jsonify({"message": "Risk added successfully", "risk": new_risk})
 
+@app.route('/api/risks/changes', methods=['GET'])
+def get_risk_changes():
+    since = request.args.get('since', type=int)
+    
+    # Read the revision before the changes: a write landing in between is
+    # sent again on the next sync instead of being skipped
+    revision = storage.revision
+    changes = storage.changes_since(since) if since is not None else None
+    
+    if changes is None:
+        # Unknown or expired revision: send the whole register
+        return jsonify({"revision": revision, "reset": True, "changes": [
+            {"op": "put", **entry} for entry in storage.snapshot()
+        ]})
+    
+    return jsonify({"revision": revision, "reset": False, "changes": changes})
+
+@app.route('/api/risks/bulk', methods=['POST'])
+def bulk_upsert_risks():
+    payload = request.json
+    risks = payload.get("risks") if isinstance(payload, dict) else payload
+    
+    if not isinstance(risks, list) or not all(isinstance(risk, dict) for risk in risks):
+        return jsonify({"error": "Expected a list of risks"}), 400
+    
+    id_allocator.assign(risks)
+    try:
+        result = storage.upsert_many(risks)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": "Risks saved successfully", **result})
+
+@app.route('/api/risks/node', methods=['POST'])
+def save_node_risks():
+    payload = request.json
+    if not isinstance(payload, dict) or not isinstance(payload.get("node"), str) or not payload["node"]:
+        return jsonify({"error": "Expected the key of a catalogue node"}), 400
+    
+    risks = payload.get("risks", [])
+    if not isinstance(risks, list) or not all(isinstance(risk, dict) for risk in risks):
+        return jsonify({"error": "Expected a list of risks"}), 400
+    
+    id_allocator.assign(risks)
+    # Reassessed nodes replace their earlier generated risks; otherwise the risks are appended
+    if payload.get("replace"):
+        result = storage.replace_node(payload["node"], risks)
+    else:
+        result = storage.add_many(risks)
+    return jsonify({"message": "Node risks saved successfully", **result})
+
 @app.route('/api/risks/<risk_id>', methods=['PUT'])
 def update_risk(risk_id):
-    risks = load_risk_data()
     updated_risk = request.json
     
-    for i, risk in enumerate(risks):
-        if risk.get('Risk_ID') == risk_id:
-            risks[i] = updated_risk
-            save_risk_data(risks)
-            return jsonify({"message": "Risk updated successfully", "risk": updated_risk})
+    if storage.update(risk_id, updated_risk) is not None:
+        return jsonify({"message": "Risk updated successfully", "risk": updated_risk})
     
     return jsonify({"error": "Risk not found"}), 404
 
 @app.route('/api/risks/<risk_id>', methods=['DELETE'])
 def delete_risk(risk_id):
-    risks = load_risk_data()
+    deleted_risk = storage.delete(risk_id)
     
-    for i, risk in enumerate(risks):
-        if risk.get('Risk_ID') == risk_id:
-            deleted_risk = risks.pop(i)
-            save_risk_data(risks)
-            return jsonify({"message": "Risk deleted successfully", "risk": deleted_risk})
+    if deleted_risk is not None:
+        return jsonify({"message": "Risk deleted successfully", "risk": deleted_risk})
     
     return jsonify({"error": "Risk not found"}), 404
 
+def job_summary(job):
+    """A job without the submitted catalogue, which can be large"""
+    job['params'].pop('initial_data', None)
+    return job
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    
+    user = request.headers.get('X-User') or payload.get('user') or 'anonymous'
+    params = {"incremental": bool(payload.get('incremental', False))}
+    if payload.get('initial_data') is not None:
+        params["initial_data"] = payload['initial_data']
+    
+    job = jobs.submit(params, user=user)
+    return jsonify({"message": "Job queued", "job": job_summary(job)}), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify([job_summary(job) for job in jobs.list(user=request.args.get('user'), limit=limit)])
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_summary(job))
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = jobs.get(job_id, include_result=True)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job['status'] != 'succeeded':
+        return jsonify({"error": f"Job is {job['status']}", "status": job['status']}), 409
+    return jsonify(job['result'])
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"message": "Job cancellation requested", "status": job['status']})
+
+@app.route('/api/ids', methods=['POST'])
+def allocate_ids():
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    
+    try:
+        count = int(payload.get('count', 1))
+    except (TypeError, ValueError):
+        return jsonify({"error": "count must be an integer"}), 400
+    
+    try:
+        block = id_allocator.allocate(payload.get('level'), payload.get('project'), count)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(block)
+
+@app.route('/api/rollup', methods=['GET'])
+def get_risk_rollup():
+    """
+    Aggregates of the register by range, project and component
+    
+    Repeated ``path`` parameters select a node (range, then project, then
+    component); ``depth`` sets how many levels of its children are included
+    (-1 for all of them).
+    """
+    try:
+        depth = int(request.args.get('depth', 1))
+    except ValueError:
+        return jsonify({"error": "depth must be an integer"}), 400
+    
+    summary = get_rollup().summary(tuple(request.args.getlist('path')), depth)
+    if summary is None:
+        return jsonify({"error": "Node not found"}), 404
+    response = jsonify(summary)
+    response.headers['X-Risk-Revision'] = str(storage.revision)
+    return response
+
 @app.route('/api/health')
 def health_check():
     return jsonify({"status": "healthy"}), 200
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000) 
\ No newline at end of file
+    app.run(debug=True, port=5000)
@@ -0,0 +1,115 @@
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from storage import normalize_level
+
+ID_DB = 'data/id_sequences.sqlite'
+
+# Risk_ID prefix of each level, as in the catalogue (RS001, RP001, RO001)
+LEVEL_CODES = {'strategic': 'RS', 'project': 'RP', 'operational': 'RO'}
+
+# Largest block of IDs handed out by one request
+MAX_BLOCK = 1000
+
+_ID_PATTERN = re.compile(r'^(R[SPO]?-[A-Z0-9]+)-(\d+)$')
+
+
+def risk_id_prefix(level, project) -> str:
+    """Hierarchical prefix of the Risk_IDs of a level and project, e.g. ``RO-MODELX500``"""
+    code = LEVEL_CODES.get(normalize_level(level), 'R')
+    slug = re.sub(r'[^A-Za-z0-9]+', '', str(project or '')).upper()[:12] or 'GEN'
+    return f"{code}-{slug}"
+
+
+def format_risk_id(prefix: str, number: int) -> str:
+    return f"{prefix}-{number:06d}"
+
+
+class IdAllocator:
+    """
+    Central allocator of globally unique Risk_IDs
+
+    An ID is a hierarchical prefix (level code and project) followed by a
+    sequence number. Each prefix has its own monotonically increasing
+    sequence, kept in a SQLite table so IDs are never handed out twice, even
+    across restarts or several processes. IDs are reserved in blocks: a
+    generator worker asks once for many IDs and then numbers its risks
+    without further round trips.
+    """
+
+    def __init__(self, db_path: str = ID_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Autocommit mode: every reservation is its own immediate transaction
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sequences (prefix TEXT PRIMARY KEY, next INTEGER NOT NULL)"
+        )
+
+    def _reserve(self, prefix: str, count: int, at_least: int = 1) -> int:
+        """Advance the sequence of a prefix by ``count`` and return the first number reserved"""
+        with self._lock:
+            # BEGIN IMMEDIATE locks the database for other processes until the commit
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute("SELECT next FROM sequences WHERE prefix = ?", (prefix,)).fetchone()
+                first = max(row[0] if row else 1, at_least)
+                self._connection.execute(
+                    "INSERT INTO sequences (prefix, next) VALUES (?, ?) "
+                    "ON CONFLICT(prefix) DO UPDATE SET next = excluded.next",
+                    (prefix, first + count)
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            return first
+
+    def allocate(self, level, project, count: int = 1) -> Dict:
+        """
+        Reserve a block of Risk_IDs for a level and project
+
+        Raises:
+            ValueError: If count is not between 1 and MAX_BLOCK
+
+        Returns:
+            Dictionary with the ``prefix`` and the reserved ``ids``
+        """
+        if not 1 <= count <= MAX_BLOCK:
+            raise ValueError(f"count must be between 1 and {MAX_BLOCK}")
+
+        prefix = risk_id_prefix(level, project)
+        first = self._reserve(prefix, count)
+        return {"prefix": prefix, "ids": [format_risk_id(prefix, n) for n in range(first, first + count)]}
+
+    def observe(self, risk_ids: Iterable):
+        """Move the sequences past IDs already in use, e.g. after the database was lost"""
+        highest = {}
+        for risk_id in risk_ids:
+            match = _ID_PATTERN.match(str(risk_id or ''))
+            if match:
+                prefix, number = match.group(1), int(match.group(2))
+                highest[prefix] = max(highest.get(prefix, 0), number)
+
+        for prefix, number in highest.items():
+            # Reserving nothing beyond the highest ID in use only moves the sequence forward
+            self._reserve(prefix, 0, at_least=number + 1)
+
+    def assign(self, risks: List[Dict]) -> int:
+        """Give a new ID to the risks without a Risk_ID, returning how many were assigned"""
+        missing = {}
+        for risk in risks:
+            if not risk.get('Risk_ID'):
+                missing.setdefault((risk.get('Level'), risk.get('Project')), []).append(risk)
+
+        for (level, project), group in missing.items():
+            for start in range(0, len(group), MAX_BLOCK):
+                chunk = group[start:start + MAX_BLOCK]
+                for risk, risk_id in zip(chunk, self.allocate(level, project, len(chunk))["ids"]):
+                    risk['Risk_ID'] = risk_id
+        return sum(len(group) for group in missing.values())
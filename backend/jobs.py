@@ -0,0 +1,211 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+JOBS_DB = 'data/jobs.sqlite'
+
+# Job states; "queued" and "running" jobs are active
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once the job has been cancelled"""
+
+
+class JobManager:
+    """
+    Persistent queue of background jobs run by a pool of worker threads
+
+    Jobs are stored in a SQLite table so their status, progress and result
+    survive a restart; jobs that were running when the process stopped are
+    queued again on startup. Queued jobs are kept in one FIFO per user and the
+    workers take them round-robin across users, so a user submitting many
+    jobs does not hold up everybody else.
+
+    ``run_job(params, report_progress)`` does the work: it can call
+    ``report_progress(dict)`` as often as it likes and returns the
+    JSON-serializable result.
+    """
+
+    def __init__(self, run_job: Callable[[Dict, Callable[[Dict], None]], object],
+                 db_path: str = JOBS_DB, workers: int = 2):
+        self.run_job = run_job
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._has_work = threading.Condition(self._lock)
+        self._queues = OrderedDict()
+        self._cancel_requested = set()
+
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                user TEXT NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user, created_at)")
+        self._requeue_interrupted()
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    # Persistence
+
+    def _requeue_interrupted(self):
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING)
+            )
+            self._connection.commit()
+            rows = self._connection.execute(
+                "SELECT id, user FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            ).fetchall()
+            for row in rows:
+                self._queues.setdefault(row['user'], deque()).append(row['id'])
+
+    def _set(self, job_id: str, **fields):
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        self._connection.execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id)
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row, include_result: bool = False) -> Dict:
+        job = {
+            "id": row['id'],
+            "user": row['user'],
+            "status": row['status'],
+            "params": json.loads(row['params']),
+            "progress": json.loads(row['progress']) if row['progress'] else None,
+            "error": row['error'],
+            "created_at": row['created_at'],
+            "started_at": row['started_at'],
+            "finished_at": row['finished_at']
+        }
+        if include_result:
+            job["result"] = json.loads(row['result']) if row['result'] else None
+        return job
+
+    # Scheduling
+
+    def _next_job(self) -> str:
+        """Block until a job is queued and take it from the next user in turn"""
+        with self._has_work:
+            while not self._queues:
+                self._has_work.wait()
+
+            user, queue = next(iter(self._queues.items()))
+            job_id = queue.popleft()
+            # The user goes to the back of the rotation
+            del self._queues[user]
+            if queue:
+                self._queues[user] = queue
+
+            self._set(job_id, status=RUNNING, started_at=time.time())
+            return job_id
+
+    def _work(self):
+        while True:
+            job_id = self._next_job()
+            with self._lock:
+                row = self._connection.execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            params = json.loads(row['params'])
+
+            def report_progress(progress: Dict, job_id=job_id):
+                with self._lock:
+                    if job_id in self._cancel_requested:
+                        raise JobCancelled()
+                    self._set(job_id, progress=json.dumps(progress))
+
+            try:
+                result = self.run_job(params, report_progress)
+                outcome = dict(status=SUCCEEDED, result=json.dumps(result))
+            except JobCancelled:
+                outcome = dict(status=CANCELLED)
+            except Exception as e:
+                print(f"Error running job {job_id}: {e}")
+                outcome = dict(status=FAILED, error=str(e))
+
+            with self._lock:
+                self._cancel_requested.discard(job_id)
+                self._set(job_id, finished_at=time.time(), **outcome)
+
+    # Public interface
+
+    def submit(self, params: Dict, user: str = 'anonymous') -> Dict:
+        """Queue a job and return it"""
+        job_id = uuid.uuid4().hex
+        with self._has_work:
+            self._connection.execute(
+                "INSERT INTO jobs (id, user, status, params, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, user, QUEUED, json.dumps(params), time.time())
+            )
+            self._connection.commit()
+            self._queues.setdefault(user, deque()).append(job_id)
+            self._has_work.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str, include_result: bool = False) -> Optional[Dict]:
+        """Return a job, optionally with its result, or None if it does not exist"""
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row, include_result) if row is not None else None
+
+    def list(self, user: str = None, limit: int = 50) -> List[Dict]:
+        """Most recent jobs first, optionally only those of one user"""
+        query, args = "SELECT * FROM jobs", []
+        if user is not None:
+            query += " WHERE user = ?"
+            args.append(user)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(query, args).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Cancel a job
+
+        A queued job is cancelled at once; a running job stops at its next
+        progress report. Finished jobs are left unchanged.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT user, status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+
+            if row['status'] == QUEUED:
+                queue = self._queues.get(row['user'])
+                if queue is not None and job_id in queue:
+                    queue.remove(job_id)
+                    if not queue:
+                        del self._queues[row['user']]
+                self._set(job_id, status=CANCELLED, finished_at=time.time())
+            elif row['status'] == RUNNING:
+                self._cancel_requested.add(job_id)
+
+        return self.get(job_id)
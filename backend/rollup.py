@@ -0,0 +1,196 @@
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from storage import normalize_level, risk_index_value
+
+# Aggregated risk indices
+ROLLUP_FIELDS = ('RI_Cost', 'RI_Time')
+
+# Node levels from the root of the tree
+NODE_LEVELS = ('root', 'range', 'project', 'component')
+
+# Catalogue level of the risks of each register level
+CATALOGUE_LEVELS = {'strategic': 'strategico', 'project': 'progetto', 'operational': 'operativo'}
+
+# Range under which the risks of projects missing from the catalogue are rolled up
+UNASSIGNED = 'Non in catalogo'
+
+
+class RollupNode:
+    """Aggregates of the risks of a catalogue node and of its descendants"""
+
+    def __init__(self, name: str, level: str, path: Tuple[str, ...]):
+        self.name = name
+        self.level = level
+        self.path = path
+        self.children: Dict[str, 'RollupNode'] = {}
+        # Risks attached to this node itself (storage key -> risk)
+        self.risks: Dict[str, Dict] = {}
+        self.count = 0
+        self.sums = {field: 0.0 for field in ROLLUP_FIELDS}
+        # Highest (value, key) pairs in ascending order; rebuilt from the
+        # node's own risks and its children's lists when one of them is removed
+        self.top = {field: [] for field in ROLLUP_FIELDS}
+        self.stale = {field: False for field in ROLLUP_FIELDS}
+
+    def walk(self):
+        """This node and its descendants, depth first"""
+        yield self
+        for child in self.children.values():
+            yield from child.walk()
+
+
+class RollupTree:
+    """
+    Incrementally maintained roll-up of the register by range, project and component
+
+    Every risk is attached to the catalogue node named by its ``Project`` (a
+    product range for strategic risks, a project or a component), and each
+    node keeps the count, the sums and the top ``top_k`` risks by RI_Cost and
+    RI_Time of its whole subtree. Adding or removing a risk updates only the
+    nodes on its path, so reads never regroup the register. The maximum and
+    top risks of a node are rebuilt only after one of them was removed, on
+    the next read, from the node's own risks and the top risks of its
+    children: only the nodes on the path of the removed risk are revisited.
+    """
+
+    def __init__(self, paths: Dict = None, top_k: int = 5):
+        self.paths = paths or {}
+        self.top_k = top_k
+        self._lock = threading.RLock()
+        self.root = RollupNode('', 'root', ())
+        self._placed: Dict[str, Tuple[Tuple[str, ...], Dict[str, float]]] = {}
+
+    @classmethod
+    def from_catalogue(cls, catalogue, top_k: int = 5) -> 'RollupTree':
+        """
+        Build an empty tree placing risks by the nodes of a catalogue
+
+        Args:
+            catalogue: A ``catalogue.CatalogueIndex``
+            top_k: Number of top risks kept per node and index
+        """
+        paths = {}
+        for node in catalogue.nodes:
+            paths.setdefault((node['level'], node['name']), node['path'])
+            paths.setdefault(node['name'], node['path'])
+        return cls(paths, top_k)
+
+    def _risk_path(self, risk: Dict) -> Tuple[str, ...]:
+        project = str(risk.get('Project') or '')
+        level = CATALOGUE_LEVELS.get(normalize_level(risk.get('Level')))
+        path = self.paths.get((level, project)) or self.paths.get(project)
+        return tuple(path) if path else (UNASSIGNED, project)
+
+    def _nodes(self, path: Tuple[str, ...], create: bool = False) -> List[RollupNode]:
+        """Nodes from the root to a path (fewer if the path does not exist)"""
+        nodes = [self.root]
+        for depth, name in enumerate(path, 1):
+            child = nodes[-1].children.get(name)
+            if child is None:
+                if not create:
+                    break
+                child = nodes[-1].children[name] = RollupNode(name, NODE_LEVELS[depth], path[:depth])
+            nodes.append(child)
+        return nodes
+
+    def add(self, key: str, risk: Dict):
+        """Roll up a risk stored under ``key``, replacing its previous version"""
+        with self._lock:
+            self.remove(key)
+            path = self._risk_path(risk)
+            values = {field: risk_index_value(risk, field) for field in ROLLUP_FIELDS}
+            nodes = self._nodes(path, create=True)
+            nodes[-1].risks[key] = risk
+            self._placed[key] = (path, values)
+
+            for node in nodes:
+                node.count += 1
+                for field, value in values.items():
+                    if value is None:
+                        continue
+                    node.sums[field] += value
+                    top = node.top[field]
+                    if not node.stale[field] and (len(top) < self.top_k or (value, key) > top[0]):
+                        bisect.insort(top, (value, key))
+                        if len(top) > self.top_k:
+                            top.pop(0)
+
+    def remove(self, key: str):
+        """Remove the risk stored under ``key`` from the roll-up, if present"""
+        with self._lock:
+            placed = self._placed.pop(key, None)
+            if placed is None:
+                return
+            path, values = placed
+            nodes = self._nodes(path)
+            del nodes[-1].risks[key]
+
+            for node in nodes:
+                node.count -= 1
+                for field, value in values.items():
+                    if value is None:
+                        continue
+                    node.sums[field] -= value
+                    top = node.top[field]
+                    position = bisect.bisect_left(top, (value, key))
+                    if position < len(top) and top[position] == (value, key):
+                        del top[position]
+                        node.stale[field] = True
+
+    def _refresh(self, node: RollupNode, field: str):
+        """Rebuild the top risks of a node after a removal"""
+        if node.stale[field]:
+            entries = []
+            for key in node.risks:
+                value = self._placed[key][1][field]
+                if value is not None:
+                    entries.append((value, key))
+            # The top risks of the subtree are among the top risks of the children
+            for child in node.children.values():
+                self._refresh(child, field)
+                entries.extend(child.top[field])
+            entries.sort()
+            node.top[field] = entries[-self.top_k:] if self.top_k else []
+            node.stale[field] = False
+
+    def _summary(self, node: RollupNode, depth: int) -> Dict:
+        summary = {'name': node.name, 'level': node.level, 'path': list(node.path), 'count': node.count}
+        for field in ROLLUP_FIELDS:
+            self._refresh(node, field)
+            top = node.top[field]
+            summary[field] = {
+                # Float sums drift by rounding; an empty subtree is exactly zero
+                'sum': node.sums[field] if node.count else 0.0,
+                'max': top[-1][0] if top else None,
+                'top': [self._top_entry(key, value) for value, key in reversed(top)]
+            }
+        if depth != 0:
+            children = sorted(node.children.values(), key=lambda child: -child.sums['RI_Cost'])
+            summary['children'] = [self._summary(child, depth - 1) for child in children if child.count]
+        return summary
+
+    def _top_entry(self, key: str, value: float) -> Dict:
+        path = self._placed[key][0]
+        risk = self._nodes(path)[-1].risks[key]
+        return {'key': key, 'Risk_ID': risk.get('Risk_ID'), 'Risk_Title': risk.get('Risk_Title'), 'value': value}
+
+    def summary(self, path: Tuple[str, ...] = (), depth: int = 1) -> Optional[Dict]:
+        """
+        Aggregates of a node and of its descendants
+
+        Args:
+            path: Names from the range down to the node (empty for the whole register)
+            depth: Levels of children to include (negative for all of them)
+
+        Returns:
+            The count, and the sum, maximum and top risks of RI_Cost and
+            RI_Time, of the node and of its children; None if the path does
+            not exist
+        """
+        with self._lock:
+            nodes = self._nodes(tuple(path))
+            if len(nodes) != len(path) + 1:
+                return None
+            return self._summary(nodes[-1], depth)
@@ -0,0 +1,718 @@
+import bisect
+import itertools
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DATA_FILE = 'data/risk_assessment_data.json'
+WAL_FILE = 'data/risk_assessment_data.wal'
+META_FILE = 'data/risk_assessment_data.meta.json'
+
+# Italian level names used by the Streamlit form, mapped to the generated ones
+LEVEL_ALIASES = {
+    'strategico': 'strategic',
+    'progetto': 'project',
+    'operativo': 'operational'
+}
+
+# Fields with a sorted secondary index (range filters and fast sorting)
+SORTED_FIELDS = ('RI_Cost', 'RI_Time')
+
+
+def normalize_level(level) -> Optional[str]:
+    """Lower-case a risk level and map the Italian names to the English ones"""
+    if level is None:
+        return None
+    level = str(level).strip().lower()
+    return LEVEL_ALIASES.get(level, level)
+
+
+def risk_index_value(risk: Dict, field: str) -> Optional[float]:
+    """Numeric value of RI_Cost/RI_Time, computed from probability and impact when missing"""
+    value = risk.get(field)
+    if value is None:
+        impact = risk.get('Cost_Impact' if field == 'RI_Cost' else 'Time_Impact')
+        probability = risk.get('Risk_Probability')
+        if impact is None or probability is None:
+            return None
+        try:
+            value = float(probability) * float(impact)
+        except (TypeError, ValueError):
+            return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def check_unique_ids(risks: List[Dict]):
+    """
+    Reject a batch in which several risks share a Risk_ID
+
+    Raises:
+        ValueError: If a Risk_ID appears more than once
+    """
+    seen, duplicates = set(), []
+    for risk in risks:
+        risk_id = risk.get('Risk_ID')
+        if risk_id is None:
+            continue
+        if risk_id in seen and risk_id not in duplicates:
+            duplicates.append(risk_id)
+        seen.add(risk_id)
+    if duplicates:
+        raise ValueError(f"Duplicate Risk_IDs in batch: {', '.join(map(str, duplicates))}")
+
+
+def sort_risks(risks: List[Dict], field: str, descending: bool = False) -> List[Dict]:
+    """Sort risks by a field, numbers before text, keeping risks without a value last"""
+    def value(risk):
+        return risk_index_value(risk, field) if field in SORTED_FIELDS else risk.get(field)
+
+    present = [risk for risk in risks if value(risk) is not None]
+    missing = [risk for risk in risks if value(risk) is None]
+    present.sort(
+        key=lambda risk: (0, value(risk)) if isinstance(value(risk), (int, float)) else (1, str(value(risk))),
+        reverse=descending
+    )
+    return present + missing
+
+
+class RiskQuery:
+    """Filters, sort order and page of a GET /api/risks request"""
+
+    def __init__(self, level: str = None, project: str = None, owner: str = None,
+                 min_ri_cost: float = None, min_ri_time: float = None,
+                 sort: str = None, offset: int = 0, limit: int = None):
+        self.level = normalize_level(level)
+        self.project = project
+        self.owner = owner
+        self.min_values = {
+            field: value for field, value in (('RI_Cost', min_ri_cost), ('RI_Time', min_ri_time))
+            if value is not None
+        }
+        self.descending = bool(sort) and sort.startswith('-')
+        self.sort_field = sort.lstrip('-+') if sort else None
+        self.offset = max(0, offset)
+        self.limit = limit
+
+    def matches(self, risk: Dict) -> bool:
+        if self.level is not None and normalize_level(risk.get('Level')) != self.level:
+            return False
+        if self.project is not None and risk.get('Project') != self.project:
+            return False
+        if self.owner is not None and risk.get('Owner') != self.owner:
+            return False
+        for field, minimum in self.min_values.items():
+            value = risk_index_value(risk, field)
+            if value is None or value < minimum:
+                return False
+        return True
+
+    def page(self, risks: List[Dict]) -> List[Dict]:
+        end = None if self.limit is None else self.offset + self.limit
+        return risks[self.offset:end]
+
+
+class RiskStorage:
+    """Interface of the risk register storage used by the Flask API"""
+
+    def all(self) -> List[Dict]:
+        """Return every risk in insertion order"""
+        raise NotImplementedError
+
+    def get(self, risk_id: str) -> Optional[Dict]:
+        """Return the risk with the given Risk_ID, or None"""
+        raise NotImplementedError
+
+    def add(self, risk: Dict) -> Dict:
+        """Append a risk to the register"""
+        raise NotImplementedError
+
+    def update(self, risk_id: str, risk: Dict) -> Optional[Dict]:
+        """Replace the risk with the given Risk_ID, returning None if it does not exist"""
+        raise NotImplementedError
+
+    def delete(self, risk_id: str) -> Optional[Dict]:
+        """Remove the risk with the given Risk_ID, returning None if it does not exist"""
+        raise NotImplementedError
+
+    def upsert_many(self, risks: List[Dict]) -> Dict:
+        """
+        Insert or replace several risks by Risk_ID in one atomic write
+
+        A risk replaces the record stored under its Risk_ID; other records
+        sharing that Risk_ID are left alone.
+
+        Returns:
+            Dictionary with the number of inserted and updated risks
+
+        Raises:
+            ValueError: If several risks of the batch share a Risk_ID
+        """
+        raise NotImplementedError
+
+    def add_many(self, risks: List[Dict]) -> Dict:
+        """
+        Insert several risks as new records in one atomic write
+
+        Nothing stored is replaced, even when a Risk_ID is already taken.
+
+        Returns:
+            Dictionary with the number of inserted risks
+        """
+        raise NotImplementedError
+
+    def replace_node(self, node: str, risks: List[Dict]) -> Dict:
+        """
+        Replace the generated risks of a catalogue node in one atomic write
+
+        Generated risks carry the key of their catalogue node (e.g.
+        ``operational::Range/Project/Component``) in their ``Node`` field.
+        The stored risks with that key are deleted and the new risks are
+        inserted, so a reassessed node keeps no superseded risks; risks
+        without a ``Node`` (entered or curated by hand) are never touched.
+
+        Args:
+            node: Key of the catalogue node (see ``catalogue_manifest.node_key``)
+            risks: The new risks of the node
+
+        Returns:
+            Dictionary with the number of deleted and inserted risks
+        """
+        raise NotImplementedError
+
+    @property
+    def revision(self) -> int:
+        """Monotonically increasing revision of the register, bumped by every write"""
+        raise NotImplementedError
+
+    def changes_since(self, since: int) -> Optional[List[Dict]]:
+        """
+        Return the changes made after a revision, oldest first
+
+        Each change is ``{"rev", "op": "put"|"delete", "key", "risk"}``. Returns
+        None when the changes are no longer available and the client has to
+        reload the whole register.
+        """
+        return None
+
+    def snapshot(self) -> List[Dict]:
+        """Every risk with its storage key, as ``{"key", "risk"}``"""
+        return [{"key": str(i), "risk": risk} for i, risk in enumerate(self.all())]
+
+    def query(self, query: RiskQuery) -> Tuple[List[Dict], int]:
+        """
+        Return one page of the risks matching a query
+
+        Returns:
+            The risks of the requested page and the total number of matches
+        """
+        risks = [risk for risk in self.all() if query.matches(risk)]
+        if query.sort_field:
+            risks = sort_risks(risks, query.sort_field, query.descending)
+        return query.page(risks), len(risks)
+
+
+class JsonFileStorage(RiskStorage):
+    """Original storage: every operation re-reads and rewrites the whole JSON file"""
+
+    def __init__(self, data_file: str = DATA_FILE):
+        self.data_file = Path(data_file)
+
+    def _load(self) -> List[Dict]:
+        try:
+            with open(self.data_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _save(self, data: List[Dict]):
+        self.data_file.parent.mkdir(exist_ok=True)
+        with open(self.data_file, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    @property
+    def revision(self) -> int:
+        try:
+            return self.data_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def changes_since(self, since: int) -> Optional[List[Dict]]:
+        # No change history: the client only learns whether it is up to date
+        return [] if since == self.revision else None
+
+    def all(self) -> List[Dict]:
+        return self._load()
+
+    def get(self, risk_id: str) -> Optional[Dict]:
+        return next((risk for risk in self._load() if risk.get('Risk_ID') == risk_id), None)
+
+    def add(self, risk: Dict) -> Dict:
+        risks = self._load()
+        risks.append(risk)
+        self._save(risks)
+        return risk
+
+    def update(self, risk_id: str, risk: Dict) -> Optional[Dict]:
+        risks = self._load()
+        for i, existing in enumerate(risks):
+            if existing.get('Risk_ID') == risk_id:
+                risks[i] = risk
+                self._save(risks)
+                return risk
+        return None
+
+    def delete(self, risk_id: str) -> Optional[Dict]:
+        risks = self._load()
+        for i, existing in enumerate(risks):
+            if existing.get('Risk_ID') == risk_id:
+                deleted = risks.pop(i)
+                self._save(risks)
+                return deleted
+        return None
+
+    def upsert_many(self, risks: List[Dict]) -> Dict:
+        check_unique_ids(risks)
+        existing = self._load()
+        positions = {}
+        for i, risk in enumerate(existing):
+            positions.setdefault(risk.get('Risk_ID'), i)
+
+        inserted = updated = 0
+        for risk in risks:
+            risk_id = risk.get('Risk_ID')
+            if risk_id is not None and risk_id in positions:
+                existing[positions[risk_id]] = risk
+                updated += 1
+            else:
+                positions[risk_id] = len(existing)
+                existing.append(risk)
+                inserted += 1
+
+        self._save(existing)
+        return {"inserted": inserted, "updated": updated}
+
+    def add_many(self, risks: List[Dict]) -> Dict:
+        self._save(self._load() + list(risks))
+        return {"inserted": len(risks)}
+
+    def replace_node(self, node: str, risks: List[Dict]) -> Dict:
+        existing = self._load()
+        kept = [risk for risk in existing if risk.get('Node') != node]
+        self._save(kept + list(risks))
+        return {"deleted": len(existing) - len(kept), "inserted": len(risks)}
+
+
+class WalRiskStorage(RiskStorage):
+    """
+    In-memory risk register indexed by Risk_ID with an append-only write-ahead log
+
+    The JSON data file is the snapshot (and stays the import/export format);
+    every write appends one line to the log, which is replayed on startup and
+    folded back into the snapshot every ``compact_every`` writes. Each record
+    is stored under a key equal to its Risk_ID; records sharing a Risk_ID keep
+    their position under ``<Risk_ID>#<n>`` keys so the ID lookup still finds
+    the first one, as the list scan did.
+
+    The register lives in the memory of one process: run the API with a
+    single worker process (threads are fine).
+    """
+
+    def __init__(self, data_file: str = DATA_FILE, wal_file: str = WAL_FILE,
+                 meta_file: str = META_FILE, compact_every: int = 1000,
+                 fsync: bool = True, changelog_size: int = 10000):
+        self.data_file = Path(data_file)
+        self.wal_file = Path(wal_file)
+        self.meta_file = Path(meta_file)
+        self.compact_every = compact_every
+        self.fsync = fsync
+
+        self._lock = threading.RLock()
+        self._records = {}
+        self._wal_entries = 0
+        self._unnamed = 0
+
+        # Revision counter and the recent changes served to syncing clients;
+        # the changelog holds every change made after ``_changelog_base``
+        self._revision = 0
+        self._changelog = deque(maxlen=changelog_size)
+        self._changelog_base = 0
+
+        # Secondary indexes: insertion position, equality sets and sorted values
+        self._positions = {}
+        self._next_position = 0
+        self._by_field = {'Level': {}, 'Project': {}, 'Owner': {}, 'Node': {}}
+        self._sorted = {field: [] for field in SORTED_FIELDS}
+        self._values = {field: {} for field in SORTED_FIELDS}
+
+        # Roll-up by range, project and component (see rollup.py), if attached
+        self.rollup = None
+
+        self._load_snapshot()
+        self._replay_wal()
+        self._wal = open(self.wal_file, 'a', encoding='utf-8')
+
+    # Loading
+
+    def _load_snapshot(self):
+        try:
+            with open(self.data_file, 'r') as f:
+                risks = json.load(f)
+        except FileNotFoundError:
+            risks = []
+
+        try:
+            with open(self.meta_file, 'r') as f:
+                self._revision = json.load(f).get('revision', 0)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._revision = 0
+
+        for risk in risks:
+            self._put(self._new_key(risk), risk)
+        self._changelog_base = self._revision
+
+    def _replay_wal(self):
+        self.wal_file.parent.mkdir(exist_ok=True)
+        if not self.wal_file.exists():
+            return
+
+        valid, ended = 0, True
+        with open(self.wal_file, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # A torn last line from an interrupted write: the write never completed
+                    break
+                self._revision = entry.get('rev', self._revision + 1)
+                self._apply(entry)
+                self._wal_entries += 1
+                valid += len(line)
+                ended = line.endswith(b'\n')
+
+        # Cut the torn tail off, so the records appended next are not written after it
+        with open(self.wal_file, 'r+b') as f:
+            f.truncate(valid)
+            if valid and not ended:
+                f.seek(valid)
+                f.write(b'\n')
+
+    def _new_key(self, risk: Dict, taken=None) -> str:
+        """
+        Storage key for a new record: its Risk_ID, disambiguated if already taken
+
+        Args:
+            risk: The new record
+            taken: Whether a key is in use, for keys changed by a pending batch
+                (defaults to the stored records)
+        """
+        taken = taken or self._records.__contains__
+        risk_id = risk.get('Risk_ID')
+        if risk_id is None:
+            self._unnamed += 1
+            risk_id = f"#{self._unnamed}"
+            while taken(risk_id):
+                self._unnamed += 1
+                risk_id = f"#{self._unnamed}"
+            return risk_id
+
+        key, n = str(risk_id), 1
+        while taken(key):
+            n += 1
+            key = f"{risk_id}#{n}"
+        return key
+
+    # Secondary indexes
+
+    def _index_keys(self, risk: Dict):
+        yield 'Level', normalize_level(risk.get('Level'))
+        yield 'Project', risk.get('Project')
+        yield 'Owner', risk.get('Owner')
+        yield 'Node', risk.get('Node')
+
+    def _put(self, key: str, risk: Dict):
+        if key in self._records:
+            self._unindex(key)
+        else:
+            self._positions[key] = self._next_position
+            self._next_position += 1
+
+        self._records[key] = risk
+        for field, value in self._index_keys(risk):
+            self._by_field[field].setdefault(value, set()).add(key)
+        for field in SORTED_FIELDS:
+            value = risk_index_value(risk, field)
+            if value is not None:
+                self._values[field][key] = value
+                bisect.insort(self._sorted[field], (value, key))
+        if self.rollup is not None:
+            self.rollup.add(key, risk)
+
+    def _remove(self, key: str):
+        if key not in self._records:
+            return
+        self._unindex(key)
+        del self._records[key]
+        del self._positions[key]
+        if self.rollup is not None:
+            self.rollup.remove(key)
+
+    def attach_rollup(self, rollup):
+        """Keep a roll-up tree up to date on every write, starting from the current register"""
+        with self._lock:
+            for key, risk in self._records.items():
+                rollup.add(key, risk)
+            self.rollup = rollup
+
+    def _unindex(self, key: str):
+        for field, value in self._index_keys(self._records[key]):
+            keys = self._by_field[field].get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_field[field][value]
+        for field in SORTED_FIELDS:
+            value = self._values[field].pop(key, None)
+            if value is not None:
+                entries = self._sorted[field]
+                del entries[bisect.bisect_left(entries, (value, key))]
+
+    # Write-ahead log
+
+    def _apply(self, entry: Dict):
+        if entry['op'] == 'batch':
+            for op in entry['ops']:
+                self._apply(op)
+            return
+
+        if entry['op'] == 'put':
+            self._put(entry['key'], entry['risk'])
+        elif entry['op'] == 'delete':
+            self._remove(entry['key'])
+        if len(self._changelog) == self._changelog.maxlen:
+            # The oldest change is about to be dropped
+            self._changelog_base = self._changelog[0]['rev']
+        self._changelog.append({
+            'rev': self._revision,
+            'op': entry['op'],
+            'key': entry['key'],
+            'risk': entry.get('risk')
+        })
+
+    def _log(self, entry: Dict):
+        """Make a change durable in the log, then apply it to the in-memory register"""
+        self._revision += 1
+        entry['rev'] = self._revision
+        self._wal.write(json.dumps(entry) + '\n')
+        self._wal.flush()
+        if self.fsync:
+            os.fsync(self._wal.fileno())
+
+        self._apply(entry)
+        self._wal_entries += 1
+        if self.compact_every and self._wal_entries >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Write the register to the JSON snapshot and truncate the log"""
+        with self._lock:
+            self.export_json(self.data_file)
+            tmp_path = self.meta_file.with_suffix(self.meta_file.suffix + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({'revision': self._revision}, f)
+            os.replace(tmp_path, self.meta_file)
+            self._wal.close()
+            self._wal = open(self.wal_file, 'w', encoding='utf-8')
+            self._wal_entries = 0
+
+    def export_json(self, path):
+        """Atomically write the register as a JSON list of risks"""
+        path = Path(path)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(list(self._records.values()), f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+
+    # RiskStorage interface
+
+    @property
+    def revision(self) -> int:
+        with self._lock:
+            return self._revision
+
+    def changes_since(self, since: int) -> Optional[List[Dict]]:
+        with self._lock:
+            if since > self._revision or since < self._changelog_base:
+                return None
+            return [change for change in self._changelog if change['rev'] > since]
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [{"key": key, "risk": risk} for key, risk in self._records.items()]
+
+    def all(self) -> List[Dict]:
+        with self._lock:
+            return list(self._records.values())
+
+    def get(self, risk_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._records.get(risk_id)
+
+    def add(self, risk: Dict) -> Dict:
+        with self._lock:
+            self._log({'op': 'put', 'key': self._new_key(risk), 'risk': risk})
+            return risk
+
+    def update(self, risk_id: str, risk: Dict) -> Optional[Dict]:
+        with self._lock:
+            if risk_id not in self._records:
+                return None
+            self._log({'op': 'put', 'key': risk_id, 'risk': risk})
+            return risk
+
+    def delete(self, risk_id: str) -> Optional[Dict]:
+        with self._lock:
+            deleted = self._records.get(risk_id)
+            if deleted is None:
+                return None
+            self._log({'op': 'delete', 'key': risk_id})
+            return deleted
+
+    def upsert_many(self, risks: List[Dict]) -> Dict:
+        check_unique_ids(risks)
+        with self._lock:
+            ops, batch_keys = [], set()
+            inserted = updated = 0
+            for risk in risks:
+                risk_id = risk.get('Risk_ID')
+                # The record stored under the Risk_ID itself, never its "#n" namesakes
+                if risk_id is not None and str(risk_id) in self._records:
+                    key = str(risk_id)
+                    updated += 1
+                else:
+                    key = self._new_key(risk)
+                    while key in batch_keys:
+                        # Unnamed risks get a fresh key for each record of the batch
+                        key = f"{key}#"
+                    inserted += 1
+                batch_keys.add(key)
+                ops.append({'op': 'put', 'key': key, 'risk': risk})
+
+            # A single log line: the whole batch is replayed or none of it is
+            self._log({'op': 'batch', 'ops': ops})
+            return {"inserted": inserted, "updated": updated}
+
+    def add_many(self, risks: List[Dict]) -> Dict:
+        with self._lock:
+            batch_keys = set()
+
+            def taken(key):
+                return key in batch_keys or key in self._records
+
+            ops = []
+            for risk in risks:
+                key = self._new_key(risk, taken)
+                batch_keys.add(key)
+                ops.append({'op': 'put', 'key': key, 'risk': risk})
+
+            if ops:
+                self._log({'op': 'batch', 'ops': ops})
+            return {"inserted": len(risks)}
+
+    def replace_node(self, node: str, risks: List[Dict]) -> Dict:
+        with self._lock:
+            removed = set(self._by_field['Node'].get(node, set()))
+            ops = [{'op': 'delete', 'key': key} for key in sorted(removed, key=self._positions.get)]
+
+            # The keys of the deleted risks are free again for the new ones
+            batch_keys = set()
+
+            def taken(key):
+                return key in batch_keys or (key in self._records and key not in removed)
+
+            for risk in risks:
+                key = self._new_key(risk, taken)
+                batch_keys.add(key)
+                ops.append({'op': 'put', 'key': key, 'risk': risk})
+
+            if ops:
+                self._log({'op': 'batch', 'ops': ops})
+            return {"deleted": len(removed), "inserted": len(risks)}
+
+    def query(self, query: RiskQuery) -> Tuple[List[Dict], int]:
+        with self._lock:
+            # Intersect the equality indexes, smallest first
+            candidates = None
+            filters = [('Level', query.level), ('Project', query.project), ('Owner', query.owner)]
+            index_sets = sorted(
+                (self._by_field[field].get(value, set()) for field, value in filters if value is not None),
+                key=len
+            )
+            for keys in index_sets:
+                candidates = set(keys) if candidates is None else candidates & keys
+
+            # Range filters from the sorted indexes
+            for field, minimum in query.min_values.items():
+                if candidates is None:
+                    entries = self._sorted[field]
+                    candidates = {key for _, key in entries[bisect.bisect_left(entries, (minimum, '')):]}
+                else:
+                    values = self._values[field]
+                    candidates = {key for key in candidates if key in values and values[key] >= minimum}
+
+            total = len(self._records) if candidates is None else len(candidates)
+            end = None if query.limit is None else query.offset + query.limit
+
+            if query.sort_field in SORTED_FIELDS:
+                # Walk the sorted index and stop once the page is full
+                ordered = itertools.chain(
+                    self._iter_sorted(query.sort_field, query.descending, candidates),
+                    self._iter_unsorted(query.sort_field, candidates)
+                )
+                keys = list(itertools.islice(ordered, query.offset, end))
+                return [self._records[key] for key in keys], total
+
+            if candidates is None:
+                keys = list(self._records)
+            else:
+                keys = sorted(candidates, key=self._positions.get)
+            risks = [self._records[key] for key in keys]
+            if query.sort_field:
+                risks = sort_risks(risks, query.sort_field, query.descending)
+            return query.page(risks), total
+
+    def _iter_sorted(self, field: str, descending: bool, candidates: Optional[set]):
+        """Keys with a value for an indexed field, in sorted order"""
+        entries = self._sorted[field]
+        for _, key in (reversed(entries) if descending else entries):
+            if candidates is None or key in candidates:
+                yield key
+
+    def _iter_unsorted(self, field: str, candidates: Optional[set]):
+        """Keys without a value for an indexed field, in insertion order"""
+        keys = self._records if candidates is None else candidates
+        missing = [key for key in keys if key not in self._values[field]]
+        missing.sort(key=self._positions.get)
+        yield from missing
+
+
+def create_storage() -> RiskStorage:
+    """Build the storage backend selected by the RISK_STORAGE environment variable"""
+    backend = os.getenv('RISK_STORAGE', 'wal').lower()
+    if backend == 'json':
+        return JsonFileStorage()
+
+    return WalRiskStorage(
+        compact_every=int(os.getenv('RISK_WAL_COMPACT_EVERY', '1000')),
+        fsync=os.getenv('RISK_WAL_FSYNC', 'true').lower() != 'false',
+        changelog_size=int(os.getenv('RISK_CHANGELOG_SIZE', '10000'))
+    )
@@ -0,0 +1,15 @@
+"""
+Benchmarks of the risk assessment platform.
+
+This package generates synthetic product catalogues and risk registers of
+any size. ``python -m benchmarks.run_benchmarks`` times the backend storage
+and API, the dashboard dataframe and figures and the agent pipeline (with
+the offline stand-in model of ``agents.fake_llm``) on them.
+"""
+
+from .catalogue_generator import generate_catalogue, generate_risk_register
+
+__all__ = [
+    'generate_catalogue',
+    'generate_risk_register'
+]
@@ -0,0 +1,152 @@
+import math
+import random
+from typing import Dict, List, Sequence
+
+from agents.fake_llm import MITIGATION_ACTIONS, RISK_THEMES
+
+RANGE_NAMES = ["Luxury Sedan", "Compact SUV", "City Car", "Electric Crossover", "Light Commercial", "Sports Coupe"]
+COMPONENT_NAMES = ["Battery Pack", "Infotainment System", "Brake System", "Chassis", "Powertrain",
+                   "ADAS Sensors", "Seating", "HVAC Module", "Body in White", "Wiring Harness"]
+OWNERS = ["Strategic Planning Director", "Compliance Director", "Project Manager", "Quality Manager",
+          "Powertrain Engineer", "ADAS Engineer", "Battery Systems Manager", "Chassis Engineer",
+          "Purchasing Manager", "Validation Engineer"]
+
+# Catalogue levels: (generated level, Italian level, risk key, Risk_ID prefix)
+CATALOGUE_LEVELS = {
+    "strategic": ("strategico", "rischi_strategici", "RS"),
+    "project": ("progetto", "rischi_progetto", "RP"),
+    "operational": ("operativo", "rischi_operativi", "RO")
+}
+
+
+def _risk(rng: random.Random, level: str, project: str, owner: str) -> Dict:
+    """Random risk of a level, with the probability between 0 and 1"""
+    title, description = rng.choice(RISK_THEMES[level])
+    probability = round(rng.uniform(0.05, 0.9), 2)
+    cost_impact = int(round(rng.lognormvariate(math.log(1_000_000), 1.0), -3))
+    time_impact = rng.randint(1, 30)
+    return {
+        "Level": level,
+        "Project": project,
+        "Owner": owner,
+        "Risk_Title": title,
+        "Risk_Description": description.format(target=project),
+        "Risk_Probability": probability,
+        "Cost_Impact": cost_impact,
+        "Time_Impact": time_impact,
+        "Detection": round(rng.uniform(0.2, 0.9), 2),
+        "Mitigation_Plan": " ".join(
+            f"{i}. {action}." for i, action in enumerate(rng.sample(MITIGATION_ACTIONS, 3), start=1)
+        )
+    }
+
+
+def _catalogue_risks(rng: random.Random, level: str, name: str, count: int, counters: Dict) -> List[Dict]:
+    """Risks of a catalogue node in the format of ``data/initial_data.json``"""
+    italian_level, _, prefix = CATALOGUE_LEVELS[level]
+    risks = []
+    for _ in range(count):
+        counters[level] += 1
+        risk = _risk(rng, level, name, rng.choice(OWNERS))
+        risks.append({
+            "Risk_ID": f"{prefix}{counters[level]:03d}",
+            **risk,
+            "Level": italian_level,
+            # The catalogue gives probabilities in percent
+            "Risk_Probability": int(risk["Risk_Probability"] * 100)
+        })
+    return risks
+
+
+def generate_catalogue(components: int, projects_per_range: int = 4, components_per_project: int = 5,
+                       risks_per_node: int = 0, seed: int = 0) -> Dict:
+    """
+    Generate a product catalogue in the format of ``data/initial_data.json``
+
+    Args:
+        components: Number of components (operational nodes) in the catalogue
+        projects_per_range: Projects in each product range
+        components_per_project: Components in each project (the last project
+            gets the remainder)
+        risks_per_node: Existing risks of every range, project and component
+        seed: Seed of the random names and risks
+
+    Returns:
+        Catalogue with ``product_range`` ranges, projects and components
+    """
+    rng = random.Random(seed)
+    projects = max(1, math.ceil(components / components_per_project))
+    ranges = max(1, math.ceil(projects / projects_per_range))
+    counters = {level: 0 for level in CATALOGUE_LEVELS}
+
+    catalogue = {"product_range": []}
+    remaining = components
+    for r in range(ranges):
+        range_name = f"{RANGE_NAMES[r % len(RANGE_NAMES)]} Range {r + 1}"
+        product_range = {
+            "name": range_name,
+            "description": f"Synthetic product range {r + 1}",
+            "rischi_strategici": _catalogue_risks(rng, "strategic", range_name, risks_per_node, counters),
+            "projects": []
+        }
+        for p in range(projects_per_range):
+            if remaining <= 0:
+                break
+            project_name = f"Model {chr(ord('A') + r % 26)}{r + 1}-{p + 1}"
+            project = {
+                "name": project_name,
+                "description": f"Synthetic project {p + 1} of {range_name}",
+                "rischi_progetto": _catalogue_risks(rng, "project", project_name, risks_per_node, counters),
+                "components": []
+            }
+            for c in range(min(components_per_project, remaining)):
+                component_name = f"{rng.choice(COMPONENT_NAMES)} {project_name}-{c + 1}"
+                project["components"].append({
+                    "name": component_name,
+                    "description": f"Synthetic component {c + 1} of {project_name}",
+                    "rischi_operativi": _catalogue_risks(rng, "operational", component_name,
+                                                         risks_per_node, counters)
+                })
+            remaining -= len(project["components"])
+            product_range["projects"].append(project)
+        catalogue["product_range"].append(product_range)
+
+    return catalogue
+
+
+def generate_risk_register(risks: int, projects: int = 50, owners: int = 10,
+                           level_weights: Sequence[float] = (0.1, 0.3, 0.6),
+                           missing_rate: float = 0.0, seed: int = 0) -> List[Dict]:
+    """
+    Generate a risk register in the format saved by the app and the backend
+
+    Args:
+        risks: Number of risks
+        projects: Number of distinct projects the risks belong to
+        owners: Number of distinct owners (at most the number of known owners)
+        level_weights: Share of strategic, project and operational risks
+        missing_rate: Share of risks without probability and impacts, as left
+            by a failed evaluation
+        seed: Seed of the random values
+
+    Returns:
+        List of risks with unique ``Risk_ID`` values and their risk indices
+    """
+    rng = random.Random(seed)
+    levels = list(CATALOGUE_LEVELS)
+    project_names = [f"Synthetic Project {i + 1}" for i in range(max(1, projects))]
+    owner_names = OWNERS[:max(1, min(owners, len(OWNERS)))]
+
+    register = []
+    for i in range(risks):
+        level = rng.choices(levels, weights=level_weights)[0]
+        risk = {"Risk_ID": f"SYN{i + 1:06d}", **_risk(rng, level, rng.choice(project_names), rng.choice(owner_names))}
+        if rng.random() < missing_rate:
+            for key in ("Risk_Probability", "Cost_Impact", "Time_Impact"):
+                risk.pop(key)
+        else:
+            risk["RI_Cost"] = risk["Risk_Probability"] * risk["Cost_Impact"]
+            risk["RI_Time"] = risk["Risk_Probability"] * risk["Time_Impact"]
+        register.append(risk)
+
+    return register
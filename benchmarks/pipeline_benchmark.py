@@ -0,0 +1,138 @@
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from agents import AgentCoordinator
+
+from .catalogue_generator import generate_catalogue
+
+
+def benchmark_config(work_dir: Path, max_workers: int = 8, batch_size: int = 5, seed: int = 0,
+                     latency: Dict = None, errors: Dict = None, time_scale: float = 1.0,
+                     requests_per_minute: float = 100000, tokens_per_minute: float = 100000000) -> Dict:
+    """
+    Agent configuration running on the offline stand-in model
+
+    The response cache and the Risk_ID allocator of the backend are disabled
+    and the manifest and run report are written in ``work_dir``, so a
+    benchmark never touches the data of the app.
+    """
+    return {
+        "web_search_agent": {"enabled": True, "temperature": 0.7},
+        "risk_evaluation_agent": {"enabled": True, "temperature": 0.3},
+        "mitigation_agent": {"enabled": True, "temperature": 0.6},
+        "concurrency": {"enabled": max_workers > 1, "max_workers": max_workers},
+        "response_cache": {"enabled": False},
+        "incremental": {"manifest_path": str(work_dir / "assessment_manifest.json")},
+        "batching": {"batch_size": batch_size},
+        "structured_output": {"enabled": True, "max_repair_attempts": 1},
+        "rate_limit": {
+            "enabled": True,
+            "requests_per_minute": requests_per_minute,
+            "tokens_per_minute": tokens_per_minute,
+            "max_concurrency": max_workers
+        },
+        "tracing": {"enabled": True, "report_dir": str(work_dir / "run_reports")},
+        "risk_ids": {"enabled": False},
+        "llm_backend": {
+            "type": "fake",
+            "fake": {"seed": seed, "latency": latency, "errors": errors, "time_scale": time_scale}
+        }
+    }
+
+
+def run_pipeline_benchmark(components: int, **options) -> Dict:
+    """
+    Time ``generate_risk_assessment`` on a synthetic catalogue
+
+    Args:
+        components: Number of components in the generated catalogue
+        **options: Options of ``benchmark_config`` (workers, batch size,
+            latency and error rates of the stand-in model)
+
+    Returns:
+        Catalogue size, wall time, throughput and the totals of the run trace
+    """
+    catalogue = generate_catalogue(components, seed=options.get("seed", 0))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        config_path = work_dir / "agent_config.json"
+        with open(config_path, 'w') as f:
+            json.dump(benchmark_config(work_dir, **options), f)
+
+        coordinator = AgentCoordinator(str(config_path))
+        started = time.perf_counter()
+        risks = coordinator.generate_risk_assessment(catalogue)
+        wall_time = time.perf_counter() - started
+
+    report = coordinator.last_run_report or {}
+    totals = report.get("totals", {})
+    nodes = len(coordinator._collect_nodes(catalogue))
+    return {
+        "components": components,
+        "nodes": nodes,
+        "risks": len(risks),
+        "wall_time": wall_time,
+        "nodes_per_second": nodes / wall_time if wall_time else None,
+        "calls": totals.get("calls", 0),
+        "prompt_tokens": totals.get("prompt_tokens", 0),
+        "completion_tokens": totals.get("completion_tokens", 0),
+        "cost": totals.get("cost", 0.0),
+        "retries": totals.get("retries", 0),
+        "fallbacks": totals.get("fallbacks", 0),
+        "bottleneck_stage": report.get("bottleneck_stage"),
+        "rate_limit": coordinator.get_rate_limit_report()
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the agent pipeline with the offline stand-in model")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Numbers of catalogue components to benchmark")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", choices=["constant", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--median-latency", type=float, default=1.5,
+                        help="Median (or constant) seconds per call before scaling")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Spread of the lognormal latency")
+    parser.add_argument("--time-scale", type=float, default=0.01,
+                        help="Factor applied to every simulated latency")
+    parser.add_argument("--rate-limit-errors", type=float, default=0.0, help="Share of calls answered with 429")
+    parser.add_argument("--server-errors", type=float, default=0.0, help="Share of calls answered with 500")
+    parser.add_argument("--malformed", type=float, default=0.0, help="Share of response items missing a field")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    latency = {
+        "distribution": args.latency,
+        "seconds": args.median_latency,
+        "median": args.median_latency,
+        "sigma": args.sigma,
+        "low": 0.0,
+        "high": 2 * args.median_latency
+    }
+    errors = {"rate_limit": args.rate_limit_errors, "server_error": args.server_errors, "malformed": args.malformed}
+
+    results = []
+    for size in args.sizes:
+        result = run_pipeline_benchmark(
+            size, max_workers=args.workers, batch_size=args.batch_size, seed=args.seed,
+            latency=latency, errors=errors, time_scale=args.time_scale
+        )
+        results.append(result)
+        print(f"{size:>6} components: {result['nodes']} nodes, {result['risks']} risks, "
+              f"{result['calls']} calls in {result['wall_time']:.2f}s "
+              f"({result['nodes_per_second']:.1f} nodes/s, bottleneck: {result['bottleneck_stage']})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import plotly.express as px
+
+from simulation import simulate_portfolio
+from visualization import build_risk_matrix, level_distribution_chart, risk_dataframe, top_risks_chart
+
+from .catalogue_generator import generate_risk_register
+from .pipeline_benchmark import run_pipeline_benchmark
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
+RESULTS_DIR = ROOT_DIR / "benchmarks" / "results"
+
+SUITES = ("storage", "api", "dataframe", "dashboard", "simulation", "pipeline")
+
+# Single-risk writes timed per case (the JSON storage rewrites the file on each one)
+WRITE_OPERATIONS = 100
+
+# Trials of the Monte Carlo simulation suite
+SIMULATION_TRIALS = 10000
+
+# A case slower than the baseline by more than this share is reported as a regression
+REGRESSION_THRESHOLD = 0.2
+
+
+def _timed(fn: Callable, repeat: int = 1):
+    """Best wall time of ``repeat`` runs of ``fn`` and the result of the last run"""
+    best, result = None, None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _result(suite: str, case: str, size: int, seconds: float, operations: int = 1, **extra) -> Dict:
+    return {
+        "suite": suite,
+        "case": case,
+        "size": size,
+        "seconds": seconds,
+        "operations": operations,
+        "seconds_per_operation": seconds / operations if operations else None,
+        **extra
+    }
+
+
+def _backend_storage():
+    """The backend storage module (the backend imports its modules as top-level names)"""
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    import storage
+    return storage
+
+
+def _backend_app(work_dir: Path):
+    """Import the Flask backend with its data and job database in ``work_dir``"""
+    _backend_storage()
+    previous = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        spec = importlib.util.spec_from_file_location("backend_app", BACKEND_DIR / "app.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(previous)
+    return module
+
+
+def _new_storage(kind: str, work_dir: Path, fsync: bool):
+    storage = _backend_storage()
+    data_file = work_dir / f"{kind}_risks.json"
+    if kind == "json":
+        return storage.JsonFileStorage(str(data_file))
+    return storage.WalRiskStorage(str(data_file), str(work_dir / f"{kind}_risks.wal"),
+                                  str(work_dir / f"{kind}_risks.meta.json"), fsync=fsync)
+
+
+def benchmark_storage(size: int, work_dir: Path, fsync: bool = True, repeat: int = 3) -> List[Dict]:
+    """Time bulk load, single-risk CRUD and a filtered page query of both storage backends"""
+    storage = _backend_storage()
+    register = generate_risk_register(size)
+    writes = min(WRITE_OPERATIONS, size)
+    results = []
+
+    for kind in ("wal", "json"):
+        store = _new_storage(kind, work_dir, fsync)
+        suite = f"storage_{kind}"
+
+        seconds, _ = _timed(lambda: store.upsert_many(register))
+        results.append(_result(suite, "bulk_upsert", size, seconds, size))
+
+        new_risks = generate_risk_register(writes, seed=1)
+        for risk in new_risks:
+            risk["Risk_ID"] = "NEW" + risk["Risk_ID"]
+        seconds, _ = _timed(lambda: [store.add(risk) for risk in new_risks])
+        results.append(_result(suite, "add", size, seconds, writes))
+
+        updates = [dict(risk, Owner="Benchmark Owner") for risk in register[:writes]]
+        seconds, _ = _timed(lambda: [store.update(risk["Risk_ID"], risk) for risk in updates])
+        results.append(_result(suite, "update", size, seconds, writes))
+
+        query = storage.RiskQuery(level="operational", sort="-RI_Cost", limit=50)
+        seconds, _ = _timed(lambda: store.query(query), repeat)
+        results.append(_result(suite, "query_page", size, seconds))
+
+        seconds, _ = _timed(lambda: [store.delete(risk["Risk_ID"]) for risk in new_risks])
+        results.append(_result(suite, "delete", size, seconds, writes))
+
+    return results
+
+
+def benchmark_api(size: int, work_dir: Path, fsync: bool = True, repeat: int = 3, backend=None) -> List[Dict]:
+    """Time the HTTP endpoints of the Flask backend through its test client"""
+    backend = backend or _backend_app(work_dir)
+    backend.storage = _new_storage("api", work_dir, fsync)
+    client = backend.app.test_client()
+    register = generate_risk_register(size)
+    writes = min(WRITE_OPERATIONS, size)
+    results = []
+
+    seconds, response = _timed(lambda: client.post("/api/risks/bulk", json=register))
+    results.append(_result("api", "post_bulk", size, seconds, size, status=response.status_code))
+
+    seconds, response = _timed(lambda: client.get("/api/risks"), repeat)
+    results.append(_result("api", "get_all", size, seconds, payload_bytes=len(response.data)))
+
+    seconds, response = _timed(lambda: client.get("/api/risks?level=operational&sort=-RI_Cost&limit=50"), repeat)
+    results.append(_result("api", "get_page", size, seconds, payload_bytes=len(response.data)))
+
+    etag = response.headers.get("ETag")
+
+    # The first call builds the roll-up, later writes update it incrementally
+    seconds, rollup = _timed(lambda: client.get("/api/rollup?depth=-1"), repeat)
+    results.append(_result("api", "get_rollup", size, seconds, payload_bytes=len(rollup.data)))
+
+    seconds, response = _timed(
+        lambda: client.get("/api/risks?level=operational&sort=-RI_Cost&limit=50", headers={"If-None-Match": etag}),
+        repeat
+    )
+    results.append(_result("api", "get_page_not_modified", size, seconds, status=response.status_code))
+
+    revision = int(response.headers.get("X-Risk-Revision", 0))
+    seconds, _ = _timed(
+        lambda: [client.put(f"/api/risks/{risk['Risk_ID']}", json=dict(risk, Owner="Benchmark Owner"))
+                 for risk in register[:writes]]
+    )
+    results.append(_result("api", "put", size, seconds, writes))
+
+    seconds, response = _timed(lambda: client.get(f"/api/risks/changes?since={revision}"), repeat)
+    results.append(_result("api", "get_changes", size, seconds, payload_bytes=len(response.data)))
+
+    return results
+
+
+def benchmark_dataframe(size: int, repeat: int = 3) -> List[Dict]:
+    """Time the build of the typed dashboard dataframe"""
+    register = generate_risk_register(size, missing_rate=0.02)
+    seconds, _ = _timed(lambda: risk_dataframe(register), repeat)
+    return [_result("dataframe", "risk_dataframe", size, seconds, size)]
+
+
+def benchmark_dashboard(size: int, repeat: int = 3) -> List[Dict]:
+    """Time the construction of every dashboard figure and measure their Plotly payload"""
+    df = risk_dataframe(generate_risk_register(size))
+    figures = {
+        "cost_matrix": lambda: build_risk_matrix(df, "Cost_Impact", "Impatto sui costi"),
+        "time_matrix": lambda: build_risk_matrix(df, "Time_Impact", "Impatto sui tempi"),
+        "level_distribution": lambda: level_distribution_chart(df),
+        "top_cost_risks": lambda: top_risks_chart(df, "RI_Cost", px.colors.sequential.Reds),
+        "top_time_risks": lambda: top_risks_chart(df, "RI_Time", px.colors.sequential.Blues)
+    }
+
+    results = []
+    for case, build in figures.items():
+        seconds, figure = _timed(build, repeat)
+        results.append(_result("dashboard", case, size, seconds, payload_bytes=len(figure.to_json())))
+    return results
+
+
+def benchmark_simulation(size: int, trials: int = SIMULATION_TRIALS) -> List[Dict]:
+    """Time the Monte Carlo simulation of the register, independent and correlated, per sampled trial and risk"""
+    register = generate_risk_register(size)
+    cases = {
+        "simulate_portfolio": None,
+        "simulate_correlated": {"range": 0.2, "project": 0.2}
+    }
+
+    results = []
+    for case, correlation in cases.items():
+        seconds, simulation = _timed(lambda: simulate_portfolio(register, trials=trials, correlation=correlation))
+        results.append(_result("simulation", case, size, seconds, size * trials,
+                               trials=trials, workers=simulation["workers"], factors=simulation["factors"]))
+    return results
+
+
+def benchmark_pipeline(components: int, time_scale: float = 0.01) -> List[Dict]:
+    """Time the agent pipeline on a catalogue with the offline stand-in model"""
+    run = run_pipeline_benchmark(
+        components, time_scale=time_scale,
+        latency={"distribution": "lognormal", "median": 1.5, "sigma": 0.5}
+    )
+    return [_result(
+        "pipeline", "generate_risk_assessment", components, run["wall_time"], run["nodes"],
+        risks=run["risks"], calls=run["calls"], bottleneck_stage=run["bottleneck_stage"]
+    )]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(sizes: List[int], suites: List[str] = SUITES, pipeline_sizes: List[int] = (10, 100, 1000),
+                   repeat: int = 3, fsync: bool = True, time_scale: float = 0.01) -> Dict:
+    """
+    Run the benchmark suites at every size
+
+    Args:
+        sizes: Numbers of risks in the register for the storage, API,
+            dataframe, dashboard and simulation suites
+        suites: Suites to run (see ``SUITES``)
+        pipeline_sizes: Numbers of catalogue components for the pipeline suite
+        repeat: Runs of the read-only cases, of which the fastest is kept
+        fsync: Whether the write-ahead log is synced to disk on every write
+        time_scale: Factor applied to the simulated latency of the stand-in model
+
+    Returns:
+        The results with the commit, Python version and platform they were measured on
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        backend = _backend_app(work_dir) if "api" in suites else None
+
+        for size in sizes:
+            size_dir = work_dir / str(size)
+            size_dir.mkdir()
+            if "storage" in suites:
+                results.extend(benchmark_storage(size, size_dir, fsync, repeat))
+            if "api" in suites:
+                results.extend(benchmark_api(size, size_dir, fsync, repeat, backend))
+            if "dataframe" in suites:
+                results.extend(benchmark_dataframe(size, repeat))
+            if "dashboard" in suites:
+                results.extend(benchmark_dashboard(size, repeat))
+            if "simulation" in suites:
+                results.extend(benchmark_simulation(size))
+
+        if "pipeline" in suites:
+            for components in pipeline_sizes:
+                results.extend(benchmark_pipeline(components, time_scale))
+
+    return {
+        "commit": _git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[Dict]:
+    """Cases that got slower than the baseline by more than ``threshold``"""
+    previous = {(r["suite"], r["case"], r["size"]): r["seconds"] for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["suite"], result["case"], result["size"]))
+        if before and result["seconds"] > before * (1 + threshold):
+            regressions.append({
+                "suite": result["suite"],
+                "case": result["case"],
+                "size": result["size"],
+                "baseline": before,
+                "seconds": result["seconds"],
+                "ratio": result["seconds"] / before
+            })
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time the risk platform at increasing register and catalogue sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Numbers of risks in the register")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--pipeline-sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Numbers of catalogue components for the pipeline suite")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-fsync", action="store_true", help="Do not sync the write-ahead log on every write")
+    parser.add_argument("--time-scale", type=float, default=0.01,
+                        help="Factor applied to the simulated model latency")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<date>-<commit>.json)")
+    parser.add_argument("--compare", help="Baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Slowdown over the baseline reported as a regression")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.suites, args.pipeline_sizes, args.repeat,
+                            fsync=not args.no_fsync, time_scale=args.time_scale)
+
+    for result in report["results"]:
+        print(f"{result['suite']:<12} {result['case']:<24} {result['size']:>7} "
+              f"{result['seconds'] * 1000:>12.2f} ms")
+
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit'] or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare_results(json.load(f), report, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression['suite']} {regression['case']} at {regression['size']}: "
+                  f"{regression['baseline'] * 1000:.2f} ms -> {regression['seconds'] * 1000:.2f} ms "
+                  f"({regression['ratio']:.2f}x)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
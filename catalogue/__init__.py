@@ -0,0 +1,13 @@
+"""
+Product catalogue access for the risk assessment platform.
+
+This package loads the product range / project / component hierarchy of
+``data/initial_data.json`` and indexes it for the Streamlit app.
+"""
+
+from .hierarchy import CatalogueIndex, load_catalogue
+
+__all__ = [
+    'CatalogueIndex',
+    'load_catalogue'
+]
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Catalogue levels with the key of their children and of their risks
+LEVELS = ("strategico", "progetto", "operativo")
+CHILD_KEYS = {"strategico": "projects", "progetto": "components", "operativo": None}
+RISK_KEYS = {"strategico": "rischi_strategici", "progetto": "rischi_progetto", "operativo": "rischi_operativi"}
+DEFAULT_NAMES = {"strategico": "Unknown Range", "progetto": "Unknown Project", "operativo": "Unknown Component"}
+
+
+class CatalogueIndex:
+    """
+    Flattened, read-only view of the product catalogue
+
+    The hierarchy is walked once: every range, project and component becomes
+    a node ``{"level", "name", "path", "data"}`` and the risks of all levels
+    are collected in catalogue order. Lookups by name and level are then
+    dictionary accesses.
+    """
+
+    def __init__(self, data: Dict):
+        self.data = data
+        nodes, risks = [], []
+
+        for product_range in data.get("product_range", []):
+            self._index_node(product_range, "strategico", (), nodes, risks)
+
+        self.nodes: Tuple[Dict, ...] = tuple(nodes)
+        self.risks: Tuple[Dict, ...] = tuple(risks)
+
+        self._by_name: Dict[str, List[Dict]] = {}
+        names_by_level: Dict[str, List[str]] = {level: [] for level in LEVELS}
+        for node in self.nodes:
+            self._by_name.setdefault(node["name"], []).append(node)
+            names_by_level[node["level"]].append(node["name"])
+        self._names_by_level = {level: tuple(names) for level, names in names_by_level.items()}
+
+    def _index_node(self, node: Dict, level: str, parent_path: tuple, nodes: List[Dict], risks: List[Dict]):
+        path = parent_path + (node.get("name", DEFAULT_NAMES[level]),)
+        nodes.append({"level": level, "name": path[-1], "path": path, "data": node})
+        risks.extend(node.get(RISK_KEYS[level], []))
+
+        child_key = CHILD_KEYS[level]
+        if child_key:
+            child_level = LEVELS[LEVELS.index(level) + 1]
+            for child in node.get(child_key, []):
+                self._index_node(child, child_level, path, nodes, risks)
+
+    def names(self, level: str) -> Tuple[str, ...]:
+        """Names of the catalogue nodes of a level, in catalogue order"""
+        return self._names_by_level.get(level, ())
+
+    def node(self, name: str, level: str = None) -> Optional[Dict]:
+        """First node with a name, optionally restricted to a level"""
+        for node in self._by_name.get(name, ()):
+            if level is None or node["level"] == level:
+                return node
+        return None
+
+
+_cache: Dict[str, Tuple[Tuple[int, int], CatalogueIndex]] = {}
+_cache_lock = threading.Lock()
+
+
+def load_catalogue(path: str = "data/initial_data.json") -> CatalogueIndex:
+    """
+    Return the index of a catalogue file, parsing it only when it changed
+
+    The parsed index is kept per path and reused until the file's
+    modification time or size changes.
+
+    Raises:
+        FileNotFoundError: If the catalogue file does not exist
+        json.JSONDecodeError: If the catalogue is not valid JSON
+    """
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    with open(path, 'r') as f:
+        index = CatalogueIndex(json.load(f))
+
+    with _cache_lock:
+        _cache[path] = (signature, index)
+    return index
@@ -0,0 +1,18 @@
+"""
+Portfolio simulation of the risk register.
+
+This package runs Monte Carlo simulations of the cost and time losses of
+the risks in the register, giving the loss distributions, contingency
+percentiles and per-level and per-project breakdowns shown by the dashboard.
+Correlated risks are sampled through a Gaussian factor copula.
+"""
+
+from .copula import factor_model, node_paths
+from .monte_carlo import build_model, simulate_portfolio
+
+__all__ = [
+    'build_model',
+    'factor_model',
+    'node_paths',
+    'simulate_portfolio'
+]
@@ -0,0 +1,171 @@
+import math
+from statistics import NormalDist
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Level names of the register and of the catalogue that belong to a product range
+STRATEGIC_LEVELS = ("strategic", "strategico")
+
+_normal = NormalDist()
+
+
+def node_paths(catalogue) -> Dict[str, Tuple[str, ...]]:
+    """
+    Catalogue path (range, project, component) of every node
+
+    Nodes are keyed by their full path joined with "/" (the part after "::"
+    of the ``Node`` field of generated risks), so components sharing a name
+    in two projects keep their own path. A name is also a key when a single
+    node carries it, for the risks that only give their ``Project``.
+
+    Args:
+        catalogue: A ``catalogue.CatalogueIndex``
+
+    Returns:
+        The path of each node by full path and by unambiguous name
+    """
+    paths, names = {}, {}
+    for node in catalogue.nodes:
+        paths["/".join(node["path"])] = node["path"]
+        names.setdefault(node["name"], []).append(node["path"])
+    for name, named in names.items():
+        if len(named) == 1:
+            paths.setdefault(name, named[0])
+    return paths
+
+
+def _risk_path(project: str, level: str, paths: Dict[str, Tuple[str, ...]],
+               node: str = "") -> Tuple[Optional[str], Optional[str]]:
+    """Range and project a risk belongs to (None where unknown)"""
+    path = paths.get(node.split("::", 1)[-1]) if node else None
+    if path is None:
+        path = paths.get(project)
+    if path is None:
+        # Outside the catalogue (or under an ambiguous name) the risk's own project is its group
+        path = (project,) if level.lower() in STRATEGIC_LEVELS else (None, project)
+    return path[0], path[1] if len(path) > 1 else None
+
+
+def _threshold(probability: float) -> float:
+    if probability <= 0:
+        return -math.inf
+    if probability >= 1:
+        return math.inf
+    return _normal.inv_cdf(probability)
+
+
+def factor_model(model: Dict, correlation: Dict, paths: Dict[str, Tuple[str, ...]] = None) -> Dict:
+    """
+    Loadings of the Gaussian copula of the risk occurrences
+
+    The latent variable of risk i is ``X_i = sum_k a_ik F_k + r_i e_i``, with
+    independent standard normal factors ``F_k`` and noise ``e_i``, and the
+    risk occurs when ``X_i`` is below the normal quantile of its probability,
+    so its own probability is unchanged. Two risks sharing factors have
+    latent correlation ``sum_k a_ik a_jk``. The factors are:
+
+    - one per product range, loading ``sqrt(range)`` on all its risks (its
+      strategic risks and those of its projects and components);
+    - one per project, loading ``sqrt(project)`` on its risks and those of
+      its components;
+    - one per entry of ``risk_groups``, loading ``sqrt(correlation)`` on the
+      risks listed by ``Risk_ID`` (a negative correlation is allowed for
+      pairs, the second risk then loads ``-sqrt(-correlation)``).
+
+    Each risk loads only a few factors, so sampling costs O(trials x risks x
+    factors per risk) instead of the O(risks^2) of a full correlation matrix.
+
+    Args:
+        model: Model of ``monte_carlo.build_model``
+        correlation: ``range`` and ``project`` correlations and ``risk_groups``
+            (``[{"risks": [Risk_ID, ...], "correlation": rho}, ...]``)
+        paths: Catalogue paths of the nodes (see ``node_paths``), looked up
+            by the risks' ``Node`` and then by their ``Project``
+
+    Returns:
+        Factor count, per-risk factor indices and loadings, residual scales
+        and occurrence thresholds
+
+    Raises:
+        ValueError: If a correlation is out of range or the loadings of a risk
+            add up to more than 1
+    """
+    if float(correlation.get("range", 0.0) or 0.0) + float(correlation.get("project", 0.0) or 0.0) > 1:
+        raise ValueError("The range and project correlations add up to more than 1")
+
+    paths = paths or {}
+    n = len(model["probability"])
+    slots = [[] for _ in range(n)]
+    factors = 0
+
+    # One factor per distinct range and per distinct project
+    for key, position in (("range", 0), ("project", 1)):
+        rho = float(correlation.get(key, 0.0) or 0.0)
+        if not 0 <= rho <= 1:
+            raise ValueError(f"The {key} correlation must be between 0 and 1")
+        if rho == 0:
+            continue
+
+        loading = math.sqrt(rho)
+        ids = {}
+        nodes = model.get("nodes", [""] * n)
+        for i, (project, level, node) in enumerate(zip(model["projects"], model["levels"], nodes)):
+            group = _risk_path(project, level, paths, node)[position]
+            if group is not None:
+                slots[i].append((factors + ids.setdefault(group, len(ids)), loading))
+        factors += len(ids)
+
+    index_of = {}
+    for i, risk_id in enumerate(model["risk_ids"]):
+        if risk_id:
+            index_of.setdefault(risk_id, i)
+
+    for group in correlation.get("risk_groups", []):
+        rho = float(group.get("correlation", 0.0))
+        members = [index_of[risk_id] for risk_id in group.get("risks", []) if risk_id in index_of]
+        if not -1 <= rho <= 1:
+            raise ValueError(f"Correlation {rho} of risks {group.get('risks')} is not between -1 and 1")
+        if rho < 0 and len(group.get("risks", [])) != 2:
+            raise ValueError("Negative correlations are only allowed between two risks")
+        # Risks filtered out of the register are left out of their group
+        if len(members) < 2 or rho == 0:
+            continue
+
+        loading = math.sqrt(abs(rho))
+        for position, i in enumerate(members):
+            slots[i].append((factors, -loading if rho < 0 and position == 1 else loading))
+        factors += 1
+
+    width = max(1, max(len(risk_slots) for risk_slots in slots))
+    index = np.zeros((n, width), dtype=np.int64)
+    loadings = np.zeros((n, width), dtype=np.float32)
+    residual = np.empty(n, dtype=np.float32)
+    for i, risk_slots in enumerate(slots):
+        variance = sum(loading * loading for _, loading in risk_slots)
+        if variance > 1 + 1e-9:
+            raise ValueError(f"The correlations of risk {model['risk_ids'][i] or i} add up to more than 1")
+        for slot, (factor, loading) in enumerate(risk_slots):
+            index[i, slot] = factor
+            loadings[i, slot] = loading
+        residual[i] = math.sqrt(max(0.0, 1 - variance))
+
+    return {
+        "count": factors,
+        "index": index,
+        "loadings": loadings,
+        "residual": residual,
+        "thresholds": np.array([_threshold(p) for p in model["probability"]], dtype=np.float32)
+    }
+
+
+def sample_occurrences(factors: Dict, trials: int, rng: np.random.Generator) -> np.ndarray:
+    """Correlated occurrences (trials x risks) of the risks of a factor model"""
+    n = len(factors["residual"])
+    latent = rng.standard_normal((trials, n), dtype=np.float32)
+    latent *= factors["residual"]
+    if factors["count"]:
+        common = rng.standard_normal((trials, factors["count"]), dtype=np.float32)
+        for slot in range(factors["index"].shape[1]):
+            latent += common[:, factors["index"][:, slot]] * factors["loadings"][:, slot]
+    return latent < factors["thresholds"]
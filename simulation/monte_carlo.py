@@ -0,0 +1,347 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .copula import factor_model, node_paths, sample_occurrences
+
+DISTRIBUTIONS = ("fixed", "triangular", "lognormal")
+PERCENTILES = (50, 80, 95)
+
+# Percentile above which the expected shortfall (mean tail loss) is measured
+TAIL_PERCENTILE = 95
+
+# Impact of an occurred risk relative to its estimate: between half and one and
+# a half times the estimate, most likely the estimate itself
+DEFAULT_IMPACT = {"distribution": "triangular", "low": 0.5, "high": 1.5, "sigma": 0.4}
+
+# Cells (trials x risks) sampled at once, bounding the memory of a worker
+MAX_CELLS = 2 ** 22
+
+# Below this many cells the simulation runs in the calling process
+PARALLEL_CELLS = 5 * 10 ** 7
+
+# Model of the worker processes, sent once when they start
+_worker_model = None
+
+
+def build_model(risks: Union[pd.DataFrame, List[Dict]], impact: Dict = None) -> Dict:
+    """
+    Arrays describing the register for the sampler
+
+    Risks are sorted by project and level so that the losses of each
+    (project, level) group are contiguous. Missing probabilities and impacts
+    count as zero. Probabilities above 1 and up to 100 are percentages (as
+    in the catalogue) and are divided by 100, as the structured output
+    parser does; the rest are clipped to [0, 1].
+
+    Raises:
+        ValueError: If there are no risks or the impact distribution is unknown
+    """
+    df = risks if isinstance(risks, pd.DataFrame) else pd.DataFrame(risks)
+    if df.empty:
+        raise ValueError("No risks to simulate")
+
+    impact = {**DEFAULT_IMPACT, **(impact or {})}
+    if impact["distribution"] not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown impact distribution: {impact['distribution']}")
+    if impact["distribution"] == "triangular" and not impact["low"] <= 1 <= impact["high"] > impact["low"]:
+        raise ValueError("The triangular impact needs low <= 1 <= high and low < high")
+
+    def column(name, default):
+        if name not in df.columns:
+            return pd.Series(default, index=df.index)
+        return df[name]
+
+    probability = pd.to_numeric(column("Risk_Probability", 0.0), errors='coerce').fillna(0.0)
+    probability = probability.where((probability <= 1.0) | (probability > 100.0), probability / 100.0)
+
+    frame = pd.DataFrame({
+        "Risk_ID": column("Risk_ID", "").fillna("").astype(str).to_numpy(),
+        "Project": column("Project", "").astype(str).to_numpy(),
+        "Level": column("Level", "").astype(str).to_numpy(),
+        "Node": column("Node", "").fillna("").astype(str).to_numpy(),
+        "probability": probability.clip(0.0, 1.0).to_numpy(),
+        "cost": pd.to_numeric(column("Cost_Impact", 0.0), errors='coerce').fillna(0.0).to_numpy(),
+        "time": pd.to_numeric(column("Time_Impact", 0.0), errors='coerce').fillna(0.0).to_numpy()
+    }).sort_values(["Project", "Level"], kind="stable")
+
+    groups = frame.groupby(["Project", "Level"], sort=False).size()
+    return {
+        "probability": frame["probability"].to_numpy(np.float32),
+        "cost": frame["cost"].to_numpy(np.float32),
+        "time": frame["time"].to_numpy(np.float32),
+        "risk_ids": frame["Risk_ID"].to_numpy(),
+        "projects": frame["Project"].to_numpy(),
+        "levels": frame["Level"].to_numpy(),
+        "nodes": frame["Node"].to_numpy(),
+        "group_starts": np.concatenate([[0], np.cumsum(groups.to_numpy())[:-1]]),
+        "group_projects": groups.index.get_level_values(0).to_numpy(),
+        "group_levels": groups.index.get_level_values(1).to_numpy(),
+        "group_sizes": groups.to_numpy(),
+        "impact": impact
+    }
+
+
+def _loss_factors(model: Dict, occurred: np.ndarray, v: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Loss of each cell relative to the estimate: zero if the risk did not occur
+
+    ``v`` are uniform draws independent of the occurrences (overwritten). A
+    triangular variable with mode c on [0, 1] is (1 - c) min(V, W) +
+    c max(V, W) for independent uniforms V and W, which avoids the square
+    roots and branches of the inverse CDF. Cost and time of an occurrence
+    use the same factor: a worse event hurts both.
+    """
+    impact = model["impact"]
+    distribution = impact["distribution"]
+    if distribution == "fixed":
+        return occurred.astype(np.float32)
+
+    if distribution == "lognormal":
+        # Median at the estimate
+        factors = rng.standard_normal(v.shape, dtype=np.float32)
+        factors *= np.float32(impact["sigma"])
+        np.exp(factors, out=factors)
+    else:
+        low, high = np.float32(impact["low"]), np.float32(impact["high"])
+        mode = (1 - low) / (high - low)
+        w = rng.random(v.shape, dtype=np.float32)
+        factors = np.minimum(v, w)
+        factors *= (1 - mode) * (high - low)
+        np.maximum(v, w, out=v)
+        v *= mode * (high - low)
+        factors += v
+        factors += low
+
+    factors *= occurred
+    return factors
+
+
+def _simulate_chunk(model: Dict, trials: int, seed: np.random.SeedSequence, keep: int) -> Dict:
+    """
+    Sample ``trials`` trials of the register
+
+    Returns:
+        Total cost and time loss of each trial, the sum over the trials of
+        the loss of each group, and the loss of each breakdown label (the
+        levels, then the projects) in the first ``keep`` trials (for its
+        percentiles)
+    """
+    rng = np.random.default_rng(seed)
+    n = len(model["probability"])
+    rows = max(1, MAX_CELLS // n)
+    starts = model["group_starts"]
+    groups = len(starts)
+    columns = model["label_columns"]
+
+    result = {
+        "cost": np.empty(trials),
+        "time": np.empty(trials),
+        "group_cost_sum": np.zeros(groups),
+        "group_time_sum": np.zeros(groups),
+        "label_cost": np.empty((keep, len(columns["starts"])), dtype=np.float32),
+        "label_time": np.empty((keep, len(columns["starts"])), dtype=np.float32)
+    }
+    for first in range(0, trials, rows):
+        count = min(rows, trials - first)
+        if model.get("factors") is not None:
+            occurred = sample_occurrences(model["factors"], count, rng)
+            v = rng.random((count, n), dtype=np.float32)
+        else:
+            # Given that a risk occurred (u < p), u / p is uniform on [0, 1)
+            # and independent of the occurrence, so it is reused for the impact
+            u = rng.random((count, n), dtype=np.float32)
+            occurred = u < model["probability"]
+            v = np.divide(u, np.maximum(model["probability"], np.float32(1e-12)), out=u)
+        factors = _loss_factors(model, occurred, v, rng)
+
+        for name in ("cost", "time"):
+            group_loss = np.add.reduceat(factors * model[name], starts, axis=1).astype(np.float64)
+            result[name][first:first + count] = group_loss.sum(axis=1)
+            result[f"group_{name}_sum"] += group_loss.sum(axis=0)
+            if first < keep:
+                # Only the label totals are kept, not the loss of every group
+                kept = min(count, keep - first)
+                result[f"label_{name}"][first:first + kept] = np.add.reduceat(
+                    group_loss[:kept, columns["order"]], columns["starts"], axis=1)
+    return result
+
+
+def _init_worker(model: Dict):
+    global _worker_model
+    _worker_model = model
+
+
+def _run_worker_chunk(task):
+    trials, seed, keep = task
+    return _simulate_chunk(_worker_model, trials, seed, keep)
+
+
+def _summary(samples: np.ndarray, percentiles: Sequence[int]) -> Dict:
+    values = np.percentile(samples, percentiles)
+    tail = samples[samples >= np.percentile(samples, TAIL_PERCENTILE)]
+    return {
+        "mean": float(samples.mean()),
+        "std": float(samples.std()),
+        "max": float(samples.max()),
+        "expected_shortfall": float(tail.mean()),
+        "percentiles": {p: float(v) for p, v in zip(percentiles, values)}
+    }
+
+
+def _labels(values: np.ndarray, sizes: np.ndarray) -> Dict:
+    """Labels of a breakdown, in order of appearance, with their groups and risk counts"""
+    codes, labels = pd.factorize(values)
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=len(labels))
+    return {
+        "labels": np.asarray(labels),
+        "order": order,
+        "starts": np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64),
+        "risks": np.bincount(codes, weights=sizes, minlength=len(labels)).astype(int)
+    }
+
+
+def _breakdown(key: str, index: Dict, columns: slice, cost_sum: np.ndarray, time_sum: np.ndarray,
+               label_cost: np.ndarray, label_time: np.ndarray, trials: int,
+               percentiles: Sequence[int]) -> pd.DataFrame:
+    """Expected loss and loss percentiles of the groups sharing each label"""
+    rows = []
+    expected = {name: np.add.reduceat(sums[index["order"]], index["starts"]) / trials
+                for name, sums in (("Cost", cost_sum), ("Time", time_sum))}
+    for position, label in enumerate(index["labels"]):
+        row = {key: label, "Risks": int(index["risks"][position])}
+        for name, samples in (("Cost", label_cost), ("Time", label_time)):
+            row[f"Expected_{name}"] = float(expected[name][position])
+            values = np.percentile(samples[:, columns][:, position], percentiles)
+            for p, value in zip(percentiles, values):
+                row[f"{name}_P{p}"] = float(value)
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values("Expected_Cost", ascending=False, ignore_index=True)
+
+
+def simulate_portfolio(risks: Union[pd.DataFrame, List[Dict]], trials: int = 10000, seed: int = 0,
+                       impact: Dict = None, correlation: Dict = None, catalogue=None,
+                       workers: Optional[int] = None, chunk_trials: int = 1000,
+                       breakdown_trials: int = 10000, percentiles: Sequence[int] = PERCENTILES) -> Dict:
+    """
+    Monte Carlo simulation of the total cost and time loss of the risk register
+
+    In every trial each risk occurs with its ``Risk_Probability``; an occurred
+    risk costs its ``Cost_Impact`` and delays by its ``Time_Impact`` times a
+    factor drawn from the ``impact`` distribution. The delays of a trial are
+    summed, which is an upper bound when risks hit activities running in
+    parallel.
+
+    Risks are independent unless a ``correlation`` is given: their
+    occurrences are then sampled through the Gaussian factor copula of
+    ``copula.factor_model``, with group factors per product range and
+    project and sparse correlations between ``Risk_ID``s. The impacts of
+    occurred risks stay independent.
+
+    Trials are sampled in chunks of ``chunk_trials``, each with its own seed,
+    so the results only depend on ``seed`` and not on the number of workers.
+    Large simulations spread the chunks over worker processes.
+
+    Args:
+        risks: Risk register, as a dataframe or a list of risk dictionaries
+        trials: Number of simulated trials
+        seed: Seed of the random generator
+        impact: Impact distribution relative to the estimate: ``distribution``
+            ("fixed", "triangular" with ``low`` and ``high`` factors, or
+            "lognormal" with ``sigma``), see ``DEFAULT_IMPACT``
+        correlation: ``range`` and ``project`` correlations and ``risk_groups``
+            of correlated Risk_IDs (see ``copula.factor_model``)
+        catalogue: ``catalogue.CatalogueIndex`` placing the risks' projects
+            and components in their range and project
+        workers: Worker processes (default: the CPU count; 1 runs in-process)
+        chunk_trials: Trials sampled by each task
+        breakdown_trials: Trials kept for the percentiles of the per-level and
+            per-project breakdowns (their expected losses use every trial),
+            at most ``MAX_CELLS`` divided by the number of levels and projects
+        percentiles: Percentiles of the loss distributions
+
+    Returns:
+        Loss samples and summaries (mean, std, max, expected shortfall
+        beyond ``TAIL_PERCENTILE``, percentiles) of cost and time, breakdown
+        dataframes per level and per project, and timings
+
+    Raises:
+        ValueError: If there are no risks, no trials, an unknown distribution
+            or an invalid correlation
+    """
+    if trials < 1:
+        raise ValueError("trials must be at least 1")
+
+    started = time.perf_counter()
+    model = build_model(risks, impact)
+    n = len(model["probability"])
+    if correlation:
+        model["factors"] = factor_model(model, correlation, node_paths(catalogue) if catalogue is not None else None)
+
+    # Per-label losses kept for the breakdown percentiles: the levels, then the projects
+    breakdowns = {key: _labels(model[f"group_{key.lower()}s"], model["group_sizes"]) for key in ("Level", "Project")}
+    levels = len(breakdowns["Level"]["labels"])
+    model["label_columns"] = {
+        "order": np.concatenate([breakdowns["Level"]["order"], breakdowns["Project"]["order"]]),
+        "starts": np.concatenate([breakdowns["Level"]["starts"], breakdowns["Project"]["starts"] + len(model["group_starts"])])
+    }
+    labels = len(model["label_columns"]["starts"])
+    breakdown_trials = max(1, min(breakdown_trials, trials, MAX_CELLS // labels))
+
+    chunk_trials = max(1, chunk_trials)
+    seeds = np.random.SeedSequence(seed).spawn(-(-trials // chunk_trials))
+    tasks = []
+    for index, chunk_seed in enumerate(seeds):
+        first = index * chunk_trials
+        count = min(chunk_trials, trials - first)
+        tasks.append((count, chunk_seed, max(0, min(count, breakdown_trials - first))))
+
+    cost = np.empty(trials)
+    time_loss = np.empty(trials)
+    cost_sum = np.zeros(len(model["group_starts"]))
+    time_sum = np.zeros(len(model["group_starts"]))
+    label_cost = np.empty((breakdown_trials, labels), dtype=np.float32)
+    label_time = np.empty((breakdown_trials, labels), dtype=np.float32)
+
+    def collect(chunks):
+        # Chunks are folded in as they arrive instead of being concatenated at the end
+        first = 0
+        for chunk in chunks:
+            count, keep = len(chunk["cost"]), len(chunk["label_cost"])
+            cost[first:first + count] = chunk["cost"]
+            time_loss[first:first + count] = chunk["time"]
+            cost_sum[:] += chunk["group_cost_sum"]
+            time_sum[:] += chunk["group_time_sum"]
+            label_cost[first:first + keep] = chunk["label_cost"]
+            label_time[first:first + keep] = chunk["label_time"]
+            first += count
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1 and n * trials >= PARALLEL_CELLS:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(model,)) as executor:
+            collect(executor.map(_run_worker_chunk, tasks))
+    else:
+        workers = 1
+        collect(_simulate_chunk(model, count, chunk_seed, keep) for count, chunk_seed, keep in tasks)
+
+    breakdown = (cost_sum, time_sum, label_cost, label_time, trials, percentiles)
+    return {
+        "trials": trials,
+        "risks": n,
+        "seed": seed,
+        "impact": model["impact"],
+        "factors": model["factors"]["count"] if correlation else 0,
+        "cost": {**_summary(cost, percentiles), "samples": cost},
+        "time": {**_summary(time_loss, percentiles), "samples": time_loss},
+        "by_level": _breakdown("Level", breakdowns["Level"], slice(0, levels), *breakdown),
+        "by_project": _breakdown("Project", breakdowns["Project"], slice(levels, labels), *breakdown),
+        "breakdown_trials": breakdown_trials,
+        "workers": workers,
+        "seconds": time.perf_counter() - started
+    }
@@ -0,0 +1,100 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
+
+from storage import WalRiskStorage
+
+
+@pytest.fixture(scope='module')
+def backend(tmp_path_factory):
+    # The backend opens its databases under data/ of the working directory
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.chdir(tmp_path_factory.mktemp('backend'))
+    monkeypatch.setenv('RISK_WAL_FSYNC', 'false')
+    monkeypatch.setenv('RISK_JOB_WORKERS', '1')
+    # Loaded from its file: the Streamlit app.py of the project root has the same name
+    spec = importlib.util.spec_from_file_location('backend_app', BACKEND_DIR / 'app.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    monkeypatch.undo()
+
+
+@pytest.fixture
+def client(backend, tmp_path, monkeypatch):
+    storage = WalRiskStorage(tmp_path / 'risks.json', tmp_path / 'risks.wal', tmp_path / 'risks.meta.json',
+                             fsync=False, changelog_size=3)
+    monkeypatch.setattr(backend, 'storage', storage)
+    return backend.app.test_client()
+
+
+def add(client, risk_id, **fields):
+    response = client.post('/api/risks', json={'Risk_ID': risk_id, 'Level': 'project', 'Project': 'Model X', **fields})
+    assert response.status_code == 200
+
+
+def test_unchanged_register_answers_not_modified(client):
+    add(client, 'A', RI_Cost=10)
+    first = client.get('/api/risks?project=Model+X')
+    etag = first.headers['ETag']
+
+    again = client.get('/api/risks?project=Model+X', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+    # Another query of the same revision has its own ETag
+    other = client.get('/api/risks?project=Model+Y', headers={'If-None-Match': etag})
+    assert other.status_code == 200
+
+    add(client, 'B', RI_Cost=20)
+    changed = client.get('/api/risks?project=Model+X', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert [risk['Risk_ID'] for risk in changed.get_json()] == ['A', 'B']
+    assert int(changed.headers['X-Risk-Revision']) > int(first.headers['X-Risk-Revision'])
+
+
+def test_pagination_headers(client):
+    for i in range(5):
+        add(client, f'R{i}', RI_Cost=i)
+
+    page = client.get('/api/risks?sort=-RI_Cost&limit=2&offset=1')
+    assert [risk['Risk_ID'] for risk in page.get_json()] == ['R3', 'R2']
+    assert page.headers['X-Total-Count'] == '5'
+    assert page.headers['X-Next-Cursor'] == '3'
+
+
+def test_changes_since_a_revision_are_sent_as_a_delta(client):
+    add(client, 'A')
+    revision = client.get('/api/risks/changes').get_json()['revision']
+
+    add(client, 'B')
+    client.put('/api/risks/A', json={'Risk_ID': 'A', 'Risk_Title': 'Edited'})
+    delta = client.get(f'/api/risks/changes?since={revision}').get_json()
+
+    assert delta['reset'] is False
+    assert [(change['op'], change['key']) for change in delta['changes']] == [('put', 'B'), ('put', 'A')]
+    assert delta['changes'][-1]['risk']['Risk_Title'] == 'Edited'
+
+    client.delete('/api/risks/B')
+    latest = client.get(f"/api/risks/changes?since={delta['revision']}").get_json()
+    assert [(change['op'], change['key']) for change in latest['changes']] == [('delete', 'B')]
+    assert client.get(f"/api/risks/changes?since={latest['revision']}").get_json()['changes'] == []
+
+
+def test_expired_or_unknown_revision_resets_the_client(client):
+    for risk_id in 'ABCDE':
+        add(client, risk_id)
+
+    # Only the last 3 changes are kept
+    for since in (0, 1000):
+        reset = client.get(f'/api/risks/changes?since={since}').get_json()
+        assert reset['reset'] is True
+        assert [change['key'] for change in reset['changes']] == list('ABCDE')
+
+    revision = reset['revision']
+    assert client.get(f'/api/risks/changes?since={revision - 3}').get_json()['reset'] is False
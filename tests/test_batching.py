@@ -0,0 +1,112 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents import AgentCoordinator
+from agents.fake_llm import FakeAPIError, FakeChatModel
+from agents.structured_output import EVALUATION_FIELDS
+
+BATCH_PROMPT = "Evaluate each of the following risks"
+SINGLE_PROMPT = "Evaluate the following risk"
+
+
+@pytest.fixture
+def coordinator(tmp_path, monkeypatch):
+    monkeypatch.delenv("RISK_LLM_BACKEND", raising=False)
+    config = {
+        "llm_backend": {"type": "fake"},
+        "batching": {"batch_size": 3},
+        "response_cache": {"enabled": False},
+        "rate_limit": {"enabled": False},
+        "risk_ids": {"enabled": False},
+        "mitigation_retrieval": {"enabled": False},
+        "tracing": {"enabled": False}
+    }
+    path = tmp_path / "agent_config.json"
+    path.write_text(json.dumps(config))
+    return AgentCoordinator(str(path))
+
+
+def incomplete_risks(count):
+    """Risks found by a search, still without an evaluation"""
+    return [{"Risk_ID": f"R{i}", "Level": "project", "Project": "Model X",
+             "Risk_Title": f"Supplier delay {i}", "Risk_Description": f"Late parts for lot {i}"}
+            for i in range(1, count + 1)]
+
+
+def record_prompts(monkeypatch, agent, fail=lambda prompt: False):
+    """Evaluation prompts sent by an agent, as ("batch", risk count) or ("single", 1)"""
+    prompts = []
+    invoke = agent.llm.invoke
+
+    def recording(prompt, **options):
+        if BATCH_PROMPT in prompt:
+            prompts.append(("batch", FakeChatModel._count_items(prompt)))
+        elif SINGLE_PROMPT in prompt:
+            prompts.append(("single", 1))
+        if fail(prompt):
+            raise FakeAPIError("Internal server error (simulated)", 500)
+        return invoke(prompt, **options)
+
+    monkeypatch.setattr(agent.llm, "invoke", recording)
+    return prompts
+
+
+def assert_evaluated(risks):
+    for risk in risks:
+        assert all(field in risk for field in EVALUATION_FIELDS)
+        assert 0 <= risk["Risk_Probability"] <= 1
+        assert risk["RI_Cost"] == risk["Risk_Probability"] * risk["Cost_Impact"]
+
+
+def test_risks_are_evaluated_in_batches_of_the_configured_size(coordinator, monkeypatch):
+    prompts = record_prompts(monkeypatch, coordinator.risk_evaluation_agent)
+    risks = incomplete_risks(7)
+
+    batches = coordinator._split_batches(risks)
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    for batch in batches:
+        coordinator._enrich_batch(batch, "project::Range/Model X")
+
+    # A batch of one risk is evaluated with the single-risk prompt
+    assert prompts == [("batch", 3), ("batch", 3), ("single", 1)]
+    assert_evaluated(risks)
+
+
+def test_failed_batch_is_halved_and_retried(coordinator, monkeypatch):
+    agent = coordinator.risk_evaluation_agent
+    prompts = record_prompts(monkeypatch, agent,
+                             fail=lambda prompt: BATCH_PROMPT in prompt and FakeChatModel._count_items(prompt) == 4)
+
+    evaluations = agent.evaluate_risks(incomplete_risks(4))
+
+    assert prompts == [("batch", 4), ("batch", 2), ("batch", 2)]
+    assert len(evaluations) == 4
+    assert all(set(EVALUATION_FIELDS) <= set(evaluation) for evaluation in evaluations)
+
+
+def test_single_risks_fall_back_when_every_batch_fails(coordinator, monkeypatch):
+    agent = coordinator.risk_evaluation_agent
+    prompts = record_prompts(monkeypatch, agent, fail=lambda prompt: BATCH_PROMPT in prompt)
+
+    evaluations = agent.evaluate_risks(incomplete_risks(3))
+
+    assert prompts == [("batch", 3), ("single", 1), ("batch", 2), ("single", 1), ("single", 1)]
+    assert len(evaluations) == 3
+    assert all(set(EVALUATION_FIELDS) <= set(evaluation) for evaluation in evaluations)
+
+
+def test_default_values_when_the_single_risk_call_fails_too(coordinator, monkeypatch):
+    agent = coordinator.risk_evaluation_agent
+    record_prompts(monkeypatch, agent, fail=lambda prompt: True)
+
+    evaluations = agent.evaluate_risks(incomplete_risks(2))
+
+    assert len(evaluations) == 2
+    for evaluation in evaluations:
+        assert 300000 <= evaluation["Cost_Impact"] <= 3000000
+        assert 2 <= evaluation["Time_Impact"] <= 20
@@ -0,0 +1,83 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from id_allocator import MAX_BLOCK, IdAllocator, risk_id_prefix
+
+
+def open_allocator(tmp_path):
+    return IdAllocator(str(tmp_path / 'id_sequences.sqlite'))
+
+
+def test_prefix_holds_the_level_code_and_project():
+    assert risk_id_prefix('operativo', 'Model X-500') == 'RO-MODELX500'
+    assert risk_id_prefix('strategic', 'Sedan Range') == 'RS-SEDANRANGE'
+    assert risk_id_prefix(None, '') == 'R-GEN'
+
+
+def test_blocks_continue_the_sequence_of_their_prefix(tmp_path):
+    allocator = open_allocator(tmp_path)
+
+    assert allocator.allocate('project', 'Model X', 3)['ids'] == [
+        'RP-MODELX-000001', 'RP-MODELX-000002', 'RP-MODELX-000003'
+    ]
+    assert allocator.allocate('project', 'Model X')['ids'] == ['RP-MODELX-000004']
+    # Each prefix has its own sequence
+    assert allocator.allocate('operational', 'Model X')['ids'] == ['RO-MODELX-000001']
+
+
+def test_sequences_survive_a_restart(tmp_path):
+    open_allocator(tmp_path).allocate('project', 'Model X', 10)
+
+    assert open_allocator(tmp_path).allocate('project', 'Model X')['ids'] == ['RP-MODELX-000011']
+
+
+def test_concurrent_reservations_never_overlap(tmp_path):
+    allocators = [open_allocator(tmp_path) for _ in range(2)]
+    reserved = []
+
+    def reserve(allocator):
+        for _ in range(20):
+            reserved.extend(allocator.allocate('project', 'Model X', 5)['ids'])
+
+    threads = [threading.Thread(target=reserve, args=(allocators[i % 2],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(reserved) == len(set(reserved)) == 400
+
+
+def test_observe_moves_past_ids_in_use(tmp_path):
+    allocator = open_allocator(tmp_path)
+    allocator.observe(['RP-MODELX-000041', 'RP-MODELX-000007', 'RS001', None])
+
+    assert allocator.allocate('project', 'Model X')['ids'] == ['RP-MODELX-000042']
+    # Observing lower IDs never moves a sequence back
+    allocator.observe(['RP-MODELX-000002'])
+    assert allocator.allocate('project', 'Model X')['ids'] == ['RP-MODELX-000043']
+
+
+def test_assign_fills_only_missing_ids(tmp_path):
+    allocator = open_allocator(tmp_path)
+    risks = [{'Level': 'project', 'Project': 'Model X'},
+             {'Risk_ID': 'RP001', 'Level': 'project', 'Project': 'Model X'},
+             {'Risk_ID': '', 'Level': 'operativo', 'Project': 'Model X'},
+             {'Level': 'project', 'Project': 'Model X'}]
+
+    assert allocator.assign(risks) == 3
+    assert [risk['Risk_ID'] for risk in risks] == [
+        'RP-MODELX-000001', 'RP001', 'RO-MODELX-000001', 'RP-MODELX-000002'
+    ]
+
+
+def test_block_size_is_bounded(tmp_path):
+    allocator = open_allocator(tmp_path)
+    for count in (0, MAX_BLOCK + 1):
+        with pytest.raises(ValueError):
+            allocator.allocate('project', 'Model X', count)
@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from jobs import CANCELLED, FINISHED_STATES, SUCCEEDED, JobManager
+
+
+class GatedRunner:
+    """Job runner that holds the first job until released and records the order of the jobs"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.order = []
+
+    def __call__(self, params, report_progress):
+        if params['name'] == 'gate':
+            self.started.set()
+            self.release.wait(5)
+        self.order.append(params['name'])
+        report_progress({'done': params['name']})
+        return {'name': params['name']}
+
+
+def wait_finished(manager, jobs, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        states = [manager.get(job['id'])['status'] for job in jobs]
+        if all(state in FINISHED_STATES for state in states):
+            return states
+        time.sleep(0.01)
+    raise AssertionError(f'jobs still running: {states}')
+
+
+def start(tmp_path):
+    runner = GatedRunner()
+    manager = JobManager(runner, db_path=str(tmp_path / 'jobs.sqlite'), workers=1)
+    gate = manager.submit({'name': 'gate'}, user='gate')
+    assert runner.started.wait(5)
+    return runner, manager, gate
+
+
+def test_queued_jobs_are_taken_round_robin_across_users(tmp_path):
+    runner, manager, gate = start(tmp_path)
+    jobs = [manager.submit({'name': f'anna-{i}'}, user='anna') for i in range(3)]
+    jobs += [manager.submit({'name': f'marco-{i}'}, user='marco') for i in range(2)]
+    jobs.append(manager.submit({'name': 'luca-0'}, user='luca'))
+
+    runner.release.set()
+    assert wait_finished(manager, [gate] + jobs) == [SUCCEEDED] * 7
+
+    # One user's backlog does not hold up the others
+    assert runner.order == ['gate', 'anna-0', 'marco-0', 'luca-0', 'anna-1', 'marco-1', 'anna-2']
+    assert manager.get(jobs[0]['id'], include_result=True)['result'] == {'name': 'anna-0'}
+    assert manager.get(jobs[0]['id'])['progress'] == {'done': 'anna-0'}
+
+
+def test_cancelled_queued_job_leaves_the_rotation(tmp_path):
+    runner, manager, gate = start(tmp_path)
+    first = manager.submit({'name': 'anna-0'}, user='anna')
+    cancelled = manager.submit({'name': 'marco-0'}, user='marco')
+    last = manager.submit({'name': 'anna-1'}, user='anna')
+
+    assert manager.cancel(cancelled['id'])['status'] == CANCELLED
+    runner.release.set()
+    wait_finished(manager, [gate, first, cancelled, last])
+
+    assert runner.order == ['gate', 'anna-0', 'anna-1']
+
+
+def test_interrupted_jobs_run_again_after_a_restart(tmp_path):
+    runner, manager, gate = start(tmp_path)
+    queued = manager.submit({'name': 'anna-0'}, user='anna')
+
+    # A new manager on the same database, as after a restart of the process
+    restarted = GatedRunner()
+    restarted.release.set()
+    second = JobManager(restarted, db_path=str(tmp_path / 'jobs.sqlite'), workers=1)
+    runner.release.set()
+
+    assert wait_finished(second, [gate, queued]) == [SUCCEEDED, SUCCEEDED]
+    assert 'anna-0' in restarted.order
@@ -0,0 +1,104 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.fake_llm import FakeLLMPool
+from agents.agent_coordinator import MitigationPlanAgent
+from agents.mitigation_retrieval import MitigationPlanIndex
+
+REGISTER = [
+    {"Risk_ID": "RS001", "Level": "operational", "Project": "Chassis Line",
+     "Risk_Title": "Supplier delay on brake calipers",
+     "Risk_Description": "The caliper supplier delivers late because of casting capacity",
+     "Mitigation_Plan": "1. Qualify a second caliper foundry. 2. Hold weekly supplier capacity reviews."},
+    {"Risk_ID": "RS002", "Level": "operational", "Project": "Chassis Line",
+     "Risk_Title": "Supplier delay on brake pads",
+     "Risk_Description": "The pad supplier delivers late because of raw material shortages",
+     "Mitigation_Plan": "1. Increase safety stock of brake pads. 2. Agree allocation rules with the supplier."},
+    {"Risk_ID": "RS003", "Level": "operational", "Project": "Infotainment",
+     "Risk_Title": "Software release slips",
+     "Risk_Description": "The head unit software is not mature for validation",
+     "Mitigation_Plan": "1. Freeze the feature scope early. 2. Run nightly integration builds on target hardware."},
+    {"Risk_ID": "RS004", "Level": "strategic", "Project": "Sedan Range",
+     "Risk_Title": "Supplier delay on brake calipers",
+     "Risk_Description": "The caliper supplier delivers late because of casting capacity",
+     "Mitigation_Plan": "1. Renegotiate the strategic sourcing agreement for braking systems across the range."}
+]
+
+NEW_RISK = {"Risk_ID": "R1", "Level": "operational", "Project": "Chassis Line",
+            "Risk_Title": "Supplier delay on brake calipers and discs",
+            "Risk_Description": "The caliper and disc suppliers deliver late because of casting capacity",
+            "Risk_Probability": 0.4, "Cost_Impact": 500000, "Time_Impact": 6}
+
+
+def build_index(**options):
+    index = MitigationPlanIndex(**{"threshold": 0.99, "examples": 2, **options})
+    assert index.add_many(REGISTER) == len(REGISTER)
+    return index
+
+
+def test_examples_are_the_most_similar_plans_of_the_same_level():
+    examples = build_index().examples(NEW_RISK)
+
+    assert [example["Risk_Title"] for example in examples] == [
+        "Supplier delay on brake calipers", "Supplier delay on brake pads"
+    ]
+    assert examples[0]["similarity"] > examples[1]["similarity"] >= 0.3
+    # The strategic namesake belongs to another level
+    assert all("strategic sourcing" not in example["Mitigation_Plan"] for example in examples)
+
+
+def test_examples_respect_count_and_threshold():
+    assert len(build_index(examples=1).examples(NEW_RISK)) == 1
+    assert build_index(example_threshold=0.99).examples(NEW_RISK) == []
+    assert build_index(examples=0).examples(NEW_RISK) == []
+
+
+def agent_with(index, monkeypatch):
+    agent = MitigationPlanAgent(plan_index=index, llm_pool=FakeLLMPool())
+    prompts = []
+    invoke = agent.llm.invoke
+
+    def recording(prompt, **options):
+        prompts.append(prompt)
+        return invoke(prompt, **options)
+
+    monkeypatch.setattr(agent.llm, "invoke", recording)
+    return agent, prompts
+
+
+def test_retrieved_plans_reach_the_batch_request(monkeypatch):
+    agent, prompts = agent_with(build_index(), monkeypatch)
+    unrelated = {**NEW_RISK, "Risk_ID": "R2", "Project": "Seats",
+                 "Risk_Title": "Paint shop defects", "Risk_Description": "Colour mismatch on trims"}
+
+    plans = agent.create_mitigation_plans([NEW_RISK, unrelated])
+
+    assert len(prompts) == 1 and len(plans) == 2
+    first, second = prompts[0].split("2. Paint shop defects")
+    assert REGISTER[0]["Mitigation_Plan"] in first
+    assert REGISTER[1]["Mitigation_Plan"] in first
+    assert first.index(REGISTER[0]["Mitigation_Plan"]) < first.index(REGISTER[1]["Mitigation_Plan"])
+    assert "Plan used for the similar risk" not in second
+
+
+def test_retrieved_plans_reach_the_single_request(monkeypatch):
+    agent, prompts = agent_with(build_index(), monkeypatch)
+
+    agent.create_mitigation_plans([NEW_RISK])
+
+    assert len(prompts) == 1
+    assert "Create a detailed mitigation plan for the following risk" in prompts[0]
+    assert REGISTER[0]["Mitigation_Plan"] in prompts[0]
+
+
+def test_close_match_reuses_the_plan_without_a_model_call(monkeypatch):
+    agent, prompts = agent_with(build_index(threshold=0.85), monkeypatch)
+    namesake = {**REGISTER[0], "Risk_ID": "R9", "Project": "Chassis Line Gen2", "Mitigation_Plan": None}
+
+    plans = agent.create_mitigation_plans([namesake])
+
+    assert prompts == []
+    assert plans == [REGISTER[0]["Mitigation_Plan"]]
+    assert agent.plan_index.stats()["hits"] == 1
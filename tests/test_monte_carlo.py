@@ -0,0 +1,155 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from catalogue import CatalogueIndex
+from simulation import monte_carlo
+from simulation.copula import factor_model, node_paths, sample_occurrences
+from simulation.monte_carlo import build_model, simulate_portfolio
+
+CATALOGUE = CatalogueIndex({"product_range": [
+    {"name": "Sedan", "projects": [{"name": "Model X", "components": [{"name": "Brakes"}, {"name": "Seats"}]}]},
+    {"name": "Van", "projects": [{"name": "Model V", "components": [{"name": "Brakes"}]}]}
+]})
+
+
+def risk(risk_id, project="Model X", level="project", probability=0.5, cost=100.0, time=2.0, **fields):
+    return {"Risk_ID": risk_id, "Project": project, "Level": level, "Risk_Probability": probability,
+            "Cost_Impact": cost, "Time_Impact": time, **fields}
+
+
+def register():
+    return [risk(f"R{i}", project=["Model X", "Model V", "Seats"][i % 3],
+                 level=["project", "operational", "operational"][i % 3],
+                 probability=0.1 + 0.02 * i, cost=100.0 * (i + 1), time=i % 4)
+            for i in range(30)]
+
+
+def test_percent_probabilities_are_divided_by_100():
+    model = build_model([risk("A", probability=35), risk("B", probability=0.35), risk("C", probability=1),
+                         risk("D", probability=100), risk("E", probability=250), risk("F", probability=-2),
+                         risk("G", probability=None)])
+
+    probabilities = dict(zip(model["risk_ids"], model["probability"]))
+    assert probabilities == pytest.approx({"A": 0.35, "B": 0.35, "C": 1.0, "D": 1.0, "E": 1.0, "F": 0.0, "G": 0.0})
+
+
+def test_percent_and_fraction_registers_give_the_same_losses():
+    percent = simulate_portfolio([risk("A", probability=35), risk("B", probability=80)], trials=2000)
+    fraction = simulate_portfolio([risk("A", probability=0.35), risk("B", probability=0.8)], trials=2000)
+
+    np.testing.assert_array_equal(percent["cost"]["samples"], fraction["cost"]["samples"])
+
+
+def test_expected_loss_matches_the_register():
+    risks = register()
+    result = simulate_portfolio(risks, trials=40000, impact={"distribution": "fixed"})
+
+    expected = sum(item["Risk_Probability"] * item["Cost_Impact"] for item in risks)
+    assert result["cost"]["mean"] == pytest.approx(expected, rel=0.02)
+    assert result["by_project"]["Expected_Cost"].sum() == pytest.approx(result["cost"]["mean"])
+    assert result["by_level"]["Risks"].sum() == len(risks)
+    percentiles = result["cost"]["percentiles"]
+    assert percentiles[50] <= percentiles[80] <= percentiles[95] <= result["cost"]["expected_shortfall"]
+
+
+def test_results_depend_only_on_the_seed():
+    first = simulate_portfolio(register(), trials=3000, seed=4, chunk_trials=500)
+    again = simulate_portfolio(register(), trials=3000, seed=4, chunk_trials=500, workers=1)
+    other = simulate_portfolio(register(), trials=3000, seed=5, chunk_trials=500)
+
+    np.testing.assert_array_equal(first["cost"]["samples"], again["cost"]["samples"])
+    assert not np.array_equal(first["cost"]["samples"], other["cost"]["samples"])
+    assert first["by_project"].equals(again["by_project"])
+
+
+def test_breakdown_keeps_a_bounded_number_of_trials(monkeypatch):
+    monkeypatch.setattr(monte_carlo, "MAX_CELLS", 100)
+    risks = register()
+
+    result = simulate_portfolio(risks, trials=5000, chunk_trials=300, impact={"distribution": "fixed"})
+
+    # 2 levels and 3 projects: at most 100 / 5 trials are kept for the percentiles
+    assert result["breakdown_trials"] == 20
+    assert len(result["cost"]["samples"]) == 5000
+    # The expected losses still use every trial
+    expected = sum(item["Risk_Probability"] * item["Cost_Impact"] for item in risks)
+    assert result["by_level"]["Expected_Cost"].sum() == pytest.approx(expected, rel=0.03)
+
+
+def test_invalid_input_is_rejected():
+    with pytest.raises(ValueError):
+        simulate_portfolio([], trials=10)
+    with pytest.raises(ValueError):
+        simulate_portfolio(register(), trials=0)
+    with pytest.raises(ValueError):
+        simulate_portfolio(register(), trials=10, impact={"distribution": "uniform"})
+
+
+def factor_groups(model, correlation, paths=None):
+    """Factors loaded by each risk, by Risk_ID"""
+    factors = factor_model(model, correlation, paths)
+    return {risk_id: set(index[loadings != 0]) for risk_id, index, loadings
+            in zip(model["risk_ids"], factors["index"], factors["loadings"])}
+
+
+def test_components_sharing_a_name_keep_their_own_project():
+    model = build_model([
+        risk("X1", project="Brakes", level="operational", Node="operational::Sedan/Model X/Brakes"),
+        risk("V1", project="Brakes", level="operational", Node="operational::Van/Model V/Brakes"),
+        risk("X2", project="Model X"),
+        risk("V2", project="Model V")
+    ])
+
+    groups = factor_groups(model, {"project": 0.5}, node_paths(CATALOGUE))
+    assert groups["X1"] == groups["X2"]
+    assert groups["V1"] == groups["V2"]
+    assert groups["X1"] != groups["V1"]
+
+
+def test_ambiguous_names_are_not_placed_in_the_first_project():
+    paths = node_paths(CATALOGUE)
+    assert "Brakes" not in paths
+    assert paths["Seats"] == ("Sedan", "Model X", "Seats")
+    assert paths["Van/Model V/Brakes"] == ("Van", "Model V", "Brakes")
+
+    model = build_model([risk("B", project="Brakes", level="operational"), risk("X", project="Model X")])
+    groups = factor_groups(model, {"project": 0.5, "range": 0.2}, paths)
+    assert not groups["B"] & groups["X"]
+
+
+def test_ranges_share_a_factor_across_their_projects():
+    model = build_model([risk("S", project="Sedan", level="strategic"), risk("X", project="Seats", level="operational"),
+                         risk("V", project="Model V")])
+
+    groups = factor_groups(model, {"range": 0.3}, node_paths(CATALOGUE))
+    assert groups["S"] == groups["X"]
+    assert groups["S"] != groups["V"]
+
+
+def test_copula_keeps_probabilities_and_correlates_occurrences():
+    model = build_model([risk("A", probability=0.2), risk("B", probability=0.3), risk("C", project="Model V", probability=0.3)])
+    factors = factor_model(model, {"risk_groups": [{"risks": ["A", "B"], "correlation": 0.8}]})
+
+    occurred = sample_occurrences(factors, 200000, np.random.default_rng(0))
+    # The model sorts the risks by project
+    column = {risk_id: occurred[:, i] for i, risk_id in enumerate(model["risk_ids"])}
+    assert [column[risk_id].mean() for risk_id in "ABC"] == pytest.approx([0.2, 0.3, 0.3], abs=0.01)
+    both = (column["A"] & column["B"]).mean()
+    independent = (column["A"] & column["C"]).mean()
+    assert both > 2 * independent
+    assert independent == pytest.approx(0.06, abs=0.01)
+
+
+def test_invalid_correlations_are_rejected():
+    model = build_model(register())
+    with pytest.raises(ValueError):
+        factor_model(model, {"range": 0.7, "project": 0.5})
+    with pytest.raises(ValueError):
+        factor_model(model, {"risk_groups": [{"risks": ["R0", "R1", "R2"], "correlation": -0.3}]})
+    with pytest.raises(ValueError):
+        factor_model(model, {"project": 0.9, "risk_groups": [{"risks": ["R0", "R3"], "correlation": 0.5}]})
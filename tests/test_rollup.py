@@ -0,0 +1,77 @@
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from rollup import RollupTree
+
+
+PATHS = {
+    'Range A': ('Range A',),
+    'Project A1': ('Range A', 'Project A1'),
+    'Component A1a': ('Range A', 'Project A1', 'Component A1a'),
+    'Component A1b': ('Range A', 'Project A1', 'Component A1b'),
+    'Range B': ('Range B',),
+    'Project B1': ('Range B', 'Project B1'),
+    'Component B1a': ('Range B', 'Project B1', 'Component B1a'),
+}
+
+
+class NoScan(dict):
+    """Risks of a node that must not be scanned"""
+
+    def __iter__(self):
+        raise AssertionError('subtree scanned')
+
+
+def risk(project, cost, time=1.0):
+    return {'Risk_ID': f'{project}-{cost}', 'Project': project, 'RI_Cost': cost, 'RI_Time': time}
+
+
+def build(top_k=3):
+    tree = RollupTree(PATHS, top_k=top_k)
+    for i, project in enumerate(PATHS):
+        for j in range(4):
+            tree.add(f'{project}/{j}', risk(project, 10 * i + j))
+    return tree
+
+
+def top_keys(summary, field='RI_Cost'):
+    return [entry['key'] for entry in summary[field]['top']]
+
+
+def test_summary_matches_a_full_regroup():
+    tree = build()
+    rng = random.Random(7)
+    keys = list(tree._placed)
+    for _ in range(40):
+        key = rng.choice(keys)
+        if rng.random() < 0.5:
+            tree.remove(key)
+        else:
+            tree.add(key, risk(rng.choice(list(PATHS)), rng.uniform(0, 100)))
+
+    summary = tree.summary()
+    values = sorted((values['RI_Cost'], key) for key, (_, values) in tree._placed.items())
+    assert summary['count'] == len(values)
+    assert top_keys(summary) == [key for _, key in reversed(values[-3:])]
+    assert abs(summary['RI_Cost']['sum'] - sum(value for value, _ in values)) < 1e-6
+
+
+def test_leaf_delete_does_not_scan_other_subtrees():
+    tree = build()
+    tree.summary(depth=-1)
+
+    # The top risk of the whole register sits in a component of Range B
+    leaf = tree._nodes(PATHS['Component B1a'])[-1]
+    top_key = max(leaf.risks, key=lambda key: leaf.risks[key]['RI_Cost'])
+    assert top_keys(tree.summary())[0] == top_key
+
+    for node in tree._nodes(('Range A',))[-1].walk():
+        node.risks = NoScan(node.risks)
+    tree.remove(top_key)
+
+    summary = tree.summary(depth=-1)
+    assert top_key not in top_keys(summary)
+    assert summary['count'] == 4 * len(PATHS) - 1
@@ -0,0 +1,131 @@
+import json
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from storage import RiskQuery, RiskStorage, WalRiskStorage
+
+LEVELS = ['strategic', 'project', 'operational', 'Operativo']
+PROJECTS = ['Model X', 'Model Y', 'Model Z']
+OWNERS = ['Anna', 'Marco', None]
+
+
+def open_storage(tmp_path):
+    return WalRiskStorage(tmp_path / 'risks.json', tmp_path / 'risks.wal', tmp_path / 'risks.meta.json', fsync=False)
+
+
+def random_risk(rng, i):
+    risk = {'Risk_ID': f'R{i}', 'Level': rng.choice(LEVELS), 'Project': rng.choice(PROJECTS),
+            'Owner': rng.choice(OWNERS), 'Risk_Title': f'Risk {i}'}
+    if rng.random() < 0.8:
+        risk['RI_Cost'] = rng.uniform(0, 1000)
+    if rng.random() < 0.8:
+        risk['RI_Time'] = rng.uniform(0, 10)
+    return risk
+
+
+def ids(risks):
+    return [risk['Risk_ID'] for risk in risks]
+
+
+def wal_lines(tmp_path):
+    return (tmp_path / 'risks.wal').read_text(encoding='utf-8').splitlines()
+
+
+QUERIES = [
+    {},
+    {'level': 'operational'},
+    {'level': 'operativo', 'project': 'Model X'},
+    {'project': 'Model Y', 'owner': 'Anna'},
+    {'min_ri_cost': 500},
+    {'owner': 'Marco', 'min_ri_time': 2.5, 'sort': '-RI_Cost'},
+    {'sort': 'RI_Time', 'offset': 10, 'limit': 15},
+    {'level': 'project', 'sort': '-RI_Time', 'limit': 5},
+    {'sort': 'Risk_Title', 'offset': 3, 'limit': 7},
+]
+
+
+@pytest.mark.parametrize('params', QUERIES)
+def test_indexed_query_matches_a_full_scan(tmp_path, params):
+    rng = random.Random(3)
+    storage = open_storage(tmp_path)
+    for i in range(200):
+        storage.add(random_risk(rng, i))
+    # Updates and deletes move the risks between the index entries
+    for i in rng.sample(range(200), 40):
+        storage.update(f'R{i}', random_risk(rng, i))
+    for i in rng.sample(range(200), 20):
+        storage.delete(f'R{i}')
+
+    query = RiskQuery(**params)
+    indexed, total = storage.query(query)
+    scanned, scanned_total = RiskStorage.query(storage, query)
+
+    assert ids(indexed) == ids(scanned)
+    assert total == scanned_total
+
+
+def test_indexes_are_rebuilt_when_the_log_is_replayed(tmp_path):
+    storage = open_storage(tmp_path)
+    storage.add({'Risk_ID': 'A', 'Level': 'project', 'Project': 'Model X', 'RI_Cost': 10})
+    storage.add({'Risk_ID': 'B', 'Level': 'project', 'Project': 'Model Y', 'RI_Cost': 20})
+    storage.update('A', {'Risk_ID': 'A', 'Level': 'project', 'Project': 'Model Y', 'RI_Cost': 30})
+
+    reopened = open_storage(tmp_path)
+    risks, total = reopened.query(RiskQuery(project='Model Y', sort='-RI_Cost'))
+    assert ids(risks) == ['A', 'B'] and total == 2
+    assert reopened.query(RiskQuery(project='Model X'))[1] == 0
+
+
+def test_upsert_many_inserts_and_updates_in_one_log_line(tmp_path):
+    storage = open_storage(tmp_path)
+    storage.add({'Risk_ID': 'A', 'Risk_Title': 'Old', 'RI_Cost': 1})
+    lines = len(wal_lines(tmp_path))
+
+    result = storage.upsert_many([
+        {'Risk_ID': 'A', 'Risk_Title': 'New', 'RI_Cost': 50},
+        {'Risk_ID': 'B', 'Risk_Title': 'Added', 'RI_Cost': 40},
+        {'Risk_Title': 'Unnamed 1'},
+        {'Risk_Title': 'Unnamed 2'}
+    ])
+
+    assert result == {'inserted': 3, 'updated': 1}
+    assert len(wal_lines(tmp_path)) == lines + 1
+    assert json.loads(wal_lines(tmp_path)[-1])['op'] == 'batch'
+    assert storage.get('A')['Risk_Title'] == 'New'
+    assert ids(storage.query(RiskQuery(min_ri_cost=10, sort='-RI_Cost'))[0]) == ['A', 'B']
+    assert sorted(risk['Risk_Title'] for risk in open_storage(tmp_path).all()) == [
+        'Added', 'New', 'Unnamed 1', 'Unnamed 2'
+    ]
+
+
+def test_upsert_many_rejects_duplicate_ids_without_writing(tmp_path):
+    storage = open_storage(tmp_path)
+    storage.add({'Risk_ID': 'A', 'Risk_Title': 'Old'})
+
+    with pytest.raises(ValueError):
+        storage.upsert_many([{'Risk_ID': 'B'}, {'Risk_ID': 'B'}])
+
+    assert ids(storage.all()) == ['A']
+    assert len(wal_lines(tmp_path)) == 1
+
+
+def test_replace_node_keeps_curated_risks_and_other_nodes(tmp_path):
+    storage = open_storage(tmp_path)
+    node = 'operational::Range/Model X/Brakes'
+    twin = 'operational::Range/Model Y/Brakes'
+    storage.add({'Risk_ID': 'CURATED', 'Project': 'Brakes', 'Risk_Title': 'Entered by hand'})
+    storage.add_many([{'Risk_ID': 'G1', 'Project': 'Brakes', 'Node': node},
+                      {'Risk_ID': 'G2', 'Project': 'Brakes', 'Node': twin}])
+
+    result = storage.replace_node(node, [{'Risk_ID': 'G1', 'Project': 'Brakes', 'Node': node, 'Risk_Title': 'New'},
+                                         {'Risk_ID': 'G3', 'Project': 'Brakes', 'Node': node}])
+
+    assert result == {'deleted': 1, 'inserted': 2}
+    assert sorted(ids(storage.all())) == ['CURATED', 'G1', 'G2', 'G3']
+    assert storage.get('G1')['Risk_Title'] == 'New'
+    assert sorted(ids(open_storage(tmp_path).all())) == ['CURATED', 'G1', 'G2', 'G3']
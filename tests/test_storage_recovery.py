@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from storage import WalRiskStorage
+
+
+def open_storage(tmp_path):
+    return WalRiskStorage(tmp_path / 'risks.json', tmp_path / 'risks.wal', fsync=False)
+
+
+def titles(storage):
+    return sorted(risk['Risk_Title'] for risk in storage.all())
+
+
+def test_torn_wal_tail_is_cut_before_appending(tmp_path):
+    open_storage(tmp_path).add({'Risk_ID': 'A', 'Risk_Title': 'A'})
+
+    # A write interrupted halfway through its line
+    with open(tmp_path / 'risks.wal', 'a', encoding='utf-8') as f:
+        f.write('{"op": "put", "key": "T", "risk": {"Risk_')
+
+    storage = open_storage(tmp_path)
+    assert titles(storage) == ['A']
+    storage.add({'Risk_ID': 'B', 'Risk_Title': 'B'})
+
+    assert titles(open_storage(tmp_path)) == ['A', 'B']
+
+
+def test_last_record_without_newline_is_kept(tmp_path):
+    open_storage(tmp_path).add({'Risk_ID': 'A', 'Risk_Title': 'A'})
+
+    wal = tmp_path / 'risks.wal'
+    wal.write_bytes(wal.read_bytes().rstrip(b'\n'))
+
+    open_storage(tmp_path).add({'Risk_ID': 'B', 'Risk_Title': 'B'})
+
+    assert titles(open_storage(tmp_path)) == ['A', 'B']
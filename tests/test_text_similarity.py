@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.text_similarity import SimilarityIndex, risk_terms
+
+
+def risk(title, description=""):
+    return {"Project": "Model X", "Risk_Title": title, "Risk_Description": description}
+
+
+def build(count=500):
+    index = SimilarityIndex(max_candidates=50)
+    risks = [risk(f"Supplier delay on part{i} tooling{i}", f"Late delivery of housing{i}") for i in range(count)]
+    for item in risks:
+        index.observe(risk_terms(item))
+    for item in risks:
+        index.add(risk_terms(item), "operational")
+    return index
+
+
+def test_finds_near_duplicate_among_entries_sharing_common_terms():
+    index = build()
+    query = risk_terms(risk("Supplier delays on part300 tooling300", "Late delivery of housing300"))
+
+    entry, similarity = index.nearest(query, "operational", 0.8)
+    assert entry == 300
+    assert similarity > 0.9
+    assert index.nearest(query, "strategic") is None
+
+
+def test_query_reuses_the_cached_entry_weights(monkeypatch):
+    index = build()
+    calls = []
+    weights = index._weights
+    monkeypatch.setattr(index, "_weights", lambda counts: calls.append(1) or weights(counts))
+
+    index.nearest(risk_terms(risk("Supplier delay on part7 tooling7")), "operational")
+    # Only the query itself is weighed
+    assert len(calls) == 1
+
+
+def test_entry_weights_are_refreshed_after_document_frequencies_grow():
+    index = build(10)
+    for _ in range(10):
+        index.observe(risk_terms(risk("Supplier delay on part1")))
+
+    stale = index._weighted[1][0]
+    refreshed, _ = index._entry_weights(1)
+    assert refreshed != stale
+    assert index._weighted[1][2] == index._documents
@@ -0,0 +1,26 @@
+"""
+Visualization helpers for the risk dashboard.
+
+This package builds the risk dataframe and the charts of the dashboard,
+including the rendering engine of the probability/impact risk matrices,
+the simulated loss distributions and the hierarchical treemap shown by
+the Streamlit app.
+"""
+
+from .dashboard import (
+    level_distribution_chart, loss_distribution_chart, risk_dataframe, rollup_nodes, rollup_treemap, top_risks_chart
+)
+from .risk_matrix import build_risk_matrix, dense_cells, filter_cell, matrix_background
+
+__all__ = [
+    'build_risk_matrix',
+    'dense_cells',
+    'filter_cell',
+    'level_distribution_chart',
+    'loss_distribution_chart',
+    'matrix_background',
+    'risk_dataframe',
+    'rollup_nodes',
+    'rollup_treemap',
+    'top_risks_chart'
+]
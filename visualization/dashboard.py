@@ -0,0 +1,116 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Columns with few distinct values, stored as categoricals
+CATEGORICAL_COLUMNS = ['Level', 'Project', 'Owner']
+NUMERIC_COLUMNS = ['Risk_Probability', 'Cost_Impact', 'Time_Impact', 'Detection', 'RI_Cost', 'RI_Time']
+
+
+def risk_dataframe(risks: List[Dict]) -> pd.DataFrame:
+    """
+    Build the typed dataframe of the risk register shown by the dashboard
+
+    Numeric columns are coerced (invalid values become NaN), the risk indices
+    are computed when missing and low-cardinality columns become categoricals.
+    """
+    df = pd.DataFrame(risks)
+
+    for column in NUMERIC_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+
+    # Calculate risk indices if not already present
+    if 'RI_Cost' not in df.columns and 'Risk_Probability' in df.columns and 'Cost_Impact' in df.columns:
+        df['RI_Cost'] = df['Risk_Probability'] * df['Cost_Impact']
+
+    if 'RI_Time' not in df.columns and 'Risk_Probability' in df.columns and 'Time_Impact' in df.columns:
+        df['RI_Time'] = df['Risk_Probability'] * df['Time_Impact']
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+
+    return df
+
+
+def level_distribution_chart(df: pd.DataFrame) -> Optional[go.Figure]:
+    """Pie chart of the number of risks per level (None without a Level column)"""
+    if 'Level' not in df.columns:
+        return None
+
+    level_counts = df['Level'].value_counts().reset_index()
+    level_counts.columns = ['Livello', 'Conteggio']
+    # Categorical columns also count the levels filtered out
+    level_counts = level_counts[level_counts['Conteggio'] > 0]
+    return px.pie(level_counts, values='Conteggio', names='Livello',
+                  title='',
+                  color_discrete_sequence=px.colors.qualitative.Safe)
+
+
+def top_risks_chart(df: pd.DataFrame, column: str, color_scale: List[str], count: int = 5) -> Optional[go.Figure]:
+    """Bar chart of the ``count`` risks with the highest value of a risk index column"""
+    if column not in df.columns or 'Risk_Title' not in df.columns:
+        return None
+
+    top_risks = df.sort_values(column, ascending=False).head(count)
+    return px.bar(top_risks, x='Risk_Title', y=column,
+                  title='',
+                  color=column,
+                  color_continuous_scale=color_scale)
+
+
+def loss_distribution_chart(summary: Dict, label: str, color: str, bins: int = 60) -> go.Figure:
+    """
+    Histogram of the simulated total losses with their percentiles marked
+
+    ``summary`` is the cost or time summary of ``simulation.simulate_portfolio``.
+    The histogram is computed here, so the figure carries ``bins`` bars and
+    not every sample.
+    """
+    counts, edges = np.histogram(summary['samples'], bins=bins)
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), marker_color=color))
+    for percentile, value in summary['percentiles'].items():
+        fig.add_vline(x=value, line_dash='dash', annotation_text=f'P{percentile}')
+    fig.update_layout(xaxis_title=label, yaxis_title='Simulazioni', bargap=0, showlegend=False)
+    return fig
+
+
+def rollup_nodes(summary: Dict) -> List[Dict]:
+    """Nodes of a roll-up summary (see ``backend/rollup.py``), depth first"""
+    nodes = [summary]
+    for child in summary.get('children', []):
+        nodes.extend(rollup_nodes(child))
+    return nodes
+
+
+def rollup_treemap(summary: Dict, field: str, color_scale: List[str]) -> go.Figure:
+    """
+    Treemap of the register by range, project and component
+
+    Built from the precomputed roll-up of the backend: each box is sized and
+    colored by the sum of a risk index over its subtree, so the register
+    itself is never grouped here. Clicking a box drills down into it.
+    """
+    ids, labels, parents, values, counts, maxima = [], [], [], [], [], []
+    for node in rollup_nodes(summary):
+        ids.append(' / '.join(node['path']) or 'Registro')
+        labels.append(node['name'] or 'Registro')
+        parents.append((' / '.join(node['path'][:-1]) or 'Registro') if node['path'] else '')
+        values.append(node[field]['sum'])
+        counts.append(node['count'])
+        maxima.append(node[field]['max'] or 0)
+
+    fig = go.Figure(go.Treemap(
+        ids=ids, labels=labels, parents=parents, values=values,
+        branchvalues='total',
+        customdata=np.column_stack([counts, maxima]),
+        hovertemplate=f'<b>%{{label}}</b><br>{field}: %{{value:,.2f}}<br>Rischi: %{{customdata[0]}}'
+                      '<br>Massimo: %{customdata[1]:,.2f}<extra></extra>',
+        marker=dict(colors=values, colorscale=color_scale)
+    ))
+    fig.update_layout(margin=dict(t=30, l=10, r=10, b=10))
+    return fig
@@ -0,0 +1,215 @@
+import functools
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Green (low) to red (high) scale of the matrix background
+MATRIX_COLORSCALE = [
+    [0.0, '#00ff00'],
+    [0.25, '#ffff00'],
+    [0.6, '#ffff00'],
+    [1.0, '#ff0000']
+]
+
+# Probability axis of the matrices, in percent
+PROBABILITY_RANGE = (0.0, 100.0)
+
+# Above this many risks the points are aggregated into density cells
+MAX_POINTS = 500
+
+
+@functools.lru_cache(maxsize=64)
+def matrix_background(y_min: float, y_max: float, resolution: int = 40) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute the normalized probability x impact background of a risk matrix
+
+    The result only depends on the impact axis range, so it is cached and
+    shared by every rerun and by both matrices. The arrays are read-only.
+
+    Args:
+        y_min: Lower bound of the impact axis
+        y_max: Upper bound of the impact axis
+        resolution: Number of grid points per axis (the heatmap is smoothed)
+
+    Returns:
+        The x and y grid coordinates and the normalized z values
+    """
+    x = np.linspace(*PROBABILITY_RANGE, resolution)
+    y = np.linspace(y_min, y_max, resolution)
+    z = np.outer(y / (y_max if y_max > 0 else 1), x)
+    z = (z - z.min()) / (z.max() - z.min() + 1e-9)
+
+    for array in (x, y, z):
+        array.setflags(write=False)
+    return x, y, z
+
+
+def _impact_range(impact: pd.Series) -> Tuple[float, float]:
+    y_min, y_max = float(impact.min()), float(impact.max())
+    if y_min == y_max:
+        y_max = y_min + 1.0
+    return y_min, y_max
+
+
+def _matrix_points(df: pd.DataFrame, impact_column: str) -> pd.DataFrame:
+    """Risks that can be placed on the matrix, with their probability clipped to the axis"""
+    columns = ['Risk_Probability', impact_column] + (['Risk_Title'] if 'Risk_Title' in df.columns else [])
+    points = df[columns].dropna(subset=['Risk_Probability', impact_column])
+    points = points.assign(Risk_Probability=points['Risk_Probability'].clip(*PROBABILITY_RANGE))
+    if 'Risk_Title' not in points.columns:
+        points = points.assign(Risk_Title='')
+    return points
+
+
+def _bin_points(points: pd.DataFrame, impact_column: str, bins: int):
+    """Count the risks falling in each cell of a ``bins`` x ``bins`` grid"""
+    counts, x_edges, y_edges = np.histogram2d(
+        points['Risk_Probability'].to_numpy(dtype=float),
+        points[impact_column].to_numpy(dtype=float),
+        bins=bins,
+        range=[PROBABILITY_RANGE, _impact_range(points[impact_column])]
+    )
+    return counts, x_edges, y_edges
+
+
+def dense_cells(df: pd.DataFrame, impact_column: str, bins: int = 20, limit: int = 20) -> List[Dict]:
+    """
+    Return the most populated cells of a risk matrix, for drill-down
+
+    Returns:
+        Up to ``limit`` cells as ``{"probability": (low, high), "impact": (low, high), "count"}``,
+        most populated first
+    """
+    points = _matrix_points(df, impact_column)
+    if points.empty:
+        return []
+
+    counts, x_edges, y_edges = _bin_points(points, impact_column, bins)
+    order = np.argsort(counts, axis=None)[::-1][:limit]
+    cells = []
+    for i, j in zip(*np.unravel_index(order, counts.shape)):
+        if counts[i, j] == 0:
+            break
+        cells.append({
+            "probability": (float(x_edges[i]), float(x_edges[i + 1])),
+            "impact": (float(y_edges[j]), float(y_edges[j + 1])),
+            "count": int(counts[i, j])
+        })
+    return cells
+
+
+def filter_cell(df: pd.DataFrame, impact_column: str, cell: Dict) -> pd.DataFrame:
+    """Return the risks falling in a cell returned by ``dense_cells``"""
+    (x_low, x_high), (y_low, y_high) = cell["probability"], cell["impact"]
+    points = _matrix_points(df, impact_column)
+    if points.empty:
+        return df.iloc[0:0]
+
+    probability, impact = points['Risk_Probability'], points[impact_column]
+    y_top = _impact_range(impact)[1]
+    # Like numpy's histogram, the last cell of an axis includes its upper edge
+    in_x = (probability >= x_low) & ((probability < x_high) | (x_high >= PROBABILITY_RANGE[1]))
+    in_y = (impact >= y_low) & ((impact < y_high) | (y_high >= y_top))
+    return df.loc[points.index[in_x & in_y]]
+
+
+def build_risk_matrix(df: pd.DataFrame, impact_column: str, impact_title: str,
+                      max_points: int = MAX_POINTS, top_k: int = 10, bins: int = 20) -> go.Figure:
+    """
+    Build a probability/impact risk matrix
+
+    Up to ``max_points`` risks are drawn as individual markers; larger sets are
+    aggregated into a ``bins`` x ``bins`` density grid. Only the ``top_k``
+    risks with the highest probability x impact are labelled.
+
+    Args:
+        df: Risks with Risk_Probability, the impact column and Risk_Title
+        impact_column: Column plotted on the y axis (Cost_Impact or Time_Impact)
+        impact_title: Title of the y axis
+    """
+    points = _matrix_points(df, impact_column)
+    fig = go.Figure()
+    if points.empty:
+        return _style_matrix(fig, impact_title)
+
+    x, y, z = matrix_background(*_impact_range(points[impact_column]))
+    fig.add_trace(go.Heatmap(
+        x=x, y=y, z=z,
+        colorscale=MATRIX_COLORSCALE,
+        zsmooth='best',
+        showscale=False,
+        opacity=0.5,
+        hoverinfo='skip',
+        zmin=0, zmax=1
+    ))
+
+    hover_label = impact_title[0].upper() + impact_title[1:]
+    if len(points) <= max_points:
+        fig.add_trace(go.Scatter(
+            x=points['Risk_Probability'],
+            y=points[impact_column],
+            mode='markers',
+            marker=dict(size=14, color='black', line=dict(width=2, color='white')),
+            hovertext=points['Risk_Title'],
+            hovertemplate=f'<b>%{{hovertext}}</b><br>Probabilità: %{{x}}%<br>{hover_label}: %{{y}}<extra></extra>'
+        ))
+    else:
+        counts, x_edges, y_edges = _bin_points(points, impact_column, bins)
+        i, j = np.nonzero(counts)
+        cell_counts = counts[i, j]
+        fig.add_trace(go.Scatter(
+            x=(x_edges[i] + x_edges[i + 1]) / 2,
+            y=(y_edges[j] + y_edges[j + 1]) / 2,
+            mode='markers',
+            marker=dict(
+                size=8 + 22 * np.sqrt(cell_counts / cell_counts.max()),
+                color=cell_counts,
+                colorscale='Greys',
+                line=dict(width=1, color='white')
+            ),
+            customdata=cell_counts.astype(int),
+            hovertemplate=f'<b>%{{customdata}} rischi</b><br>Probabilità: ~%{{x:.0f}}%<br>{hover_label}: ~%{{y:,.0f}}<extra></extra>'
+        ))
+
+    # Label the most critical risks only
+    if top_k:
+        top = points.loc[(points['Risk_Probability'] * points[impact_column]).nlargest(top_k).index]
+        fig.add_trace(go.Scatter(
+            x=top['Risk_Probability'],
+            y=top[impact_column],
+            mode='markers+text' if len(points) > max_points else 'text',
+            marker=dict(size=14, color='black', line=dict(width=2, color='white')),
+            text=top['Risk_Title'],
+            textposition='top center',
+            hovertemplate=f'<b>%{{text}}</b><br>Probabilità: %{{x}}%<br>{hover_label}: %{{y}}<extra></extra>'
+        ))
+
+    return _style_matrix(fig, impact_title)
+
+
+def _style_matrix(fig: go.Figure, impact_title: str) -> go.Figure:
+    fig.update_layout(
+        xaxis=dict(
+            title='Probabilità di accadimento (%)',
+            tickvals=[0, 20, 40, 60, 80, 100],
+            ticktext=['0', '20', '40', '60', '80', '100'],
+            range=list(PROBABILITY_RANGE),
+            gridcolor='#404040',
+            zerolinecolor='#404040',
+            color='white',
+        ),
+        yaxis=dict(
+            title=impact_title,
+            gridcolor='#404040',
+            zerolinecolor='#404040',
+            color='white',
+        ),
+        plot_bgcolor='#2d2d2d',
+        paper_bgcolor='#2d2d2d',
+        font=dict(color="white", size=12),
+        margin=dict(l=40, r=20, t=20, b=40),
+        showlegend=False
+    )
+    return fig